@@ -1,6 +1,10 @@
 from app.database import supabase
 #from app.agents.notification_agent import send_notification
 from datetime import datetime, timedelta
+from app.utils.availability_index import (
+    availability_index, fits, to_minutes, to_hhmm, DAY_START_MINUTES, DAY_END_MINUTES
+)
+from app.utils.intervals import nearest_starts
 from app.utils.logger import agent_logger
 
 APPOINTMENT_DURATIONS = {
@@ -14,7 +18,7 @@ APPOINTMENT_DURATIONS = {
     "lab_review": 20
 }
 
-def book_appointment(patient_name: str, doctor_name: str, date: str, time: str, 
+async def book_appointment(patient_name: str, doctor_name: str, date: str, time: str, 
                      appointment_type: str = "consultation", patient_email: str = None,
                      patient_phone: str = None, notes: str = None):
     
@@ -22,74 +26,210 @@ def book_appointment(patient_name: str, doctor_name: str, date: str, time: str,
         return {"success": False, "error": "Missing required fields: patient_name, doctor_name, date, time"}
     
     duration = APPOINTMENT_DURATIONS.get(appointment_type.lower(), 30)
+    end_time = _calculate_end_time(time, duration)
+        
+    # Conflict check and insert happen in one transaction on the server
+    # (see migrations/001_book_appointment_atomic.sql)
+    try:
+        response = await supabase.rpc("book_appointment_atomic", {
+            "p_patient_name": patient_name,
+            "p_doctor_name": doctor_name,
+            "p_appointment_date": date,
+            "p_appointment_time": time,
+            "p_end_time": end_time,
+            "p_appointment_type": appointment_type,
+            "p_duration_minutes": duration,
+            "p_patient_email": patient_email,
+            "p_patient_phone": patient_phone,
+            "p_notes": notes
+        }).execute()
+    except Exception as e:
+        agent_logger.error(f"Booking failed: {str(e)}")
+        return {"success": False, "error": f"Database error: {str(e)}"}
     
-    if not _check_duration_availability(doctor_name, date, time, duration):
+    result = response.data or {}
+    
+    if result.get("status") == "conflict":
+        # The server returned the day's bookings, so alternatives need no extra query
+        day = availability_index.store_day(doctor_name, date, result.get("booked") or [])
+        alternatives = nearest_starts(
+            day["intervals"], to_minutes(time), duration,
+            DAY_START_MINUTES, DAY_END_MINUTES
+        )
         return {
-            "success": False, 
+            "success": False,
+            "conflict": True,
             "error": f"{appointment_type} requires {duration} minutes. Slot conflicts with existing appointment.",
-            "suggestion": "Try a different time or check availability first."
+            "conflicts": [
+                {"time": c.get("appointment_time"), "end_time": c.get("end_time")}
+                for c in result.get("conflicts") or []
+            ],
+            "alternatives": [
+                {"time": to_hhmm(start), "end_time": to_hhmm(start + duration)}
+                for start in alternatives
+            ],
+            "suggestion": "Try one of the suggested times or check availability first."
         }
     
-    end_time = _calculate_end_time(time, duration)
-        
-    try:
-        data = {
-            "patient_name": patient_name,
-            "doctor_name": doctor_name,
-            "appointment_date": date,
-            "appointment_time": time,
-            "end_time": end_time,
-            "appointment_type": appointment_type,
-            "duration_minutes": duration,
-            "patient_email": patient_email,
-            "patient_phone": patient_phone,
-            "notes": notes,
-            "status": "confirmed",
-            "created_at": datetime.utcnow().isoformat()
-        }
-
-        response = supabase.table("appointments").insert(data).execute()
-
-        if response.data:
-            agent_logger.info(f"Appointment booked: {patient_name} with Dr. {doctor_name} on {date}")
-            return {
-                "success": True,
-                "message": f"Appointment booked for {patient_name} with Dr. {doctor_name}",
-                "appointment": {
-                "id": response.data[0].get("id"),
+    if result.get("status") == "booked":
+        appointment = result.get("appointment") or {}
+        availability_index.invalidate(doctor_name, date)
+        agent_logger.info(f"Appointment booked: {patient_name} with Dr. {doctor_name} on {date}")
+        return {
+            "success": True,
+            "message": f"Appointment booked for {patient_name} with Dr. {doctor_name}",
+            "appointment": {
+                "id": appointment.get("id"),
                 "date": date,
                 "time": time,
-                    "end_time": end_time,
-                    "duration": f"{duration} minutes",
-                    "type": appointment_type
-                }
+                "end_time": end_time,
+                "duration": f"{duration} minutes",
+                "type": appointment_type
             }
-    except Exception as e:
-        agent_logger.error(f"Booking failed: {str(e)}")
-        return {"success": False, "error": f"Database error: {str(e)}"}
+        }
         
     return {"success": False, "error": "Unknown error occurred during booking"}
 
-def _calculate_end_time(start_time: str, duration: int) -> str:
-    start = datetime.strptime(start_time, "%H:%M")
-    end = start + timedelta(minutes=duration)
-    return end.strftime("%H:%M")
+# Upper bound on occurrences in one series request
+MAX_SERIES_OCCURRENCES = 52
+RECURRENCE_STEP_DAYS = {"daily": 1, "weekly": 7}
 
-def _check_duration_availability(doctor_name: str, date: str, time: str, duration: int) -> bool:
-    response = supabase.table("appointments").select(
-        "appointment_time", "end_time"
-    ).eq("doctor_name", doctor_name).eq("appointment_date", date).neq("status", "cancelled").execute()
+def expand_recurrence(start_date: str, frequency: str = "weekly", interval: int = 1,
+                      count: int = None, until: str = None) -> list:
+    """
+    Dates of a recurring series, e.g. weekly for 8 weeks (frequency="weekly", count=8)
+    or every other day until a date (frequency="daily", interval=2, until=...).
+    """
+    step_days = RECURRENCE_STEP_DAYS.get((frequency or "").lower())
+    if step_days is None:
+        raise ValueError(f"Unsupported frequency: {frequency}. Use daily or weekly.")
+    
+    step = timedelta(days=step_days * max(int(interval or 1), 1))
+    current = datetime.strptime(start_date, "%Y-%m-%d")
+    last = datetime.strptime(until, "%Y-%m-%d") if until else None
+    limit = min(int(count), MAX_SERIES_OCCURRENCES) if count else MAX_SERIES_OCCURRENCES
+    if not count and not last:
+        limit = 8
+    
+    dates = []
+    while len(dates) < limit and (last is None or current <= last):
+        dates.append(current.strftime("%Y-%m-%d"))
+        current += step
+    return dates
 
-    proposed_start = datetime.strptime(time, "%H:%M")
-    proposed_end = proposed_start + timedelta(minutes=duration)
+def _series_conflict(day: dict, date: str, time: str, duration: int) -> dict:
+    """Conflict entry with the nearest free starts on that day"""
+    alternatives = nearest_starts(
+        day["intervals"], to_minutes(time), duration,
+        DAY_START_MINUTES, DAY_END_MINUTES
+    )
+    return {
+        "date": date,
+        "time": time,
+        "alternatives": [
+            {"time": to_hhmm(start), "end_time": to_hhmm(start + duration)}
+            for start in alternatives
+        ]
+    }
+
+async def book_series(patient_name: str, doctor_name: str, start_date: str, time: str,
+                      frequency: str = "weekly", interval: int = 1, count: int = None,
+                      until: str = None, appointment_type: str = "consultation",
+                      patient_email: str = None, patient_phone: str = None, notes: str = None):
+    """
+    Book a recurring series in a constant number of round trips: one range load
+    of the affected doctor-days, a local check of every occurrence, and one bulk
+    insert of the free ones. Conflicting occurrences come back with alternatives;
+    weekend occurrences are skipped and listed in skipped_weekends.
+    """
+    
+    if not all([patient_name, doctor_name, start_date, time]):
+        return {"success": False, "error": "Missing required fields: patient_name, doctor_name, start_date, time"}
+    
+    try:
+        dates = expand_recurrence(start_date, frequency, interval, count, until)
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+    
+    if not dates:
+        return {"success": False, "error": "The recurrence rule produces no dates"}
+    
+    # The clinic is closed at weekends; those occurrences are reported, not booked
+    skipped = [date for date in dates if datetime.strptime(date, "%Y-%m-%d").weekday() >= 5]
+    weekdays = [date for date in dates if date not in skipped]
+    if not weekdays:
+        return {"success": False, "error": "Every occurrence of the series falls on a weekend",
+                "skipped_weekends": skipped}
+    
+    duration = APPOINTMENT_DURATIONS.get(appointment_type.lower(), 30)
+    end_time = _calculate_end_time(time, duration)
+    
+    days = await availability_index.load([doctor_name], weekdays[0], weekdays[-1])
     
-    for apt in response.data or []:
-        existing_start = datetime.strptime(apt["appointment_time"], "%H:%M")
-        existing_end = datetime.strptime(apt.get("end_time") or apt["appointment_time"], "%H:%M")
+    conflicts = []
+    rows = []
+    for date in weekdays:
+        day = days[(doctor_name, date)]
+        if fits(day["mask"], to_minutes(time), duration):
+            rows.append({
+                "patient_name": patient_name,
+                "doctor_name": doctor_name,
+                "appointment_date": date,
+                "appointment_time": time,
+                "end_time": end_time,
+                "appointment_type": appointment_type,
+                "duration_minutes": duration,
+                "patient_email": patient_email,
+                "patient_phone": patient_phone,
+                "notes": notes
+            })
+        else:
+            conflicts.append(_series_conflict(day, date, time, duration))
+    
+    booked = []
+    if rows:
+        # Re-checked under per-day locks on the server (see migrations/004_book_series_atomic.sql)
+        try:
+            response = await supabase.rpc("book_series_atomic", {"p_rows": rows}).execute()
+        except Exception as e:
+            agent_logger.error(f"Series booking failed: {str(e)}")
+            return {"success": False, "error": f"Database error: {str(e)}"}
+        
+        result = response.data or {}
+        booked = result.get("booked") or []
         
-        if not (proposed_end <= existing_start or proposed_start >= existing_end):
-            return False
-    return True
+        for apt in booked:
+            availability_index.invalidate(doctor_name, apt["appointment_date"])
+        # Occurrences taken by a concurrent booking since the load
+        for lost in result.get("conflicts") or []:
+            day = availability_index.store_day(doctor_name, lost["appointment_date"], lost.get("booked") or [])
+            conflicts.append(_series_conflict(day, lost["appointment_date"], time, duration))
+    
+    conflicts.sort(key=lambda conflict: conflict["date"])
+    agent_logger.info(
+        f"Series for {patient_name} with Dr. {doctor_name}: {len(booked)} booked, {len(conflicts)} conflicts"
+    )
+    
+    return {
+        "success": bool(booked),
+        "message": f"Booked {len(booked)} of {len(dates)} {appointment_type} appointments for {patient_name} with Dr. {doctor_name}",
+        "booked": [{
+            "id": apt.get("id"),
+            "date": apt["appointment_date"],
+            "time": apt["appointment_time"],
+            "end_time": apt.get("end_time")
+        } for apt in sorted(booked, key=lambda apt: apt["appointment_date"])],
+        "conflicts": conflicts,
+        "skipped_weekends": skipped,
+        "requested_occurrences": len(dates),
+        "duration": f"{duration} minutes",
+        **({} if booked else {"error": "None of the requested occurrences are free"})
+    }
+
+def _calculate_end_time(start_time: str, duration: int) -> str:
+    start = datetime.strptime(start_time, "%H:%M")
+    end = start + timedelta(minutes=duration)
+    return end.strftime("%H:%M")
 
 def get_appointment_types():
     return {
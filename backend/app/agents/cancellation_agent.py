@@ -1,12 +1,18 @@
 from app.database import supabase
-from app.utils.email_service import send_email
+from app.utils.outbox import outbox
+from app.utils.availability_index import (
+    availability_index, date_range, to_minutes, to_hhmm, DAY_START_MINUTES, DAY_END_MINUTES
+)
+from app.utils.intervals import nearest_starts
+from app.utils.waitlist_index import waitlist_index
 from app.utils.logger import agent_logger
 from datetime import datetime, timedelta
-from app.agents.waitlist_agent import check_waitlist_on_cancellation
+import hashlib
+import app.agents.waitlist_agent  # registers the waitlist_check outbox handler
 
 CANCELLATION_NOTICE_HOURS = 24
 
-def cancel_appointment(appointment_id: str = None, patient_name: str = None, 
+async def cancel_appointment(appointment_id: str = None, patient_name: str = None, 
                        date: str = None, reason: str = None, force: bool = False):
     """
     Cancel appointment by ID or patient name + date.
@@ -23,7 +29,7 @@ def cancel_appointment(appointment_id: str = None, patient_name: str = None,
     else:
         return {"success": False, "error": "Provide appointment_id OR (patient_name + date)"}
     
-    response = query.execute()
+    response = await query.execute()
     
     if not response.data:
         return {"success": False, "error": "Appointment not found or already cancelled"}
@@ -64,34 +70,35 @@ def cancel_appointment(appointment_id: str = None, patient_name: str = None,
     
     # Perform cancellation
     try:
-        update_response = supabase.table("appointments").update({
+        update_response = await supabase.table("appointments").update({
             "status": "cancelled",
             "cancellation_reason": reason,
             "cancelled_at": datetime.utcnow().isoformat()
         }).eq("id", appointment["id"]).execute()
         
         if update_response.data:
+            availability_index.invalidate(appointment["doctor_name"], appointment["appointment_date"])
             agent_logger.info(f"Appointment cancelled: {appointment['id']}")
             
-            #check waitlist for the freed slot
-            waitlist_result = check_waitlist_on_cancellation(
-                appointment["doctor_name"],
-                appointment["appointment_date"],
-                appointment["appointment_time"]
-            )
-            
+            # Waitlist fan-out and the patient email run in the outbox worker,
+            # so the response doesn't wait on email delivery
+            await outbox.enqueue("waitlist_check", {
+                "doctor_name": appointment["doctor_name"],
+                "date": appointment["appointment_date"],
+                "time": appointment["appointment_time"],
+                "end_time": appointment.get("end_time")
+            }, idempotency_key=f"waitlist-check:{appointment['id']}")
             
-            # Send notification
             if appointment.get("patient_email"):
-                send_email(
-                    to_email=appointment["patient_email"],
-                    subject="Appointment Cancelled",
-                    body=f"""Your appointment with {appointment['doctor_name']} on {appointment['appointment_date']} at {appointment['appointment_time']} has been cancelled.
+                await outbox.enqueue("email", {
+                    "to_email": appointment["patient_email"],
+                    "subject": "Appointment Cancelled",
+                    "content": f"""Your appointment with {appointment['doctor_name']} on {appointment['appointment_date']} at {appointment['appointment_time']} has been cancelled.
 
 Reason: {reason or 'Not specified'}
 
 If you would like to reschedule, please contact us or use our booking system."""
-                )
+                }, idempotency_key=f"cancellation-email:{appointment['id']}")
             
             return {
                 "success": True,
@@ -103,7 +110,7 @@ If you would like to reschedule, please contact us or use our booking system."""
                     "doctor": appointment["doctor_name"]
                 },
                 "slot_freed": True,
-                "waitlist_notified" : waitlist_result.get("patients_notified", [])
+                "waitlist_check_queued": True
             }
             
     except Exception as e:
@@ -112,6 +119,209 @@ If you would like to reschedule, please contact us or use our booking system."""
     
     return {"success": False, "error": "Cancellation failed unexpectedly"}
 
-def confirm_late_cancellation(appointment_id: str, reason: str = None):
+# Longest date range one provider-absence request may cancel
+MAX_ABSENCE_DAYS = 14
+
+PROVIDER_CANCELLATION_SUBJECT = "Your appointment has been cancelled"
+PROVIDER_CANCELLATION_TEMPLATE = """Hello -patient_name-,
+
+Unfortunately Dr. -doctor_name- is unavailable, so your appointment on -date- at -time- has been cancelled.
+
+-suggestion-
+
+We apologise for the inconvenience. Reply to this email or use our booking system to rebook."""
+
+def _peer_suggestion(peers: list, days: dict, date: str, time: str, duration: int, reserved: dict):
+    """Nearest free start across peer doctors that day, skipping slots already suggested to others"""
+    target = to_minutes(time)
+    best = None
+    for peer in peers:
+        day = days.get((peer, date))
+        if day is None:
+            # Never suggest from a day that wasn't loaded
+            continue
+        booked = day["intervals"] + reserved.get((peer, date), [])
+        starts = nearest_starts(booked, target, duration, DAY_START_MINUTES, DAY_END_MINUTES, limit=1)
+        if starts and (best is None or abs(starts[0] - target) < abs(best[1] - target)):
+            best = (peer, starts[0])
+    
+    if best is None:
+        return None
+    peer, start = best
+    reserved.setdefault((peer, date), []).append((start, start + duration))
+    return {"doctor": peer, "date": date, "time": to_hhmm(start), "end_time": to_hhmm(start + duration)}
+
+def _absence_token(doctor_name: str, date_from: str, date_to: str, appointments: list) -> str:
+    """Fingerprint of the exact rows a preview listed; confirming requires it to still match"""
+    ids = ",".join(sorted(str(apt["id"]) for apt in appointments))
+    return hashlib.sha256(f"{doctor_name}|{date_from}|{date_to}|{ids}".encode()).hexdigest()[:16]
+
+async def _withdraw_offers(held: list) -> int:
+    """Move waitlist entries whose held slot was cancelled back to waiting"""
+    if not held:
+        return 0
+    response = await supabase.table("waitlist").update({
+        "status": "waiting",
+        "offer_expires_at": None,
+        "held_appointment_id": None,
+        "notified_at": None
+    }).eq("status", "offered").in_("held_appointment_id", [str(apt["id"]) for apt in held]).execute()
+    
+    entries = response.data or []
+    for entry in entries:
+        waitlist_index.invalidate(entry["doctor_name"], entry["preferred_date"])
+    return len(entries)
+
+async def cancel_doctor_schedule(doctor_name: str, date_from: str, date_to: str = None,
+                                 reason: str = None, confirm_token: str = None):
+    """
+    Cancel every appointment a doctor has in a date range (e.g. provider absence).
+    Staff only (see routes/staff.py) and always two calls: without confirm_token
+    it returns a preview of what would be cancelled plus the token; with the
+    token it cancels exactly the previewed rows, or previews again if they
+    changed. One update cancels all rows, one availability load over
+    same-specialty peers yields a rebooking suggestion per patient, and every
+    notification is queued to the outbox together so the worker sends them as
+    one batch. Waitlist offers holding a cancelled slot go back to waiting.
+    """
+    
+    if not doctor_name or not date_from:
+        return {"success": False, "error": "Doctor name and start date are required"}
+    
+    date_to = date_to or date_from
+    try:
+        days_covered = (datetime.strptime(date_to, "%Y-%m-%d") - datetime.strptime(date_from, "%Y-%m-%d")).days + 1
+    except ValueError:
+        return {"success": False, "error": "Dates must be in YYYY-MM-DD format"}
+    if days_covered < 1:
+        return {"success": False, "error": "date_to must not be before date_from"}
+    if days_covered > MAX_ABSENCE_DAYS:
+        return {"success": False, "error": f"A provider absence can cover at most {MAX_ABSENCE_DAYS} days"}
+    
+    reason = reason or "Provider unavailable"
+    
+    preview_response = await supabase.table("appointments").select(
+        "id, patient_name, appointment_date, appointment_time, status"
+    ).eq("doctor_name", doctor_name).gte("appointment_date", date_from).lte(
+        "appointment_date", date_to
+    ).in_("status", ["confirmed", "held"]).execute()
+    
+    pending = preview_response.data or []
+    if not pending:
+        return {
+            "success": True,
+            "message": f"Dr. {doctor_name} has no appointments to cancel between {date_from} and {date_to}",
+            "cancelled_count": 0
+        }
+    
+    token = _absence_token(doctor_name, date_from, date_to, pending)
+    if confirm_token != token:
+        return {
+            "success": True,
+            "requires_confirmation": True,
+            "message": f"{len(pending)} appointments for Dr. {doctor_name} between {date_from} and {date_to} "
+                       f"will be cancelled. Send confirm_token to proceed.",
+            "doctor": doctor_name,
+            "date_from": date_from,
+            "date_to": date_to,
+            "to_cancel": len(pending),
+            "appointments": sorted(pending, key=lambda apt: (apt["appointment_date"], apt["appointment_time"])),
+            "confirm_token": token,
+            **({"error": "The appointments changed since the preview; review and confirm again"}
+               if confirm_token else {})
+        }
+    
+    update_response = await supabase.table("appointments").update({
+        "status": "cancelled",
+        "cancellation_reason": reason,
+        "cancelled_at": datetime.utcnow().isoformat()
+    }).in_("id", [apt["id"] for apt in pending]).in_("status", ["confirmed", "held"]).execute()
+    
+    cancelled_ids = {apt["id"] for apt in update_response.data or []}
+    for date in date_range(date_from, date_to):
+        availability_index.invalidate(doctor_name, date)
+    
+    offers_withdrawn = await _withdraw_offers(
+        [apt for apt in pending if apt["status"] == "held" and apt["id"] in cancelled_ids]
+    )
+    # Held rows were only offers; their patients are back in the queue, not rebooked
+    held_ids = {apt["id"] for apt in pending if apt["status"] == "held"}
+    cancelled = sorted(
+        (apt for apt in update_response.data or [] if apt["id"] not in held_ids),
+        key=lambda apt: (apt["appointment_date"], apt["appointment_time"])
+    )
+    
+    if not cancelled:
+        return {
+            "success": True,
+            "message": f"Withdrew {offers_withdrawn} waitlist offers for Dr. {doctor_name} between {date_from} and {date_to}",
+            "cancelled_count": 0,
+            "offers_withdrawn": offers_withdrawn
+        }
+    
+    # Peers share the absent doctor's specialty
+    doctors_response = await supabase.table("doctors").select("name, specialty").eq("active", True).execute()
+    doctors = doctors_response.data or []
+    specialty = next((d.get("specialty") for d in doctors if d["name"] == doctor_name), None)
+    peers = [d["name"] for d in doctors if d["name"] != doctor_name and specialty and d.get("specialty") == specialty]
+    
+    days = await availability_index.load(peers, date_from, date_to) if peers else {}
+    
+    reserved = {}
+    affected = []
+    notifications = []
+    for apt in cancelled:
+        duration = apt.get("duration_minutes") or (
+            to_minutes(apt["end_time"]) - to_minutes(apt["appointment_time"]) if apt.get("end_time") else 30
+        )
+        suggestion = _peer_suggestion(
+            peers, days, apt["appointment_date"], apt["appointment_time"], duration, reserved
+        ) if peers else None
+        
+        affected.append({
+            "id": apt["id"],
+            "patient": apt["patient_name"],
+            "date": apt["appointment_date"],
+            "time": apt["appointment_time"],
+            "suggestion": suggestion
+        })
+        
+        if apt.get("patient_email"):
+            notifications.append(({
+                "to_email": apt["patient_email"],
+                "subject": PROVIDER_CANCELLATION_SUBJECT,
+                "content": PROVIDER_CANCELLATION_TEMPLATE,
+                "substitutions": {
+                    "-patient_name-": apt["patient_name"],
+                    "-doctor_name-": doctor_name,
+                    "-date-": apt["appointment_date"],
+                    "-time-": apt["appointment_time"],
+                    "-suggestion-": (
+                        f"Dr. {suggestion['doctor']} has an opening on {suggestion['date']} at {suggestion['time']} if you would like to rebook."
+                        if suggestion else "Please contact us to find a new time."
+                    )
+                }
+            }, f"provider-cancellation-email:{apt['id']}"))
+    
+    queued = await outbox.enqueue_many("email", notifications)
+    agent_logger.info(
+        f"Cancelled {len(cancelled)} appointments for Dr. {doctor_name} ({date_from} to {date_to}), "
+        f"{queued} notifications queued"
+    )
+    
+    return {
+        "success": True,
+        "message": f"Cancelled {len(cancelled)} appointments for Dr. {doctor_name} between {date_from} and {date_to}",
+        "doctor": doctor_name,
+        "date_from": date_from,
+        "date_to": date_to,
+        "cancelled_count": len(cancelled),
+        "affected": affected,
+        "with_suggestion": sum(1 for item in affected if item["suggestion"]),
+        "notifications_queued": queued,
+        "offers_withdrawn": offers_withdrawn
+    }
+
+async def confirm_late_cancellation(appointment_id: str, reason: str = None):
     """Confirm cancellation when within policy window"""
-    return cancel_appointment(appointment_id=appointment_id, reason=reason, force=True)
\ No newline at end of file
+    return await cancel_appointment(appointment_id=appointment_id, reason=reason, force=True)
\ No newline at end of file
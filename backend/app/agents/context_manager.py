@@ -1,15 +1,23 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
 from datetime import datetime, timedelta
 from typing import Optional
+import asyncio
 import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
 
 class ConversationContext:
     """Manages conversation state and extracted entities"""
     
     def __init__(self, session_id: str):
         self.session_id = session_id
-        self.history = []
-        self.extracted_info = {}
         self.max_history = 10
+        self.history = deque(maxlen=self.max_history)
+        self.extracted_info = {}
         self.created_at = datetime.utcnow()
         self.last_activity = datetime.utcnow()
     
@@ -23,10 +31,6 @@ class ConversationContext:
             "timestamp": datetime.utcnow().isoformat()
         })
         
-        # Keep only recent history
-        if len(self.history) > self.max_history:
-            self.history.pop(0)
-        
         self.last_activity = datetime.utcnow()
     
     def update_entity(self, key: str, value):
@@ -55,7 +59,7 @@ class ConversationContext:
     
     def get_recent_history_for_prompt(self, turns: int = 3) -> list:
         """Get recent turns formatted for AI prompt"""
-        return self.history[-turns:]
+        return list(self.history)[-turns:]
     
     def _summarize_response(self, response: dict) -> str:
         """Create brief summary of response"""
@@ -67,41 +71,259 @@ class ConversationContext:
         """Check if session has expired"""
         return datetime.utcnow() - self.last_activity > timedelta(minutes=timeout_minutes)
     
+    def estimated_size(self) -> int:
+        """Approximate memory footprint in bytes, used for the store's byte cap"""
+        return len(json.dumps([list(self.history), self.extracted_info], default=str))
+    
+    def to_bytes(self) -> bytes:
+        """Compact serialized form for shared backends"""
+        data = {
+            "s": self.session_id,
+            "h": list(self.history),
+            "e": self.extracted_info,
+            "c": self.created_at.isoformat(),
+            "a": self.last_activity.isoformat()
+        }
+        return zlib.compress(json.dumps(data, separators=(",", ":"), default=str).encode())
+    
+    @classmethod
+    def from_bytes(cls, raw: bytes) -> "ConversationContext":
+        data = json.loads(zlib.decompress(raw))
+        context = cls(data["s"])
+        context.history.extend(data["h"])
+        context.extracted_info = data["e"]
+        context.created_at = datetime.fromisoformat(data["c"])
+        context.last_activity = datetime.fromisoformat(data["a"])
+        return context
+    
     def clear(self):
         """Clear conversation context"""
-        self.history = []
+        self.history.clear()
         self.extracted_info = {}
 
 
-class ContextStore:
-    """Manages multiple conversation contexts"""
+class ContextBackend(ABC):
+    """
+    Interface for conversation context storage.
+    Callers fetch a context with get_or_create, mutate it, then call save so
+    backends that live outside the process see the change. The methods are
+    async so backends doing I/O can keep it off the event loop.
+    """
+    
+    @abstractmethod
+    async def get_or_create(self, session_id: str) -> ConversationContext:
+        ...
+    
+    @abstractmethod
+    async def save(self, context: ConversationContext):
+        ...
+    
+    @abstractmethod
+    async def clear_session(self, session_id: str):
+        ...
+    
+    def stats(self) -> dict:
+        return {}
+
+
+class ContextStore(ContextBackend):
+    """
+    Manages multiple conversation contexts.
+    Sessions are kept in least-recently-used order. Every session shares the same
+    timeout, so the oldest entry is always the next to expire and cleanup only has
+    to look at the front: amortized O(1) per request. Session count and total
+    (estimated) bytes are capped, evicting the least recently used sessions first.
+    """
     
-    def __init__(self):
-        self._contexts: dict[str, ConversationContext] = {}
+    def __init__(self, timeout_minutes: int = 30, max_sessions: int = 10000,
+                 max_bytes: int = 64 * 1024 * 1024):
+        self.timeout_minutes = timeout_minutes
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._contexts: OrderedDict[str, ConversationContext] = OrderedDict()
+        self._sizes: dict[str, int] = {}
+        self._total_bytes = 0
+        self.metrics = {
+            "created": 0,
+            "expired": 0,
+            "evicted_sessions_cap": 0,
+            "evicted_bytes_cap": 0
+        }
     
-    def get_or_create(self, session_id: str) -> ConversationContext:
+    async def get_or_create(self, session_id: str) -> ConversationContext:
         """Get existing context or create new one"""
         self._cleanup_expired()
         
-        if session_id not in self._contexts:
-            self._contexts[session_id] = ConversationContext(session_id)
+        context = self._contexts.get(session_id)
+        if context is None:
+            context = ConversationContext(session_id)
+            self._contexts[session_id] = context
+            self.metrics["created"] += 1
+        else:
+            self._contexts.move_to_end(session_id)
+        
+        # Keep the expiry order in step with the access order
+        context.last_activity = datetime.utcnow()
         
-        return self._contexts[session_id]
+        # Re-measure this session only; it may have grown since it was last fetched
+        self._set_size(session_id, context.estimated_size())
+        self._enforce_limits(keep=session_id)
+        
+        return context
     
     def _cleanup_expired(self):
-        """Remove expired sessions"""
-        expired = [
-            sid for sid, ctx in self._contexts.items() 
-            if ctx.is_expired()
-        ]
-        for sid in expired:
-            del self._contexts[sid]
-    
-    def clear_session(self, session_id: str):
+        """Remove expired sessions from the least recently used end"""
+        while self._contexts:
+            session_id, context = next(iter(self._contexts.items()))
+            if not context.is_expired(self.timeout_minutes):
+                break
+            self._remove(session_id)
+            self.metrics["expired"] += 1
+    
+    def _enforce_limits(self, keep: str = None):
+        """Evict least recently used sessions until both caps are met"""
+        while len(self._contexts) > self.max_sessions:
+            if not self._evict_oldest(keep):
+                break
+            self.metrics["evicted_sessions_cap"] += 1
+        
+        while self._total_bytes > self.max_bytes:
+            if not self._evict_oldest(keep):
+                break
+            self.metrics["evicted_bytes_cap"] += 1
+    
+    def _evict_oldest(self, keep: str = None) -> bool:
+        for session_id in self._contexts:
+            if session_id != keep:
+                self._remove(session_id)
+                return True
+        return False
+    
+    def _set_size(self, session_id: str, size: int):
+        self._total_bytes += size - self._sizes.get(session_id, 0)
+        self._sizes[session_id] = size
+    
+    def _remove(self, session_id: str):
+        del self._contexts[session_id]
+        self._total_bytes -= self._sizes.pop(session_id, 0)
+    
+    async def save(self, context: ConversationContext):
+        """Contexts are live objects in this store; just refresh the size accounting"""
+        if context.session_id in self._contexts:
+            self._set_size(context.session_id, context.estimated_size())
+            self._enforce_limits(keep=context.session_id)
+    
+    async def clear_session(self, session_id: str):
         """Explicitly clear a session"""
         if session_id in self._contexts:
-            del self._contexts[session_id]
+            self._remove(session_id)
+    
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._contexts),
+            "max_sessions": self.max_sessions,
+            "estimated_bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            **self.metrics
+        }
+
+
+class SQLiteContextStore(ContextBackend):
+    """
+    Conversation contexts shared by every worker process on a host through one
+    SQLite file. Sessions are stored compressed; the TTL is enforced on read and
+    expired rows are purged in the background of writes at most once a minute.
+    Queries run in a worker thread so a busy database never stalls the event loop.
+    """
+    
+    PURGE_INTERVAL_SECONDS = 60
+    
+    def __init__(self, path: str, timeout_minutes: int = 30):
+        self.path = path
+        self.ttl_seconds = timeout_minutes * 60
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        self.metrics = {"created": 0, "loaded": 0, "saved": 0, "expired_purged": 0}
+        
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, data BLOB NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at)")
+    
+    async def get_or_create(self, session_id: str) -> ConversationContext:
+        row = await asyncio.to_thread(self._load, session_id)
+        
+        if row:
+            self.metrics["loaded"] += 1
+            context = ConversationContext.from_bytes(row[0])
+        else:
+            self.metrics["created"] += 1
+            context = ConversationContext(session_id)
+        
+        context.last_activity = datetime.utcnow()
+        return context
+    
+    async def save(self, context: ConversationContext):
+        await asyncio.to_thread(self._store, context.session_id, context.to_bytes())
+        self.metrics["saved"] += 1
+    
+    async def clear_session(self, session_id: str):
+        await asyncio.to_thread(self._delete, session_id)
+    
+    def _load(self, session_id: str):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT data FROM sessions WHERE session_id = ? AND expires_at > ?",
+                (session_id, time.time())
+            ).fetchone()
+    
+    def _store(self, session_id: str, data: bytes):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, data, expires_at) VALUES (?, ?, ?)",
+                (session_id, data, now + self.ttl_seconds)
+            )
+            if now - self._last_purge > self.PURGE_INTERVAL_SECONDS:
+                self._last_purge = now
+                purged = self._conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,)).rowcount
+                self.metrics["expired_purged"] += purged
+    
+    def _delete(self, session_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+    
+    def stats(self) -> dict:
+        with self._lock:
+            sessions = self._conn.execute(
+                "SELECT COUNT(*) FROM sessions WHERE expires_at > ?", (time.time(),)
+            ).fetchone()[0]
+        return {"backend": "sqlite", "path": self.path, "sessions": sessions, **self.metrics}
+
+
+def create_context_store() -> ContextBackend:
+    """Build the context backend selected by CONTEXT_BACKEND (memory or sqlite)"""
+    timeout_minutes = int(os.getenv("CONTEXT_TIMEOUT_MINUTES", "30"))
+    backend = os.getenv("CONTEXT_BACKEND", "memory").lower()
+    
+    if backend == "sqlite":
+        return SQLiteContextStore(
+            os.getenv("CONTEXT_SQLITE_PATH", "context_store.db"),
+            timeout_minutes=timeout_minutes
+        )
+    if backend != "memory":
+        raise ValueError(f"Unknown CONTEXT_BACKEND: {backend}")
+    
+    return ContextStore(
+        timeout_minutes=timeout_minutes,
+        max_sessions=int(os.getenv("CONTEXT_MAX_SESSIONS", "10000")),
+        max_bytes=int(os.getenv("CONTEXT_MAX_BYTES", str(64 * 1024 * 1024)))
+    )
 
 
 # Global context store
-context_store = ContextStore()
\ No newline at end of file
+context_store = create_context_store()
@@ -1,19 +1,21 @@
+import inspect
 from app.agents.scheduling_agent import (
-    check_availability, find_next_available, 
+    check_availability, check_availability_batch, find_next_available, 
     suggest_alternative_doctors, get_optimal_slots
 )
-from app.agents.booking_agent import book_appointment, get_appointment_types
+from app.agents.booking_agent import book_appointment, book_series, get_appointment_types
 from app.agents.reschedule_agent import reschedule_appointment
 from app.agents.cancellation_agent import cancel_appointment, confirm_late_cancellation
 from app.agents.patient_agent import get_patient_appointments, get_appointment_history
 from app.agents.reminder_agent import schedule_follow_up
 from app.agents.waitlist_agent import (
     add_to_waitlist, remove_from_waitlist, 
-    get_waitlist_status, fulfill_waitlist
+    get_waitlist_status, fulfill_waitlist, accept_waitlist_offer
 )
 from app.utils.logger import agent_logger
+from app.utils.metrics import span, DISPATCH_SECONDS
 
-def execute(intent: str, parameters: dict):
+async def execute(intent: str, parameters: dict):
     """Central dispatcher with all Phase 3 handlers"""
     
     if not intent or not isinstance(parameters, dict):
@@ -24,11 +26,20 @@ def execute(intent: str, parameters: dict):
         "check_availability": lambda p: check_availability(
             p.get("doctor_name"), p.get("date")
         ),
+        "check_availability_batch": lambda p: check_availability_batch(
+            p.get("doctor_names"), p.get("date"), p.get("date_to")
+        ),
         "book_appointment": lambda p: book_appointment(
             p.get("patient_name"), p.get("doctor_name"), p.get("date"), 
             p.get("time"), p.get("appointment_type", "consultation"),
             p.get("patient_email"), p.get("patient_phone"), p.get("notes")
         ),
+        "book_series": lambda p: book_series(
+            p.get("patient_name"), p.get("doctor_name"), p.get("start_date") or p.get("date"),
+            p.get("time"), p.get("frequency", "weekly"), p.get("interval", 1), p.get("count"),
+            p.get("until"), p.get("appointment_type", "consultation"),
+            p.get("patient_email"), p.get("patient_phone"), p.get("notes")
+        ),
         "reschedule_appointment": lambda p: reschedule_appointment(
             p.get("appointment_id"), p.get("new_date"), p.get("new_time") 
         ),
@@ -41,20 +52,24 @@ def execute(intent: str, parameters: dict):
         ),
         "get_appointments": lambda p: get_patient_appointments(
             p.get("patient_name"), p.get("doctor_name"),
-            p.get("date_from"), p.get("date_to"), p.get("include_cancelled", False)
+            p.get("date_from"), p.get("date_to"), p.get("include_cancelled", False),
+            p.get("fields"), p.get("cursor"), p.get("past_cursor"), p.get("page_size", 20)
         ),
         "get_history": lambda p: get_appointment_history(p.get("patient_name")),
         "get_appointment_types": lambda p: get_appointment_types(),
         
         # Phase 3 - Smart scheduling handlers
         "find_next_available": lambda p: find_next_available(
-            p.get("doctor_name"), p.get("preferred_date"), p.get("days_to_search", 14)
+            p.get("doctor_name"), p.get("preferred_date"), p.get("days_to_search", 14),
+            p.get("max_results", 1)
         ),
         "suggest_alternatives": lambda p: suggest_alternative_doctors(
-            p.get("specialty"), p.get("date"), p.get("time")
+            p.get("specialty"), p.get("date"), p.get("time"), p.get("date_to")
         ),
         "get_optimal_slots": lambda p: get_optimal_slots(
-            p.get("doctor_name"), p.get("date"), p.get("duration_minutes", 30)
+            p.get("doctor_name"), p.get("date"), p.get("duration_minutes", 30),
+            p.get("step_minutes", 15), p.get("buffer_minutes", 0), p.get("min_gap_minutes", 0),
+            p.get("appointment_type")
         ),
         
         # Waitlist
@@ -67,6 +82,9 @@ def execute(intent: str, parameters: dict):
             p.get("doctor_name"), p.get("date")
         ),
         "get_waitlist_status": lambda p: get_waitlist_status(p.get("patient_name")),
+        "accept_waitlist_offer": lambda p: accept_waitlist_offer(
+            p.get("waitlist_id"), p.get("patient_name"), p.get("patient_email")
+        ),
         
         # Follow-ups
         "schedule_follow_up": lambda p: schedule_follow_up(
@@ -87,7 +105,11 @@ def execute(intent: str, parameters: dict):
     
     try:
         agent_logger.info(f"Executing: {intent}")
-        return handler(parameters)
+        with span("dispatch", DISPATCH_SECONDS, intent=intent):
+            result = handler(parameters)
+            if inspect.isawaitable(result):
+                result = await result
+        return result
     except Exception as e:
         agent_logger.error(f"Failed {intent}: {str(e)}")
         return {"success": False, "error": str(e)}
\ No newline at end of file
@@ -0,0 +1,252 @@
+import re
+from datetime import datetime, timedelta
+from app.database import supabase
+from app.agents.booking_agent import APPOINTMENT_DURATIONS
+from app.utils.cache import TTLCache
+from app.utils.logger import agent_logger
+
+# Parameters an intent needs before it can run without asking the user.
+# Tuples are alternatives: any one complete group is enough.
+INTENT_REQUIREMENTS = {
+    "check_availability": [("doctor_name", "date")],
+    "book_appointment": [("patient_name", "doctor_name", "date", "time")],
+    "cancel_appointment": [("appointment_id",), ("patient_name", "date")],
+    "reschedule_appointment": [("appointment_id", "new_date", "new_time")],
+    "get_appointments": [("patient_name",), ("doctor_name",)],
+    "get_history": [("patient_name",)],
+    "find_next_available": [("doctor_name", "preferred_date")],
+    "get_waitlist_status": [("patient_name",)],
+    "get_appointment_types": [()],
+}
+
+# Confidence reported for rule matches; anything the rules can't settle goes to the LLM
+LOCAL_CONFIDENCE = 0.95
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+MONTHS = ["january", "february", "march", "april", "may", "june", "july",
+          "august", "september", "october", "november", "december"]
+
+_MONTH_PATTERN = r"(jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?"
+
+ISO_DATE_RE = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+MONTH_DAY_RE = re.compile(_MONTH_PATTERN + r"\s+(\d{1,2})(?:st|nd|rd|th)?\b")
+DAY_MONTH_RE = re.compile(r"\b(\d{1,2})(?:st|nd|rd|th)?\s+(?:of\s+)?" + _MONTH_PATTERN)
+WEEKDAY_RE = re.compile(r"\b(?:(next|this)\s+)?(" + "|".join(WEEKDAYS) + r")\b")
+TIME_RE = re.compile(r"\b(\d{1,2})(?::(\d{2}))?\s*(am|pm|a\.m\.|p\.m\.)(?![a-z])|\b(\d{1,2}):(\d{2})\b")
+NOON_RE = re.compile(r"\b(noon|midday)\b")
+# The lookahead keeps "appointment 2026-03-05" from reading the year as an id
+APPOINTMENT_ID_RE = re.compile(
+    r"\b(?:appointment|appt|booking)\s*(?:id|number|no\.?|#)?\s*[:#]?\s*([0-9a-f]{8}-[0-9a-f-]{27}|\d+(?![-/.]\d))\b"
+)
+
+# Intent keyword rules, checked in order
+INTENT_RULES = [
+    ("get_waitlist_status", re.compile(r"\bwait\s*list\b.*\b(status|position)\b|\bmy\s+wait\s*list|\bwhere am i on the wait\s*list")),
+    ("reschedule_appointment", re.compile(r"\b(reschedule|move|change)\b.*\b(appointment|appt|booking)\b|\breschedule\b")),
+    ("cancel_appointment", re.compile(r"\bcancel\b")),
+    ("get_history", re.compile(r"\b(history|past visits|previous visits)\b")),
+    ("get_appointment_types", re.compile(r"\b(appointment|visit)\s+types\b|\bwhat\s+types\b")),
+    ("find_next_available", re.compile(r"\b(next|earliest|soonest|first)\s+(available|free|open)\b|\bnext\s+(slot|opening)\b")),
+    ("check_availability", re.compile(r"\b(available|availability|free|open|slots?)\b")),
+    ("get_appointments", re.compile(r"\b(show|view|list|see|what are|check)\b.*\bappointments\b|\bmy\s+(upcoming\s+)?appointments\b")),
+    ("book_appointment", re.compile(r"\b(book|schedule|make)\b.*\b(appointment|appt|visit|consultation|checkup)\b|\bbook\b")),
+]
+
+# Words that usually mean the message needs more reasoning than the rules provide
+AMBIGUOUS_RE = re.compile(r"\b(and then|instead|unless|but|or)\b")
+# "don't cancel", "what if I moved it": the keyword is there but the request isn't
+NEGATION_RE = re.compile(r"\b(don'?t|do not|does not|doesn'?t|not|never|no longer|cannot|can'?t|won'?t)\b")
+HYPOTHETICAL_RE = re.compile(r"\b(what if|what happens if|suppose|supposing|hypothetically|would it|if i)\b")
+ACTION_INTENTS = {"book_appointment", "cancel_appointment", "reschedule_appointment"}
+
+# Parameters the orchestrator must not take from conversation context for a
+# local match: a booking only skips the LLM when the message names its own slot
+CONTEXT_EXCLUDED_PARAMS = {"book_appointment": ("date", "time")}
+
+
+def parse_date(text: str, today: datetime) -> str:
+    """Extract the first date in the message as YYYY-MM-DD"""
+    if re.search(r"\btoday\b", text):
+        return today.strftime("%Y-%m-%d")
+    if re.search(r"\btomorrow\b", text):
+        return (today + timedelta(days=1)).strftime("%Y-%m-%d")
+
+    match = ISO_DATE_RE.search(text)
+    if match:
+        try:
+            return datetime.strptime(match.group(0), "%Y-%m-%d").strftime("%Y-%m-%d")
+        except ValueError:
+            return None
+
+    match = MONTH_DAY_RE.search(text)
+    if match:
+        return _month_day(match.group(1), match.group(2), today)
+
+    match = DAY_MONTH_RE.search(text)
+    if match:
+        return _month_day(match.group(2), match.group(1), today)
+
+    match = WEEKDAY_RE.search(text)
+    if match:
+        target = WEEKDAYS.index(match.group(2))
+        days_ahead = (target - today.weekday()) % 7 or 7
+        return (today + timedelta(days=days_ahead)).strftime("%Y-%m-%d")
+
+    return None
+
+
+def _month_day(month_text: str, day_text: str, today: datetime) -> str:
+    month = next(i for i, name in enumerate(MONTHS, start=1) if name.startswith(month_text[:3]))
+    try:
+        candidate = today.replace(month=month, day=int(day_text))
+    except ValueError:
+        return None
+    # Dates without a year mean the next occurrence
+    if candidate.date() < today.date():
+        candidate = candidate.replace(year=today.year + 1)
+    return candidate.strftime("%Y-%m-%d")
+
+
+def parse_time(text: str) -> str:
+    """Extract the first clock time in the message as HH:MM"""
+    if NOON_RE.search(text):
+        return "12:00"
+
+    match = TIME_RE.search(text)
+    if not match:
+        return None
+
+    if match.group(3):
+        hour = int(match.group(1)) % 12
+        minute = int(match.group(2) or 0)
+        if match.group(3).startswith("p"):
+            hour += 12
+    else:
+        hour, minute = int(match.group(4)), int(match.group(5))
+
+    if hour > 23 or minute > 59:
+        return None
+    return f"{hour:02d}:{minute:02d}"
+
+
+def parse_doctor(text: str, known_doctors: list) -> str:
+    """Match a known doctor by full name or unambiguous last name"""
+    for name in known_doctors:
+        if re.search(r"\b" + re.escape(name.lower()) + r"\b", text):
+            return name
+
+    last_names = {}
+    for name in known_doctors:
+        last_names.setdefault(name.split()[-1].lower(), []).append(name)
+
+    for last, names in last_names.items():
+        if len(names) == 1 and re.search(r"\b" + re.escape(last) + r"\b", text):
+            return names[0]
+    return None
+
+
+def parse_appointment_type(text: str) -> str:
+    """Match one of the booking agent's appointment types"""
+    for apt_type in APPOINTMENT_DURATIONS:
+        if re.search(r"\b" + apt_type.replace("_", r"[\s_-]?") + r"\b", text):
+            return apt_type
+    return None
+
+
+def is_complete(intent: str, parameters: dict) -> bool:
+    """True when every parameter of at least one requirement group is present"""
+    groups = INTENT_REQUIREMENTS.get(intent)
+    if groups is None:
+        return False
+    return any(all(parameters.get(key) for key in group) for group in groups)
+
+
+def parse_intent(message: str, known_doctors: list = None, today: datetime = None):
+    """
+    Rule-based intent and entity extraction for the common, unambiguous requests.
+    Returns a route_request-shaped dict, or None when the LLM should decide.
+    """
+    text = " ".join(message.lower().replace("\u2019", "'").split())
+    today = today or datetime.now()
+
+    if not text or AMBIGUOUS_RE.search(text):
+        return None
+    if NEGATION_RE.search(text) or HYPOTHETICAL_RE.search(text):
+        return None
+
+    matched = [intent for intent, pattern in INTENT_RULES if pattern.search(text)]
+    if not matched:
+        return None
+    intent = matched[0]
+
+    date = parse_date(text, today)
+    time = parse_time(text)
+    doctor = parse_doctor(text, known_doctors or [])
+    id_match = APPOINTMENT_ID_RE.search(text)
+    appointment_id = id_match.group(1) if id_match else None
+
+    # Several actions in one message ("book the next available slot", "cancel and book")
+    # need the LLM to work out what the user means
+    if "book_appointment" in matched and intent != "book_appointment":
+        return None
+    if len(ACTION_INTENTS.intersection(matched)) > 1:
+        return None
+    # Leaving the waitlist is not covered by the rules
+    if re.search(r"\bwait\s*list\b", text) and re.search(r"\b(cancel|remove|leave|off)\b", text):
+        return None
+
+    # An id and a date together can be either reading; a wrong guess here would
+    # cancel or move the wrong row without the LLM ever seeing the message
+    if intent in ("cancel_appointment", "reschedule_appointment") and appointment_id and date:
+        return None
+
+    parameters = {}
+    if intent == "reschedule_appointment":
+        parameters = {"appointment_id": appointment_id, "new_date": date, "new_time": time}
+    elif intent == "cancel_appointment":
+        # Never cancel based on remembered context alone
+        if not appointment_id and not date:
+            return None
+        parameters = {"appointment_id": appointment_id, "date": date}
+    elif intent == "find_next_available":
+        parameters = {"doctor_name": doctor, "preferred_date": date or today.strftime("%Y-%m-%d")}
+    elif intent == "check_availability":
+        parameters = {"doctor_name": doctor, "date": date}
+    elif intent == "book_appointment":
+        parameters = {"doctor_name": doctor, "date": date, "time": time,
+                      "appointment_type": parse_appointment_type(text)}
+    elif intent == "get_appointments":
+        parameters = {"doctor_name": doctor} if doctor and not re.search(r"\bmy\b", text) else {}
+
+    parameters = {key: value for key, value in parameters.items() if value}
+
+    entities = {"doctor_name": doctor, "date": date, "time": time}
+    return {
+        "intent": intent,
+        "parameters": parameters,
+        "needs_clarification": False,
+        "clarification_question": None,
+        "extracted_entities": {key: value for key, value in entities.items() if value},
+        "confidence": LOCAL_CONFIDENCE,
+        "source": "local"
+    }
+
+
+_doctor_cache = TTLCache(max_entries=1, ttl_seconds=600)
+
+
+async def load_known_doctors() -> list:
+    """Active doctor names for entity matching, refreshed every 10 minutes"""
+    doctors = _doctor_cache.get("names")
+    if doctors is not None:
+        return doctors
+
+    try:
+        response = await supabase.table("doctors").select("name").eq("active", True).execute()
+        doctors = [row["name"] for row in response.data or [] if row.get("name")]
+    except Exception as e:
+        agent_logger.warning(f"Could not load doctor names for local intent parsing: {e}")
+        return []
+
+    _doctor_cache.set("names", doctors)
+    return doctors
@@ -1,101 +1,152 @@
 import json
+import os
 from datetime import datetime
 from app.agents.context_manager import context_store
-from app.config import client, DEPLOYMENT_NAME
+from app.agents.intent_parser import (
+    parse_intent, is_complete, load_known_doctors, CONTEXT_EXCLUDED_PARAMS
+)
+from app.config import async_client, DEPLOYMENT_NAME
 from app.utils.logger import agent_logger
+from app.utils.metrics import span, LLM_SECONDS, ROUTE_SECONDS
+from app.utils.tokens import count_message_tokens, fit_lines, llm_usage
 
-def route_request(user_message: str, session_id: str = "default"):
-    """
-    Uses GPT to extract intent and parameters.
-    """
-
-    context = context_store.get_or_create(session_id)
-
-    system_prompt = f"""You are an AI orchestrator for a clinical scheduling system that determines user intent.
-
-Current date/time: {datetime.now().strftime("%Y-%m-%d %H:%M")}
+# Identical on every call so the provider can cache it as a prompt prefix;
+# anything that changes per request goes in the suffix built by _router_suffix.
+# Azure only caches prefixes of 1024+ tokens, so the intent reference and the
+# examples live here rather than in the suffix (tests/test_orchestrator.py
+# keeps it above the threshold)
+ROUTER_SYSTEM_PROMPT = """You are an AI orchestrator for a clinical scheduling system that determines user intent.
 
-CONVERSATION CONTEXT:
-{context.get_context_summary()}
+The final system message before the user's message gives the current date/time and the
+conversation context. Earlier turns of the conversation appear before it.
 
 INSTRUCTIONS:
 1. Extract the user's intent from their message
-2. Use context to fill in missing information (e.g., if patient name was mentioned before)
+2. Use the conversation context to fill in missing information (e.g., if patient name was mentioned before)
 3. If critical information is missing and not in context, set needs_clarification=true
 4. Extract any new entities mentioned (names, dates, times, etc.)
 
 SUPPORTED INTENTS:
 - check_availability: Check if a doctor is available (needs: doctor_name, date)
-- book_appointment: Book an appointment (needs: patient_name, doctor_name, date, time)
-- cancel_appointment: Cancel an appointment (needs: appointment_id OR patient_name+date)
+- check_availability_batch: Check several doctors or days at once (needs: doctor_names as a list, date; optional: date_to for a range, weekends are skipped)
+- book_appointment: Book an appointment (needs: patient_name, doctor_name, date, time; optional: appointment_type, patient_email, patient_phone, notes)
+- book_series: Book a recurring series (needs: patient_name, doctor_name, start_date, time, and count or until; optional: frequency daily|weekly, interval e.g. 2 for every other, appointment_type)
+- cancel_appointment: Cancel an appointment (needs: appointment_id OR patient_name+date; optional: reason)
+- confirm_cancellation: Confirm a cancellation inside the 24 hour notice window after the patient agrees (needs: appointment_id; optional: reason)
 - reschedule_appointment: Reschedule (needs: appointment_id, new_date, new_time)
-- get_appointments: View appointments (needs: patient_name OR doctor_name)
+- get_appointments: View appointments (needs: patient_name OR doctor_name; optional: date_from, date_to, fields, page_size; for "show more" pass cursor = appointments_cursor or past_cursor = past_appointments_cursor from context)
 - get_history: View patient history (needs: patient_name)
-- find_next_available: Find next open slot (needs: doctor_name, preferred_date)
-- suggest_alternatives: Find other doctors (needs: specialty, date)
+- get_appointment_types: List the appointment types and their durations (needs: nothing)
+- find_next_available: Find next open slot (needs: doctor_name, preferred_date; optional: days_to_search, max_results for several openings)
+- suggest_alternatives: Find other doctors (needs: specialty, date; optional: time, date_to)
+- get_optimal_slots: Get best time slots based on doctor schedule and patient preferences (needs: doctor_name, date, duration_minutes or appointment_type; optional: step_minutes, buffer_minutes, min_gap_minutes)
+- add_to_waitlist: Join the waitlist for a day that is fully booked (needs: patient_name, doctor_name, date; optional: time, patient_email, appointment_type)
+- get_waitlist_status: Show a patient's waitlist entries and their place in the queue (needs: patient_name)
+- remove_from_waitlist: Leave the waitlist (needs: waitlist_id OR patient_name+doctor_name+date)
+- accept_waitlist_offer: Confirm a slot being held from the waitlist (needs: waitlist_id, and patient_name or patient_email of the patient it was offered to)
+- schedule_follow_up: Plan a follow-up visit after an appointment (needs: appointment_id; optional: days_after, default 14, notes)
 - general_inquiry: General questions about the system
-- get optimal slots: Get best time slots based on doctor schedule and patient preferences (needs: doctor_name, date, duration_minutes)
+
+PARAMETER CONVENTIONS:
+- Dates are YYYY-MM-DD and times are 24 hour HH:MM. Resolve relative dates ("tomorrow", "next Monday")
+  against the current date/time in the final system message.
+- doctor_name is the doctor's full name as given in the message or the context, without the "Dr."
+  title; doctor_names is a list of such names.
+- appointment_type is one of consultation, checkup, follow_up, procedure, emergency, vaccination,
+  physical_exam, lab_review.
+- Never invent an appointment_id or waitlist_id; take it from the message or the context, or ask for it.
+- A message that only asks about a hypothetical or negated action ("what if I cancelled", "don't book")
+  is general_inquiry, not the action itself.
+- When a required parameter is missing, keep the intent, leave the parameter out and set
+  needs_clarification=true with one short clarification_question naming what is missing.
+
+EXAMPLES:
+User: "Book Jane Doe with Dr. Sarah Smith on 2026-03-02 at 10:30 for a checkup"
+{"intent": "book_appointment", "parameters": {"patient_name": "Jane Doe", "doctor_name": "Sarah Smith", "date": "2026-03-02", "time": "10:30", "appointment_type": "checkup"}, "needs_clarification": false, "clarification_question": null, "confidence": 0.97}
+
+User: "Is Dr. Sarah Smith or Dr. James Lee free any day between March 2 and March 6?"
+{"intent": "check_availability_batch", "parameters": {"doctor_names": ["Sarah Smith", "James Lee"], "date": "2026-03-02", "date_to": "2026-03-06"}, "needs_clarification": false, "clarification_question": null, "confidence": 0.93}
+
+User: "Put me on the waitlist for Dr. Maria Garcia on Friday, March 6" (patient_name unknown)
+{"intent": "add_to_waitlist", "parameters": {"doctor_name": "Maria Garcia", "date": "2026-03-06"}, "needs_clarification": true, "clarification_question": "What name should the waitlist entry be under?", "confidence": 0.9}
+
+User: "Take me off the waitlist, entry 42"
+{"intent": "remove_from_waitlist", "parameters": {"waitlist_id": "42"}, "needs_clarification": false, "clarification_question": null, "confidence": 0.95}
+
+User: "Schedule a follow-up three weeks after appointment 118"
+{"intent": "schedule_follow_up", "parameters": {"appointment_id": "118", "days_after": 21}, "needs_clarification": false, "clarification_question": null, "confidence": 0.94}
 
 RESPONSE FORMAT (JSON only):
-{{
+{
     "intent": "intent_name",
-    "parameters": {{
+    "parameters": {
         "param1": "value1"
-    }},
+    },
     "needs_clarification": false,
     "clarification_question": null,
-    "extracted_entities": {{
+    "extracted_entities": {
         "patient_name": "extracted name if mentioned",
         "doctor_name": "extracted doctor if mentioned",
         "date": "extracted date if mentioned (YYYY-MM-DD format)",
         "time": "extracted time if mentioned (HH:MM format)"
-    }},
+    },
     "confidence": 0.95
-}}
+}
 """
 
-    messages = [{"role": "system", "content": system_prompt}]
-    
-    #Add recent conversation histoy
-    for turn in context.get_recent_history_for_prompt(3):
-        messages.append({"role": "user", "content": turn["user"]})
-        messages.append({"role": "assistant", "content": json.dumps({
-            "intent" : turn["intent"],
-            "parameters" : turn["parameters"],
-        })})
-    
+# Token budgets for the dynamic parts of the router prompt
+ROUTER_CONTEXT_TOKENS = int(os.getenv("ROUTER_CONTEXT_TOKENS", "250"))
+ROUTER_HISTORY_TOKENS = int(os.getenv("ROUTER_HISTORY_TOKENS", "600"))
+ROUTER_HISTORY_TURNS = 3
+
+async def route_request(user_message: str, session_id: str = "default"):
+    """
+    Extracts intent and parameters. Clear-cut requests are answered by the local
+    rule parser; everything else uses GPT.
+    """
+    with span("route", ROUTE_SECONDS):
+        return await _route_request(user_message, session_id)
+
+async def _route_request(user_message: str, session_id: str):
+
+    context = await context_store.get_or_create(session_id)
+
+    local_result = parse_intent(user_message, await load_known_doctors())
+    if local_result:
+        local_result["parameters"] = _fill_from_context(
+            local_result["parameters"], context, skip=CONTEXT_EXCLUDED_PARAMS.get(local_result["intent"], ())
+        )
+        if is_complete(local_result["intent"], local_result["parameters"]):
+            _remember_entities(local_result, context)
+            await context_store.save(context)
+            agent_logger.info(f"Routed locally to intent: {local_result['intent']}")
+            return local_result
+
+    messages = [{"role": "system", "content": ROUTER_SYSTEM_PROMPT}]
+    messages.extend(_history_messages(context))
+    messages.append({"role": "system", "content": _router_suffix(context)})
     messages.append({"role": "user", "content": user_message})
     
     try:
-        response = client.chat.completions.create(
-            model=DEPLOYMENT_NAME,
-            messages=messages,
-            temperature=0,
-            response_format={"type": "json_object"}
-        )
+        with span("llm", LLM_SECONDS, call="router"):
+            response = await async_client.chat.completions.create(
+                model=DEPLOYMENT_NAME,
+                messages=messages,
+                temperature=0,
+                response_format={"type": "json_object"}
+            )
         
+        usage = llm_usage.record("router", response.usage)
         result = json.loads(response.choices[0].message.content)
-
-        # 1) Update context with extracted entities (if provided)
-        for key, value in (result.get("extracted_entities") or {}).items():
-            if value:
-                context.update_entity(key, value)
-
-        # 2) Fill in parameters with context if missing
-        result["parameters"] = _fill_from_context(result.get("parameters") or {}, context)
-
-        # 3) ALSO persist key entities from parameters (covers models that omit extracted_entities)
-        params = result["parameters"]
-        for key in ("patient_name", "doctor_name", "date", "time", "appointment_type"):
-            if params.get(key):
-                context.update_entity(key, params.get(key))
-
-        # Helpful alias: if intent uses preferred_date, store it as date context too
-        if params.get("preferred_date"):
-            context.update_entity("date", params.get("preferred_date"))
+        result["parameters"] = result.get("parameters") or {}
+        result["usage"] = usage
+        _remember_entities(result, context)
+        await context_store.save(context)
 
         agent_logger.info(
-            f"Routed to intent: {result.get('intent')} with confidence: {result.get('confidence', 'N/A')}"
+            f"Routed to intent: {result.get('intent')} with confidence: {result.get('confidence', 'N/A')} "
+            f"(prompt ~{count_message_tokens(messages)} est, {usage.get('prompt_tokens')} prompt, "
+            f"{usage.get('cached_tokens')} cached, {usage.get('completion_tokens')} completion tokens)"
         )
         return result
 
@@ -117,8 +168,61 @@ RESPONSE FORMAT (JSON only):
             "error": str(e)
         }
 
-def _fill_from_context(parameters: dict, context) -> dict:
-    """Fill missing parameters from conversation context"""
+def _router_suffix(context) -> str:
+    """Per-request part of the router prompt: clock and context, capped at ROUTER_CONTEXT_TOKENS"""
+    # Most recently updated entities first, so the budget drops the stalest ones
+    entities = sorted(
+        context.extracted_info.items(), key=lambda item: item[1]["updated_at"], reverse=True
+    )
+    lines = fit_lines([f"- {key}: {data['value']}" for key, data in entities], ROUTER_CONTEXT_TOKENS)
+    summary = "Known information:\n" + "\n".join(lines) if lines else "No previous context."
+    
+    return (
+        f"Current date/time: {datetime.now().strftime('%Y-%m-%d %H:%M (%A)')}\n\n"
+        f"CONVERSATION CONTEXT:\n{summary}"
+    )
+
+def _history_messages(context) -> list:
+    """Recent turns as user/assistant pairs, newest kept first within ROUTER_HISTORY_TOKENS"""
+    budget = ROUTER_HISTORY_TOKENS
+    messages = []
+    for turn in reversed(context.get_recent_history_for_prompt(ROUTER_HISTORY_TURNS)):
+        pair = [
+            {"role": "user", "content": turn["user"]},
+            {"role": "assistant", "content": json.dumps({
+                "intent": turn["intent"],
+                "parameters": turn["parameters"],
+            }, separators=(",", ":"))}
+        ]
+        budget -= count_message_tokens(pair)
+        if budget < 0:
+            break
+        messages[:0] = pair
+    return messages
+
+def _remember_entities(result: dict, context):
+    """Store extracted entities and fill missing parameters from context"""
+
+    # 1) Update context with extracted entities (if provided)
+    for key, value in (result.get("extracted_entities") or {}).items():
+        if value:
+            context.update_entity(key, value)
+
+    # 2) Fill in parameters with context if missing
+    result["parameters"] = _fill_from_context(result["parameters"], context)
+
+    # 3) ALSO persist key entities from parameters (covers models that omit extracted_entities)
+    params = result["parameters"]
+    for key in ("patient_name", "doctor_name", "date", "time", "appointment_type"):
+        if params.get(key):
+            context.update_entity(key, params.get(key))
+
+    # Helpful alias: if intent uses preferred_date, store it as date context too
+    if params.get("preferred_date"):
+        context.update_entity("date", params.get("preferred_date"))
+
+def _fill_from_context(parameters: dict, context, skip: tuple = ()) -> dict:
+    """Fill missing parameters from conversation context, except those in `skip`"""
     
     context_mappings = {
         "patient_name": "patient_name",
@@ -129,6 +233,8 @@ def _fill_from_context(parameters: dict, context) -> dict:
     }
     
     for param, context_key in context_mappings.items():
+        if param in skip:
+            continue
         if not parameters.get(param):
             context_value = context.get_entity(context_key)
             if context_value:
@@ -136,11 +242,20 @@ def _fill_from_context(parameters: dict, context) -> dict:
     
     return parameters
 
-def update_context_after_execution(session_id: str, user_message: str, intent: str, parameters: dict, result: dict):
+async def update_context_after_execution(session_id: str, user_message: str, intent: str, parameters: dict, result: dict):
     """Update conversation context after executing an action"""
-    context = context_store.get_or_create(session_id)
+    context = await context_store.get_or_create(session_id)
     context.add_turn(user_message, intent, parameters, result)
+    # Page tokens let a follow-up "show more" continue the same listing
+    if intent == "get_appointments" and result.get("success"):
+        for key, token in (("appointments_cursor", result.get("next_cursor")),
+                           ("past_appointments_cursor", result.get("past_next_cursor"))):
+            if token:
+                context.update_entity(key, token)
+            else:
+                context.extracted_info.pop(key, None)
+    await context_store.save(context)
     
-def clear_context(session_id: str):
+async def clear_context(session_id: str):
     """Clear conversation context for a session"""
-    context_store.clear_session(session_id)
\ No newline at end of file
+    await context_store.clear_session(session_id)
\ No newline at end of file
@@ -1,59 +1,171 @@
+import asyncio
+import base64
+import json
+import re
+from collections import Counter
 from app.database import supabase
 from datetime import datetime, timedelta
 from app.utils.logger import agent_logger
 
-def get_patient_appointments(patient_name: str = None, doctor_name: str = None,
+# Default projection for appointment lists; wide columns like notes are opt-in via `fields`
+APPOINTMENT_LIST_COLUMNS = [
+    "id", "patient_name", "doctor_name", "appointment_date", "appointment_time",
+    "end_time", "appointment_type", "status"
+]
+# Keyset columns, always selected so a cursor can be built from the last row
+KEYSET_COLUMNS = ["appointment_date", "appointment_time", "id"]
+MAX_PAGE_SIZE = 100
+FIELD_NAME_RE = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+def encode_cursor(row: dict) -> str:
+    """Opaque page token for the position just after `row`"""
+    key = [row["appointment_date"], row["appointment_time"], row["id"]]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+def decode_cursor(token: str) -> list:
+    padded = token + "=" * (-len(token) % 4)
+    key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    if not isinstance(key, list) or len(key) != 3:
+        raise ValueError("malformed cursor")
+    return key
+
+def _keyset_filter(key: list, op: str) -> str:
+    """PostgREST or-filter for rows strictly after (op=gt) or before (op=lt) the key"""
+    date, time, row_id = (f'"{value}"' for value in key)
+    return (
+        f"appointment_date.{op}.{date},"
+        f"and(appointment_date.eq.{date},appointment_time.{op}.{time}),"
+        f"and(appointment_date.eq.{date},appointment_time.eq.{time},id.{op}.{row_id})"
+    )
+
+def _select_columns(fields) -> str:
+    if not fields:
+        columns = list(APPOINTMENT_LIST_COLUMNS)
+    else:
+        if isinstance(fields, str):
+            fields = fields.split(",")
+        columns = [field.strip() for field in fields if field and field.strip()]
+        invalid = [field for field in columns if not FIELD_NAME_RE.match(field)]
+        if invalid:
+            raise ValueError(f"Invalid fields: {', '.join(invalid)}")
+    return ", ".join(columns + [column for column in KEYSET_COLUMNS if column not in columns])
+
+def _page(rows: list, page_size: int):
+    """Trim the look-ahead row and build the next cursor"""
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
+
+async def get_patient_appointments(patient_name: str = None, doctor_name: str = None,
                              date_from: str = None, date_to: str = None,
-                             include_cancelled: bool = False):
-    """Get appointments with flexible filters"""
+                             include_cancelled: bool = False, fields=None,
+                             cursor: str = None, past_cursor: str = None,
+                             page_size: int = 20, past_limit: int = 10):
+    """
+    Get appointments with flexible filters.
+    Upcoming and past appointments are separate bounded queries ordered by
+    (date, time, id); `cursor` / `past_cursor` continue either list from a
+    previous response's next_cursor / past_next_cursor. A list's first page
+    also reports how many rows match in total (upcoming_total / past_total);
+    continuation pages skip the count.
+    """
     
     if not patient_name and not doctor_name:
         return {"success": False, "error": "Provide patient_name or doctor_name"}
     
-    query = supabase.table("appointments").select("*")
+    try:
+        columns = _select_columns(fields)
+        upcoming_key = decode_cursor(cursor) if cursor else None
+        past_key = decode_cursor(past_cursor) if past_cursor else None
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
     
-    if not include_cancelled:
-        query = query.neq("status", "cancelled")
-    
-    if patient_name:
-        query = query.eq("patient_name", patient_name)
-    if doctor_name:
-        query = query.eq("doctor_name", doctor_name)
-    if date_from:
-        query = query.gte("appointment_date", date_from)
-    if date_to:
-        query = query.lte("appointment_date", date_to)
-    
-    response = query.order("appointment_date", desc=False).execute()
-    
-    appointments = response.data or []
+    page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+    past_limit = max(0, min(int(past_limit), MAX_PAGE_SIZE))
     today = datetime.now().strftime("%Y-%m-%d")
     
-    upcoming = [a for a in appointments if a["appointment_date"] >= today and a["status"] != "cancelled"]
-    past = [a for a in appointments if a["appointment_date"] < today]
-    
-    return {
+    def base_query(count: bool):
+        # Counted only without a cursor predicate, so the count is the whole list
+        query = supabase.table("appointments").select(columns, count="exact" if count else None)
+        if patient_name:
+            query = query.eq("patient_name", patient_name)
+        if doctor_name:
+            query = query.eq("doctor_name", doctor_name)
+        return query
+    
+    # Upcoming: today onwards, never cancelled, ascending
+    upcoming_query = base_query(count=not upcoming_key).gte("appointment_date", max(today, date_from or today)).neq("status", "cancelled")
+    if date_to:
+        upcoming_query = upcoming_query.lte("appointment_date", date_to)
+    if upcoming_key:
+        upcoming_query = upcoming_query.or_(_keyset_filter(upcoming_key, "gt"))
+    upcoming_query = upcoming_query.order("appointment_date").order("appointment_time").order("id").limit(page_size + 1)
+    
+    # Past: before today, most recent first; only fetched on the first page or when paging it
+    queries = [upcoming_query.execute()]
+    if past_limit and (past_key or not upcoming_key):
+        past_query = base_query(count=not past_key).lt("appointment_date", today)
+        if date_to:
+            past_query = past_query.lte("appointment_date", date_to)
+        if not include_cancelled:
+            past_query = past_query.neq("status", "cancelled")
+        if date_from:
+            past_query = past_query.gte("appointment_date", date_from)
+        if past_key:
+            past_query = past_query.or_(_keyset_filter(past_key, "lt"))
+        past_query = past_query.order("appointment_date", desc=True).order(
+            "appointment_time", desc=True
+        ).order("id", desc=True).limit(past_limit + 1)
+        queries.append(past_query.execute())
+    
+    responses = await asyncio.gather(*queries)
+    
+    upcoming, next_cursor = _page(responses[0].data or [], page_size)
+    result = {
         "success": True,
         "upcoming": upcoming,
-        "upcoming_count": len(upcoming),
-        "past": past[-10:],  # Last 10 past appointments
-        "past_count": len(past),
-        "total": len(appointments)
+        "next_cursor": next_cursor
     }
+    if not upcoming_key:
+        result["upcoming_total"] = responses[0].count if responses[0].count is not None else len(upcoming)
+    
+    if len(responses) > 1:
+        past, past_next_cursor = _page(responses[1].data or [], past_limit)
+        result.update({"past": past, "past_next_cursor": past_next_cursor})
+        if not past_key:
+            result["past_total"] = responses[1].count if responses[1].count is not None else len(past)
+    
+    if "upcoming_total" in result:
+        result["total"] = result["upcoming_total"] + result.get("past_total", 0)
+    return result
+
+# Columns the history statistics need; notes and other wide columns stay in the database
+HISTORY_STAT_COLUMNS = "status, doctor_name, appointment_type, appointment_date"
+RECENT_APPOINTMENT_COLUMNS = "id, appointment_date, appointment_time, end_time, doctor_name, appointment_type, status"
+RECENT_APPOINTMENTS_LIMIT = 5
 
-def get_appointment_history(patient_name: str):
+async def get_appointment_history(patient_name: str):
     """Get full appointment history with statistics"""
     
     if not patient_name:
         return {"success": False, "error": "Patient name required"}
     
-    response = supabase.table("appointments").select("*").eq(
-        "patient_name", patient_name
-    ).order("appointment_date", desc=True).execute()
-    
-    appointments = response.data or []
-    
-    if not appointments:
+    # Statistics over narrow rows, recent appointments as a bounded query, both in flight together
+    stats_response, recent_response = await asyncio.gather(
+        supabase.table("appointments").select(HISTORY_STAT_COLUMNS).eq(
+            "patient_name", patient_name
+        ).execute(),
+        supabase.table("appointments").select(RECENT_APPOINTMENT_COLUMNS).eq(
+            "patient_name", patient_name
+        ).order("appointment_date", desc=True).order("appointment_time", desc=True).limit(
+            RECENT_APPOINTMENTS_LIMIT
+        ).execute()
+    )
+    
+    rows = stats_response.data or []
+    
+    if not rows:
         return {
             "success": True,
             "patient": patient_name,
@@ -61,36 +173,29 @@ def get_appointment_history(patient_name: str):
             "total_appointments": 0
         }
     
-    # Calculate statistics
-    stats = {
-        "completed": len([a for a in appointments if a.get("status") == "completed"]),
-        "cancelled": len([a for a in appointments if a.get("status") == "cancelled"]),
-        "no_show": len([a for a in appointments if a.get("status") == "no_show"]),
-        "confirmed": len([a for a in appointments if a.get("status") == "confirmed"])
-    }
-    
-    # Frequently visited doctors
-    doctor_visits = {}
-    for apt in appointments:
-        if apt.get("status") != "cancelled":
-            doc = apt["doctor_name"]
-            doctor_visits[doc] = doctor_visits.get(doc, 0) + 1
-    
-    frequent_doctors = sorted(doctor_visits.items(), key=lambda x: -x[1])[:3]
-    
-    # Common appointment types
-    type_counts = {}
-    for apt in appointments:
-        apt_type = apt.get("appointment_type", "consultation")
-        type_counts[apt_type] = type_counts.get(apt_type, 0) + 1
+    # One pass over the projected rows
+    stats = {"completed": 0, "cancelled": 0, "no_show": 0, "confirmed": 0}
+    doctor_visits = Counter()
+    type_counts = Counter()
+    first_visit = None
+    
+    for apt in rows:
+        status = apt.get("status")
+        if status in stats:
+            stats[status] += 1
+        if status != "cancelled":
+            doctor_visits[apt["doctor_name"]] += 1
+        type_counts[apt.get("appointment_type") or "consultation"] += 1
+        if first_visit is None or apt["appointment_date"] < first_visit:
+            first_visit = apt["appointment_date"]
     
     return {
         "success": True,
         "patient": patient_name,
-        "total_appointments": len(appointments),
+        "total_appointments": len(rows),
         "statistics": stats,
-        "frequent_doctors": [{"name": d[0], "visits": d[1]} for d in frequent_doctors],
-        "common_appointment_types": type_counts,
-        "recent_appointments": appointments[:5],
-        "first_visit": appointments[-1]["appointment_date"] if appointments else None
-    }
\ No newline at end of file
+        "frequent_doctors": [{"name": name, "visits": visits} for name, visits in doctor_visits.most_common(3)],
+        "common_appointment_types": dict(type_counts),
+        "recent_appointments": recent_response.data or [],
+        "first_visit": first_visit
+    }
@@ -1,37 +1,30 @@
 from app.database import supabase
-from app.utils.email_service import send_email
+from app.utils.email_service import send_email_batch
 from app.utils.logger import agent_logger
 from datetime import datetime, timedelta
 from typing import List
+import asyncio
+import os
+import random
+import time
 
-async def send_appointment_reminders(hours_before: int = 24) -> dict:
-    """Send reminders for upcoming appointments"""
-    
-    target_datetime = datetime.now() + timedelta(hours=hours_before)
-    target_date = target_datetime.strftime("%Y-%m-%d")
-    
-    response = supabase.table("appointments").select("*").eq(
-        "appointment_date", target_date
-    ).eq("status", "confirmed").eq("reminder_sent", False).execute()
-    
-    appointments = response.data or []
-    sent_count = 0
-    failed = []
-    
-    for appointment in appointments:
-        if not appointment.get("patient_email"):
-            continue
-        
-        email_body = f"""
-Dear {appointment['patient_name']},
+REMINDER_CONCURRENCY = int(os.getenv("REMINDER_CONCURRENCY", "4"))
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "500"))
+REMINDER_MAX_ATTEMPTS = 3
+REMINDER_BACKOFF_SECONDS = 0.5
+
+REMINDER_SUBJECT = "Reminder: Appointment Tomorrow with Dr. {doctor_name}"
+
+REMINDER_TEMPLATE = """
+Dear {patient_name},
 
 This is a friendly reminder about your upcoming appointment:
 
-📅 Date: {appointment['appointment_date']}
-🕐 Time: {appointment['appointment_time']}
-👨‍⚕️ Doctor: Dr. {appointment['doctor_name']}
-📋 Type: {appointment.get('appointment_type', 'Consultation').title()}
-⏱️ Duration: {appointment.get('duration_minutes', 30)} minutes
+📅 Date: {appointment_date}
+🕐 Time: {appointment_time}
+👨‍⚕️ Doctor: Dr. {doctor_name}
+📋 Type: {appointment_type}
+⏱️ Duration: {duration_minutes} minutes
 
 Please arrive 10-15 minutes early to complete any necessary paperwork.
 
@@ -39,38 +32,160 @@ If you need to reschedule or cancel, please contact us at least 24 hours in adva
 
 Thank you for choosing our clinic!
         """
+
+REMINDER_FIELDS = ("patient_name", "appointment_date", "appointment_time",
+                   "doctor_name", "appointment_type", "duration_minutes")
+
+# Rendered once per run; per-patient values travel as substitutions so one
+# API call can carry a whole batch
+_REMINDER_TOKENS = {field: f"-{field}-" for field in REMINDER_FIELDS}
+
+def _render_reminders(appointments: list) -> list:
+    """Render every reminder message up front"""
+    subject = REMINDER_SUBJECT.format(**_REMINDER_TOKENS)
+    content = REMINDER_TEMPLATE.format(**_REMINDER_TOKENS)
+    
+    messages = []
+    for apt in appointments:
+        fields = {
+            "patient_name": apt["patient_name"],
+            "appointment_date": apt["appointment_date"],
+            "appointment_time": apt["appointment_time"],
+            "doctor_name": apt["doctor_name"],
+            "appointment_type": (apt.get("appointment_type") or "Consultation").title(),
+            "duration_minutes": apt.get("duration_minutes") or 30
+        }
+        messages.append({
+            "id": apt["id"],
+            "to_email": apt["patient_email"],
+            "subject": subject,
+            "content": content,
+            "substitutions": {_REMINDER_TOKENS[key]: str(value) for key, value in fields.items()}
+        })
+    return messages
+
+async def _send_batch_with_retry(batch: list, semaphore: asyncio.Semaphore, stats: dict) -> list:
+    """Send a batch, retrying only the failed messages with exponential backoff and jitter"""
+    results = [False] * len(batch)
+    pending = list(range(len(batch)))
+    
+    for attempt in range(REMINDER_MAX_ATTEMPTS):
+        if attempt:
+            stats["retries"] += len(pending)
+            await asyncio.sleep(REMINDER_BACKOFF_SECONDS * 2 ** (attempt - 1) * (1 + random.random()))
+        
+        async with semaphore:
+            sent = await send_email_batch([batch[i] for i in pending])
         
+        for i, ok in zip(pending, sent):
+            results[i] = ok
+        pending = [i for i in pending if not results[i]]
+        if not pending:
+            break
+    
+    if pending:
+        agent_logger.error(f"Failed to send {len(pending)} reminders after {REMINDER_MAX_ATTEMPTS} attempts")
+    return results
+
+async def _mark_sent_with_retry(sent_ids: list, stats: dict) -> bool:
+    """Mark delivered reminders with one update, retrying with backoff so they aren't sent twice"""
+    for attempt in range(REMINDER_MAX_ATTEMPTS):
+        if attempt:
+            stats["mark_retries"] += 1
+            await asyncio.sleep(REMINDER_BACKOFF_SECONDS * 2 ** (attempt - 1) * (1 + random.random()))
         try:
-            success = send_email(
-                to_email=appointment["patient_email"],
-                subject=f"Reminder: Appointment Tomorrow with Dr. {appointment['doctor_name']}",
-                body=email_body
-            )
-            
-            if success:
-                supabase.table("appointments").update({
-                    "reminder_sent": True
-                }).eq("id", appointment["id"]).execute()
-                sent_count += 1
-                agent_logger.info(f"Reminder sent for appointment {appointment['id']}")
-            else:
-                failed.append(appointment["id"])
+            await supabase.table("appointments").update({
+                "reminder_sent": True
+            }).in_("id", sent_ids).execute()
+            return True
         except Exception as e:
-            agent_logger.error(f"Failed to send reminder for {appointment['id']}: {e}")
-            failed.append(appointment["id"])
+            error = e
+    
+    agent_logger.error(
+        f"Sent {len(sent_ids)} reminders but could not mark them after {REMINDER_MAX_ATTEMPTS} attempts "
+        f"(they may be sent again next run): {error}"
+    )
+    return False
+
+async def _process_batch(batch: list, semaphore: asyncio.Semaphore, stats: dict):
+    """Send one batch and mark its successful IDs with a single update"""
+    results = await _send_batch_with_retry(batch, semaphore, stats)
+    
+    sent_ids = [m["id"] for m, ok in zip(batch, results) if ok]
+    stats["failed"].extend(m["id"] for m, ok in zip(batch, results) if not ok)
+    stats["sent"] += len(sent_ids)
+    
+    # Delivered either way; a failed mark is reported apart from send failures
+    if sent_ids and not await _mark_sent_with_retry(sent_ids, stats):
+        stats["unmarked"].extend(sent_ids)
+
+async def send_appointment_reminders(hours_before: int = 24) -> dict:
+    """
+    Send reminders for upcoming appointments.
+    Messages are rendered in bulk and sent as batched API calls with bounded
+    concurrency; successful IDs are marked reminder_sent with one update per batch.
+    """
+    
+    timings = {}
+    stats = {"retries": 0, "mark_retries": 0, "sent": 0, "failed": [], "unmarked": []}
+    run_started = time.perf_counter()
+    
+    target_datetime = datetime.now() + timedelta(hours=hours_before)
+    target_date = target_datetime.strftime("%Y-%m-%d")
+    
+    stage_started = time.perf_counter()
+    response = await supabase.table("appointments").select(
+        "id, patient_name, patient_email, doctor_name, appointment_date, "
+        "appointment_time, appointment_type, duration_minutes"
+    ).eq("appointment_date", target_date).eq("status", "confirmed").eq("reminder_sent", False).execute()
+    timings["fetch"] = time.perf_counter() - stage_started
+    
+    appointments = response.data or []
+    
+    stage_started = time.perf_counter()
+    messages = _render_reminders([apt for apt in appointments if apt.get("patient_email")])
+    timings["render"] = time.perf_counter() - stage_started
+    
+    semaphore = asyncio.Semaphore(REMINDER_CONCURRENCY)
+    
+    # Batches are sent and marked concurrently (bounded by the semaphore), so
+    # the stage is timed as a whole: per-batch times would overlap
+    stage_started = time.perf_counter()
+    await asyncio.gather(*(
+        _process_batch(messages[i:i + REMINDER_BATCH_SIZE], semaphore, stats)
+        for i in range(0, len(messages), REMINDER_BATCH_SIZE)
+    ))
+    timings["send"] = time.perf_counter() - stage_started
+    sent_count = stats["sent"]
+    failed = stats["failed"]
+    
+    elapsed = time.perf_counter() - run_started
+    agent_logger.info(
+        f"Reminder run for {target_date}: {sent_count} sent, {len(failed)} failed, "
+        f"{len(stats['unmarked'])} not marked sent in {elapsed:.2f}s"
+    )
     
     return {
         "success": True,
         "reminders_sent": sent_count,
         "failed": len(failed),
+        "failed_ids": failed,
+        "mark_failed": len(stats["unmarked"]),
+        "mark_failed_ids": stats["unmarked"],
+        "skipped_no_email": len(appointments) - len(messages),
         "target_date": target_date,
-        "total_found": len(appointments)
+        "total_found": len(appointments),
+        "retries": stats["retries"],
+        "mark_retries": stats["mark_retries"],
+        "timings_seconds": {stage: round(seconds, 4) for stage, seconds in timings.items()},
+        "elapsed_seconds": round(elapsed, 4),
+        "throughput_per_second": round(sent_count / elapsed, 2) if elapsed else 0.0
     }
 
-def schedule_follow_up(appointment_id: str, days_after: int = 14, notes: str = None):
+async def schedule_follow_up(appointment_id: str, days_after: int = 14, notes: str = None):
     """Suggest follow-up appointment after a visit"""
     
-    original = supabase.table("appointments").select("*").eq("id", appointment_id).execute()
+    original = await supabase.table("appointments").select("*").eq("id", appointment_id).execute()
     
     if not original.data:
         return {"success": False, "error": "Original appointment not found"}
@@ -101,12 +216,12 @@ def schedule_follow_up(appointment_id: str, days_after: int = 14, notes: str = N
         "message": f"Follow-up suggested for {follow_up_date_str}"
     }
 
-def get_pending_reminders() -> dict:
+async def get_pending_reminders() -> dict:
     """Get list of appointments pending reminders"""
     
     tomorrow = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
     
-    response = supabase.table("appointments").select(
+    response = await supabase.table("appointments").select(
         "id, patient_name, doctor_name, appointment_date, appointment_time, patient_email"
     ).eq("appointment_date", tomorrow).eq("status", "confirmed").eq("reminder_sent", False).execute()
     
@@ -1,15 +1,35 @@
 from app.database import supabase
+from app.agents.booking_agent import _calculate_end_time
+from app.utils.availability_index import availability_index
 
-def reschedule_appointment(parameters: dict):
-    response = supabase.table("appointments") \
+async def reschedule_appointment(appointment_id: str, new_date: str, new_time: str):
+    if not all([appointment_id, new_date, new_time]):
+        return {"success": False, "error": "appointment_id, new_date and new_time are required"}
+
+    original = await supabase.table("appointments").select(
+        "doctor_name, appointment_date, duration_minutes"
+    ).eq("id", appointment_id).execute()
+
+    if not original.data:
+        return {"success": False, "error": "Appointment not found"}
+
+    apt = original.data[0]
+
+    response = await supabase.table("appointments") \
         .update({
-            "appointment_date": parameters.get("new_date"),
-            "appointment_time": parameters.get("new_time")
+            "appointment_date": new_date,
+            "appointment_time": new_time,
+            "end_time": _calculate_end_time(new_time, apt.get("duration_minutes") or 30)
         }) \
-        .eq("id", parameters.get("appointment_id")) \
+        .eq("id", appointment_id) \
         .execute()
 
+    # Both the old and the new doctor-day changed
+    availability_index.invalidate(apt["doctor_name"], apt["appointment_date"])
+    availability_index.invalidate(apt["doctor_name"], new_date)
+
     return {
+        "success": bool(response.data),
         "status": "rescheduled",
         "updated": response.data
     }
@@ -0,0 +1,363 @@
+from datetime import datetime
+from typing import Optional
+
+# Intents whose results need free-form wording; everything else is rendered from templates
+LLM_INTENTS = {"general_inquiry"}
+
+DEFAULT_LOCALE = "en"
+
+# How many items of a list are spelled out before "and N more"
+MAX_LISTED = 6
+
+RESPONSE_STRINGS = {
+    "en": {
+        "weekdays": ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"],
+        "months": ["January", "February", "March", "April", "May", "June", "July",
+                   "August", "September", "October", "November", "December"],
+        "date": "{weekday}, {month} {day}",
+        "date_year": "{weekday}, {month} {day}, {year}",
+        "list_more": "and {count} more",
+        "list_join": ", ",
+        "error": "❌ {error}",
+        "done": "✅ {message}",
+        "default_done": "Request completed successfully.",
+        "availability": "✅ Dr. {doctor} has {count} open slots on {date}: {slots}.",
+        "availability_none": "😕 Dr. {doctor} has no open slots on {date}.",
+        "availability_batch_line": "• Dr. {doctor}: {slots}",
+        "availability_batch_none": "😕 None of those doctors have open slots between {date_from} and {date_to}.",
+        "availability_batch_day": "{date}: {count} open",
+        "booked": "✅ Booked {type} for {date} at {time}–{end_time} (confirmation #{id}).",
+        "series_booked": "✅ Booked {booked} of {requested} appointments: {dates}.",
+        "series_conflict": "⚠️ {date} at {time} is taken. Nearest free times: {alternatives}.",
+        "series_conflict_none": "⚠️ {date} at {time} is taken and that day is full.",
+        "series_weekend": "⚠️ Skipped weekend dates (the clinic is closed): {dates}.",
+        "conflict": "❌ That time isn't free ({error}).",
+        "conflict_alternatives": "🕐 Nearest free times that day: {alternatives}.",
+        "rescheduled": "🔄 Your appointment is now on {date} at {time}.",
+        "cancelled": "✅ Your appointment with Dr. {doctor} on {date} at {time} is cancelled.",
+        "cancelled_waitlist": "We'll let patients on the waitlist know the slot is free.",
+        "appointments": "📋 {count} upcoming appointments:",
+        "appointments_page": "📋 {count} more upcoming appointments:",
+        "appointments_none": "📋 No upcoming appointments.",
+        "appointment_line": "• {date} at {time} with Dr. {doctor} ({type})",
+        "appointments_past": "Recent past visits: {count}.",
+        "appointments_more": "Say \"show more\" to see the next page.",
+        "history": "📊 {patient} has {total} appointments since {first_visit}: {completed} completed, {cancelled} cancelled, {no_show} missed.",
+        "history_doctors": "Most seen: {doctors}.",
+        "history_none": "📊 No appointment history found for {patient}.",
+        "types": "🩺 Appointment types: {types}.",
+        "type_item": "{name} ({minutes} min)",
+        "next_available": "✅ Dr. {doctor}'s next opening is {date}: {slots}.",
+        "next_available_preferred": "✅ Dr. {doctor} has openings on your preferred date, {date}: {slots}.",
+        "alternatives": "👨‍⚕️ Other {specialty} doctors with openings:",
+        "alternative_line": "• Dr. {name} on {date}: {slots}",
+        "alternatives_none": "😕 No other {specialty} doctors have openings.",
+        "optimal_slots": "🕐 Times that fit a {duration}-minute visit with Dr. {doctor} on {date}: {slots}.",
+        "optimal_slots_none": "😕 A {duration}-minute visit doesn't fit anywhere in Dr. {doctor}'s day on {date}.",
+        "waitlist_added": "📝 You're #{position} on the waitlist for Dr. {doctor}. We'll email you if a slot opens.",
+        "waitlist_status": "📋 Your waitlist entries:",
+        "waitlist_line": "• Dr. {doctor} on {date}: #{position} of {queue_length}",
+        "waitlist_none": "📋 You're not on any waitlist.",
+        "offer_accepted": "✅ Confirmed! You're booked on {date} at {time}.",
+        "follow_up": "📆 Suggested follow-up with Dr. {doctor} on {date}.",
+        "confirm_required": "⚠️ {warning}\n\nWould you like to proceed anyway? Reply with 'yes' to confirm.",
+        "suggestion": "💡 Suggestion: {suggestion}",
+    },
+    "es": {
+        "weekdays": ["lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo"],
+        "months": ["enero", "febrero", "marzo", "abril", "mayo", "junio", "julio",
+                   "agosto", "septiembre", "octubre", "noviembre", "diciembre"],
+        "date": "{weekday} {day} de {month}",
+        "date_year": "{weekday} {day} de {month} de {year}",
+        "list_more": "y {count} más",
+        "list_join": ", ",
+        "error": "❌ {error}",
+        "done": "✅ {message}",
+        "default_done": "Solicitud completada.",
+        "availability": "✅ El Dr. {doctor} tiene {count} horarios libres el {date}: {slots}.",
+        "availability_none": "😕 El Dr. {doctor} no tiene horarios libres el {date}.",
+        "availability_batch_line": "• Dr. {doctor}: {slots}",
+        "availability_batch_none": "😕 Ninguno de esos médicos tiene horarios libres entre el {date_from} y el {date_to}.",
+        "availability_batch_day": "{date}: {count} libres",
+        "booked": "✅ Reservada {type} para el {date} de {time} a {end_time} (confirmación n.º {id}).",
+        "series_booked": "✅ Reservadas {booked} de {requested} citas: {dates}.",
+        "series_conflict": "⚠️ El {date} a las {time} está ocupado. Horarios libres más cercanos: {alternatives}.",
+        "series_conflict_none": "⚠️ El {date} a las {time} está ocupado y ese día está completo.",
+        "series_weekend": "⚠️ Fechas de fin de semana omitidas (la clínica está cerrada): {dates}.",
+        "conflict": "❌ Ese horario no está libre ({error}).",
+        "conflict_alternatives": "🕐 Horarios libres más cercanos ese día: {alternatives}.",
+        "rescheduled": "🔄 Su cita ahora es el {date} a las {time}.",
+        "cancelled": "✅ Su cita con el Dr. {doctor} el {date} a las {time} está cancelada.",
+        "cancelled_waitlist": "Avisaremos a los pacientes en lista de espera de que el horario está libre.",
+        "appointments": "📋 {count} próximas citas:",
+        "appointments_page": "📋 {count} próximas citas más:",
+        "appointments_none": "📋 No hay citas próximas.",
+        "appointment_line": "• {date} a las {time} con el Dr. {doctor} ({type})",
+        "appointments_past": "Visitas pasadas recientes: {count}.",
+        "appointments_more": "Diga \"mostrar más\" para ver la página siguiente.",
+        "history": "📊 {patient} tiene {total} citas desde el {first_visit}: {completed} completadas, {cancelled} canceladas, {no_show} ausencias.",
+        "history_doctors": "Médicos más visitados: {doctors}.",
+        "history_none": "📊 No hay historial de citas para {patient}.",
+        "types": "🩺 Tipos de cita: {types}.",
+        "type_item": "{name} ({minutes} min)",
+        "next_available": "✅ El próximo hueco del Dr. {doctor} es el {date}: {slots}.",
+        "next_available_preferred": "✅ El Dr. {doctor} tiene huecos en la fecha que prefiere, {date}: {slots}.",
+        "alternatives": "👨‍⚕️ Otros médicos de {specialty} con huecos:",
+        "alternative_line": "• Dr. {name} el {date}: {slots}",
+        "alternatives_none": "😕 Ningún otro médico de {specialty} tiene huecos.",
+        "optimal_slots": "🕐 Horarios para una visita de {duration} minutos con el Dr. {doctor} el {date}: {slots}.",
+        "optimal_slots_none": "😕 Una visita de {duration} minutos no cabe en la agenda del Dr. {doctor} el {date}.",
+        "waitlist_added": "📝 Es el n.º {position} en la lista de espera del Dr. {doctor}. Le escribiremos si se libera un horario.",
+        "waitlist_status": "📋 Sus listas de espera:",
+        "waitlist_line": "• Dr. {doctor} el {date}: n.º {position} de {queue_length}",
+        "waitlist_none": "📋 No está en ninguna lista de espera.",
+        "offer_accepted": "✅ ¡Confirmado! Tiene cita el {date} a las {time}.",
+        "follow_up": "📆 Seguimiento sugerido con el Dr. {doctor} el {date}.",
+        "confirm_required": "⚠️ {warning}\n\n¿Desea continuar de todos modos? Responda 'sí' para confirmar.",
+        "suggestion": "💡 Sugerencia: {suggestion}",
+    },
+}
+
+
+def resolve_locale(locale: str = None) -> str:
+    """Best supported locale for a tag like "es-MX"; falls back to English"""
+    tag = (locale or DEFAULT_LOCALE).split(",")[0].split(";")[0].strip().lower().replace("_", "-")
+    for candidate in (tag, tag.split("-")[0]):
+        if candidate in RESPONSE_STRINGS:
+            return candidate
+    return DEFAULT_LOCALE
+
+
+class _Renderer:
+    """Template lookups and value formatting for one locale"""
+
+    def __init__(self, locale: str):
+        self.strings = RESPONSE_STRINGS[resolve_locale(locale)]
+
+    def t(self, key: str, **values) -> str:
+        return self.strings[key].format(**values)
+
+    def date(self, value: str) -> str:
+        try:
+            day = datetime.strptime(value, "%Y-%m-%d")
+        except (TypeError, ValueError):
+            return str(value)
+        # The year is only spelled out when it isn't the current one
+        key = "date" if day.year == datetime.now().year else "date_year"
+        return self.t(key, weekday=self.strings["weekdays"][day.weekday()],
+                      month=self.strings["months"][day.month - 1], day=day.day, year=day.year)
+
+    def items(self, values: list) -> str:
+        values = [str(value) for value in values]
+        listed = self.strings["list_join"].join(values[:MAX_LISTED])
+        if len(values) > MAX_LISTED:
+            listed += " " + self.t("list_more", count=len(values) - MAX_LISTED)
+        return listed
+
+
+def _availability(r: _Renderer, result: dict) -> str:
+    if not result.get("available_slots"):
+        return r.t("availability_none", doctor=result["doctor"], date=r.date(result["date"]))
+    return r.t("availability", doctor=result["doctor"], date=r.date(result["date"]),
+               count=result["available_count"], slots=r.items(result["available_slots"]))
+
+
+def _availability_batch(r: _Renderer, result: dict) -> str:
+    lines = []
+    for doctor, days in result.get("doctors", {}).items():
+        open_days = [day for day in days if day["available_slots"]]
+        if not open_days:
+            continue
+        if len(days) == 1:
+            slots = r.items(open_days[0]["available_slots"])
+        else:
+            slots = r.items([r.t("availability_batch_day", date=r.date(day["date"]), count=day["available_count"])
+                             for day in open_days])
+        lines.append(r.t("availability_batch_line", doctor=doctor, slots=slots))
+    if not lines:
+        return r.t("availability_batch_none", date_from=r.date(result["date_from"]), date_to=r.date(result["date_to"]))
+    return "\n".join(lines)
+
+
+def _booked(r: _Renderer, result: dict) -> str:
+    apt = result["appointment"]
+    return r.t("booked", type=apt.get("type"), date=r.date(apt["date"]), time=apt["time"],
+               end_time=apt.get("end_time"), id=apt.get("id"))
+
+
+def _series(r: _Renderer, result: dict) -> str:
+    lines = [r.t("series_booked", booked=len(result["booked"]), requested=result["requested_occurrences"],
+                 dates=r.items([r.date(apt["date"]) for apt in result["booked"]]))]
+    for conflict in result.get("conflicts", []):
+        alternatives = [alt["time"] for alt in conflict.get("alternatives", [])]
+        key = "series_conflict" if alternatives else "series_conflict_none"
+        lines.append(r.t(key, date=r.date(conflict["date"]), time=conflict["time"], alternatives=r.items(alternatives)))
+    if result.get("skipped_weekends"):
+        lines.append(r.t("series_weekend", dates=r.items([r.date(date) for date in result["skipped_weekends"]])))
+    return "\n".join(lines)
+
+
+def _rescheduled(r: _Renderer, result: dict) -> str:
+    updated = (result.get("updated") or [{}])[0]
+    return r.t("rescheduled", date=r.date(updated.get("appointment_date")), time=updated.get("appointment_time"))
+
+
+def _cancelled(r: _Renderer, result: dict) -> str:
+    apt = result["cancelled_appointment"]
+    text = r.t("cancelled", doctor=apt["doctor"], date=r.date(apt["date"]), time=apt["time"])
+    if result.get("waitlist_check_queued"):
+        text += " " + r.t("cancelled_waitlist")
+    return text
+
+
+def _appointments(r: _Renderer, result: dict) -> str:
+    upcoming = result.get("upcoming") or []
+    if not upcoming:
+        lines = [r.t("appointments_none")]
+    else:
+        # Later pages carry no total, just the rows on the page
+        lines = [r.t("appointments", count=result["upcoming_total"]) if "upcoming_total" in result
+                 else r.t("appointments_page", count=len(upcoming))]
+        lines.extend(r.t("appointment_line", date=r.date(apt.get("appointment_date")), time=apt.get("appointment_time"),
+                         doctor=apt.get("doctor_name"), type=apt.get("appointment_type") or "consultation")
+                     for apt in upcoming)
+    if result.get("past_total"):
+        lines.append(r.t("appointments_past", count=result["past_total"]))
+    if result.get("next_cursor") or result.get("past_next_cursor"):
+        lines.append(r.t("appointments_more"))
+    return "\n".join(lines)
+
+
+def _history(r: _Renderer, result: dict) -> str:
+    if not result.get("total_appointments"):
+        return r.t("history_none", patient=result["patient"])
+    stats = result["statistics"]
+    text = r.t("history", patient=result["patient"], total=result["total_appointments"],
+               first_visit=r.date(result["first_visit"]), completed=stats["completed"],
+               cancelled=stats["cancelled"], no_show=stats["no_show"])
+    if result.get("frequent_doctors"):
+        text += " " + r.t("history_doctors", doctors=r.items(
+            [f"Dr. {doctor['name']} ({doctor['visits']})" for doctor in result["frequent_doctors"]]
+        ))
+    return text
+
+
+def _types(r: _Renderer, result: dict) -> str:
+    return r.t("types", types=", ".join(
+        r.t("type_item", name=item["name"].replace("_", " "), minutes=item["duration_minutes"])
+        for item in result["types"]
+    ))
+
+
+def _next_available(r: _Renderer, result: dict) -> str:
+    key = "next_available_preferred" if result.get("is_preferred_date") else "next_available"
+    if len({opening["date"] for opening in result.get("openings", [])}) > 1:
+        slots = r.items([f"{r.date(opening['date'])} {opening['time']}" for opening in result["openings"]])
+    else:
+        slots = r.items(result["available_slots"])
+    return r.t(key, doctor=result["doctor"], date=r.date(result["next_available_date"]), slots=slots)
+
+
+def _alternatives(r: _Renderer, result: dict) -> str:
+    doctors = result.get("available_doctors") or []
+    if not doctors:
+        return r.t("alternatives_none", specialty=result["specialty"])
+    lines = [r.t("alternatives", specialty=result["specialty"])]
+    lines.extend(r.t("alternative_line", name=doctor["name"], date=r.date(doctor["date"]),
+                     slots=r.items(doctor["available_slots"]))
+                 for doctor in doctors[:MAX_LISTED])
+    return "\n".join(lines)
+
+
+def _optimal_slots(r: _Renderer, result: dict) -> str:
+    slots = [slot["start_time"] for slot in result.get("optimal_slots", [])]
+    key = "optimal_slots" if slots else "optimal_slots_none"
+    return r.t(key, duration=result["duration_required"], doctor=result["doctor"],
+               date=r.date(result["date"]), slots=r.items(slots))
+
+
+def _waitlist_added(r: _Renderer, result: dict) -> str:
+    return r.t("waitlist_added", position=result.get("position"), doctor=result["doctor"])
+
+
+def _waitlist_status(r: _Renderer, result: dict) -> str:
+    entries = result.get("waitlist_entries") or []
+    if not entries:
+        return r.t("waitlist_none")
+    lines = [r.t("waitlist_status")]
+    lines.extend(r.t("waitlist_line", doctor=entry["doctor"], date=r.date(entry["date"]),
+                     position=entry["position"], queue_length=entry["queue_length"])
+                 for entry in entries)
+    return "\n".join(lines)
+
+
+def _offer_accepted(r: _Renderer, result: dict) -> str:
+    apt = result["appointment"]
+    return r.t("offer_accepted", date=r.date(apt["date"]), time=apt["time"])
+
+
+def _follow_up(r: _Renderer, result: dict) -> str:
+    follow_up = result["suggested_follow_up"]
+    return r.t("follow_up", doctor=follow_up["doctor_name"], date=r.date(follow_up["suggested_date"]))
+
+
+def _message(r: _Renderer, result: dict) -> str:
+    return r.t("done", message=result.get("message") or r.t("default_done"))
+
+
+RENDERERS = {
+    "check_availability": _availability,
+    "check_availability_batch": _availability_batch,
+    "book_appointment": _booked,
+    "book_series": _series,
+    "reschedule_appointment": _rescheduled,
+    "cancel_appointment": _cancelled,
+    "confirm_cancellation": _cancelled,
+    "get_appointments": _appointments,
+    "get_history": _history,
+    "get_appointment_types": _types,
+    "find_next_available": _next_available,
+    "suggest_alternatives": _alternatives,
+    "get_optimal_slots": _optimal_slots,
+    "add_to_waitlist": _waitlist_added,
+    "remove_from_waitlist": _message,
+    "get_waitlist_status": _waitlist_status,
+    "accept_waitlist_offer": _offer_accepted,
+    "schedule_follow_up": _follow_up,
+}
+
+
+def render_error(result: dict, locale: str = None) -> str:
+    """Failure message plus conflict alternatives or a suggestion when the result has them"""
+    r = _Renderer(locale)
+    if result.get("conflict"):
+        lines = [r.t("conflict", error=result.get("error"))]
+        alternatives = [alt["time"] for alt in result.get("alternatives") or []]
+        if alternatives:
+            lines.append(r.t("conflict_alternatives", alternatives=r.items(alternatives)))
+    else:
+        lines = [r.t("error", error=result.get("error", "Request failed"))]
+    if result.get("suggestion"):
+        lines.append(r.t("suggestion", suggestion=result["suggestion"]))
+    return "\n".join(lines)
+
+
+def render_response(intent: str, result: dict, locale: str = None) -> Optional[str]:
+    """
+    Deterministic user-facing text for a dispatcher result.
+    Returns None for open-ended intents (LLM_INTENTS) so the caller can generate one.
+    """
+    if result.get("confirm_required"):
+        return _Renderer(locale).t("confirm_required", warning=result.get("warning"))
+    if result.get("success") is False:
+        return render_error(result, locale)
+    if intent in LLM_INTENTS:
+        return None
+
+    r = _Renderer(locale)
+    renderer = RENDERERS.get(intent, _message)
+    try:
+        return renderer(r, result)
+    except (KeyError, IndexError, TypeError, AttributeError):
+        # Unexpected result shape: the generic message is better than nothing
+        return _message(r, result)
@@ -1,51 +1,45 @@
 from datetime import datetime, timedelta
 from app.database import supabase
+from app.agents.booking_agent import APPOINTMENT_DURATIONS
+from app.utils.availability_index import (
+    availability_index, date_range, free_starts, utilization, to_minutes, to_hhmm,
+    DAY_START_MINUTES, DAY_END_MINUTES
+)
+from app.utils.intervals import merge_intervals, free_intervals, fit_starts
 from app.utils.logger import agent_logger
 
-def check_availability(doctor_name: str, date: str):
+async def check_availability(doctor_name: str, date: str):
     
     if not doctor_name or not date:
         return {"success": False, "error": "Doctor name and date are required"}
     
-    response = supabase.table("appointments").select(
-        "appointment_time, end_time, patient_name, appointment_type, duration_minutes").eq(
-            "doctor_name", doctor_name).eq("appointment_date", date).neq("status", "cancelled").execute()
-    
-    booked_slots = response.data if response.data else []
-    
-    # Generate all possible time slots for the day (example: 9am to 5pm with 30 min intervals)
-    all_slots = []
-    for hour in range(9, 17):
-        for minute in [0, 30]:
-            all_slots.append(f"{hour:02d}:{minute:02d}")
-    
-    #determine available slots    
-    booked_times = set()
-    for slot in booked_slots:
-        start = datetime.strptime(slot["appointment_time"], "%H:%M")
-        end = datetime.strptime(slot.get("end_time", slot["appointment_time"]), "%H:%M")
-    
-        #mark all 30 min blocks within the appointment as booked
-        current = start
-        while current < end:
-            booked_times.add(current.strftime("%H:%M"))
-            current += timedelta(minutes=30)
-            
-    available = [
-        slot for slot in all_slots if slot not in booked_times
-    ]
+    day = await availability_index.load_day(doctor_name, date)
+    return _availability_from_day(doctor_name, date, day)
+
+def _availability_from_day(doctor_name: str, date: str, day: dict):
+    """Build the check_availability response from a loaded day bitmap"""
+    
+    # 30 min slots from 9am to 5pm, a slot is available when the whole block is free
+    available = free_starts(day["mask"], duration=30, step=30)
+    total_blocks = (DAY_END_MINUTES - DAY_START_MINUTES) // 30
 
     return {
         "success": True,
         "doctor": doctor_name,
         "date": date,
         "available_slots": available,
-        "booked_count": len(booked_slots),
+        "booked_count": day["booked_count"],
         "available_count": len(available),
-        "utilization": f"{len(booked_slots)}/{len(all_slots)} time blocks used"
+        "utilization": f"{total_blocks - len(available)}/{total_blocks} time blocks used",
+        "utilization_percent": round(utilization(day["mask"]) * 100, 1)
     }
 
-def find_next_available(doctor_name:str, preferred_date: str, days_to_search: int = 14):
+async def find_next_available(doctor_name:str, preferred_date: str, days_to_search: int = 14,
+                        max_results: int = 1):
+    """
+    Find the first open days for a doctor within the search window.
+    Loads the whole window with one range query and scans it locally.
+    """
     
     if not doctor_name or not preferred_date:
         return {"success": False, "error": "Doctor name and preferred date are required"}
@@ -55,21 +49,43 @@ def find_next_available(doctor_name:str, preferred_date: str, days_to_search: in
     except ValueError:
         return {"success": False, "error": "Preferred date must be in YYYY-MM-DD format"}
     
+    days_to_search = max(int(days_to_search or 14), 1)
+    max_results = max(int(max_results or 1), 1)
+    end_date = (base_date + timedelta(days=days_to_search - 1)).strftime("%Y-%m-%d")
+    
+    days = await availability_index.load([doctor_name], preferred_date, end_date)
+    
+    first_day = None
+    openings = []
     for i in range(days_to_search):
-        check_date = (base_date + timedelta(days=i)).strftime("%Y-%m-%d")
-        if(base_date + timedelta(days=i)).weekday() >= 5:  # Skip weekends
+        day = base_date + timedelta(days=i)
+        if day.weekday() >= 5:  # Skip weekends
             continue
         
-        availability = check_availability(doctor_name, check_date)
-        if availability.get("success") and availability.get("available_slots"):
-            return {
-                "success": True,
-                "doctor": doctor_name,
-                "next_available_date": check_date,
-                "available_slots": availability["available_slots"],
-                "days_from_preferred": i,
-                "is_preferred_date": i == 0
-            }
+        check_date = day.strftime("%Y-%m-%d")
+        slots = free_starts(days[(doctor_name, check_date)]["mask"])
+        if not slots:
+            continue
+        
+        if first_day is None:
+            first_day = {"date": check_date, "available_slots": slots, "days_from_preferred": i}
+        
+        openings.extend(
+            {"date": check_date, "time": slot} for slot in slots[:max_results - len(openings)]
+        )
+        if len(openings) >= max_results:
+            break
+    
+    if first_day:
+        return {
+            "success": True,
+            "doctor": doctor_name,
+            "next_available_date": first_day["date"],
+            "available_slots": first_day["available_slots"],
+            "days_from_preferred": first_day["days_from_preferred"],
+            "is_preferred_date": first_day["days_from_preferred"] == 0,
+            "openings": openings
+        }
     
     return {
         "success": False,
@@ -77,14 +93,59 @@ def find_next_available(doctor_name:str, preferred_date: str, days_to_search: in
         "suggestion": "Try a different doctor or increase the search range"
     }        
     
-def suggest_alternative_doctors(specialty: str, date: str, preferred_time: str = None):
+async def check_availability_batch(doctor_names: list, date_from: str, date_to: str = None):
+    """
+    Availability for several doctors over a date or date range, loaded with one query.
+    Ranges skip weekends like find_next_available; a single date is always reported.
+    """
+    
+    if not doctor_names or not date_from:
+        return {"success": False, "error": "Doctor names and date are required"}
+    
+    try:
+        dates = date_range(date_from, date_to or date_from)
+    except ValueError:
+        return {"success": False, "error": "Dates must be in YYYY-MM-DD format"}
+    if date_to:
+        dates = [date for date in dates if datetime.strptime(date, "%Y-%m-%d").weekday() < 5]
+    
+    date_to = date_to or date_from
+    days = await availability_index.load(doctor_names, date_from, date_to)
+    
+    return {
+        "success": True,
+        "date_from": date_from,
+        "date_to": date_to,
+        "doctors": {
+            doctor: [
+                _availability_from_day(doctor, date, days[(doctor, date)])
+                for date in dates
+            ]
+            for doctor in doctor_names
+        }
+    }
+
+def _nearest_slot(slots: list, preferred_time: str):
+    """
+    Return (slot, minutes away) for the slot closest to preferred_time, or
+    (None, None) when it isn't a clock time (e.g. "morning" or "2pm")
+    """
+    try:
+        target = to_minutes(preferred_time)
+    except (ValueError, AttributeError):
+        return None, None
+    best = min(slots, key=lambda slot: abs(to_minutes(slot) - target))
+    return best, abs(to_minutes(best) - target)
+
+async def suggest_alternative_doctors(specialty: str, date: str, preferred_time: str = None,
+                                date_to: str = None):
     """Suggest other doctors when preferred one is unavailable"""
     
     if not specialty or not date:
         return {"success": False, "error": "Specialty and date required"}
     
     # Get doctors with matching specialty
-    doctors_response = supabase.table("doctors").select("*").eq(
+    doctors_response = await supabase.table("doctors").select("name").eq(
         "specialty", specialty
     ).eq("active", True).execute()
     
@@ -94,27 +155,41 @@ def suggest_alternative_doctors(specialty: str, date: str, preferred_time: str =
             "error": f"No doctors found with specialty: {specialty}"
         }
     
+    doctor_names = [doctor["name"] for doctor in doctors_response.data]
+    batch = await check_availability_batch(doctor_names, date, date_to)
+    if not batch.get("success"):
+        return batch
+    
     available_doctors = []
     
-    for doctor in doctors_response.data:
-        availability = check_availability(doctor["name"], date)
-        
-        if availability.get("success") and availability.get("available_slots"):
+    for name, days in batch["doctors"].items():
+        for availability in days:
             slots = availability["available_slots"]
+            if not slots:
+                continue
             
-            # Prioritize if preferred time is available
-            has_preferred = preferred_time in slots if preferred_time else False
-            
-            available_doctors.append({
-                "name": doctor["name"],
+            suggestion = {
+                "name": name,
                 "specialty": specialty,
+                "date": availability["date"],
                 "available_slots": slots[:5],
-                "has_preferred_time": has_preferred,
+                "has_preferred_time": False,
                 "total_available": len(slots)
-            })
+            }
+            
+            nearest, distance = _nearest_slot(slots, preferred_time) if preferred_time else (None, None)
+            if nearest is not None:
+                suggestion["nearest_slot"] = nearest
+                suggestion["minutes_from_preferred"] = distance
+                suggestion["has_preferred_time"] = distance == 0
+            
+            available_doctors.append(suggestion)
+            break  # Earliest open day per doctor
     
-    # Sort by availability (most slots first)
-    available_doctors.sort(key=lambda x: (-x["has_preferred_time"], -x["total_available"]))
+    # Rank by earliest date, then closeness to the preferred time, then most slots
+    available_doctors.sort(key=lambda x: (
+        x["date"], x.get("minutes_from_preferred", 0), -x["total_available"]
+    ))
     
     return {
         "success": True,
@@ -124,42 +199,40 @@ def suggest_alternative_doctors(specialty: str, date: str, preferred_time: str =
         "total_found": len(available_doctors)
     }
     
-def get_optimal_slots(doctor_name: str, date: str, duration_minutes: int = 30):
-    """Get slots that can accommodate specific duration"""
+async def get_optimal_slots(doctor_name: str, date: str, duration_minutes: int = 30,
+                      step_minutes: int = 15, buffer_minutes: int = 0, min_gap_minutes: int = 0,
+                      appointment_type: str = None):
+    """
+    Get every start time where an appointment of the given duration fits.
+    Works on the merged booked intervals of the day, so any duration and step is exact.
+    buffer_minutes pads existing bookings; min_gap_minutes rejects starts that would
+    leave an unusably short idle gap next to another booking.
+    """
     
-    availability = check_availability(doctor_name, date)
+    if not doctor_name or not date:
+        return {"success": False, "error": "Doctor name and date are required"}
     
-    if not availability.get("success"):
-        return availability
+    if appointment_type:
+        duration_minutes = APPOINTMENT_DURATIONS.get(appointment_type.lower(), duration_minutes)
+    duration_minutes = int(duration_minutes or 30)
     
-    available = availability["available_slots"]
-    optimal_slots = []
+    day = await availability_index.load_day(doctor_name, date)
     
-    blocks_needed = (duration_minutes + 29) // 30  # Ceiling division
+    booked = merge_intervals(day["intervals"], int(buffer_minutes or 0))
+    free = free_intervals(booked, DAY_START_MINUTES, DAY_END_MINUTES)
+    starts = fit_starts(free, duration_minutes, int(step_minutes or 15), int(min_gap_minutes or 0))
     
-    for i, slot in enumerate(available):
-        # Check if we have enough consecutive slots
-        consecutive = 1
-        slot_time = datetime.strptime(slot, "%H:%M")
-        
-        for j in range(1, blocks_needed):
-            next_expected = (slot_time + timedelta(minutes=30*j)).strftime("%H:%M")
-            if i + j < len(available) and available[i + j] == next_expected:
-                consecutive += 1
-            else:
-                break
-        
-        if consecutive >= blocks_needed:
-            optimal_slots.append({
-                "start_time": slot,
-                "end_time": (slot_time + timedelta(minutes=duration_minutes)).strftime("%H:%M"),
-                "duration": duration_minutes
-            })
+    optimal_slots = [{
+        "start_time": to_hhmm(start),
+        "end_time": to_hhmm(start + duration_minutes),
+        "duration": duration_minutes
+    } for start in starts]
     
     return {
         "success": True,
         "doctor": doctor_name,
         "date": date,
         "duration_required": duration_minutes,
+        "free_intervals": [{"start": to_hhmm(a), "end": to_hhmm(b)} for a, b in free],
         "optimal_slots": optimal_slots
-    }
\ No newline at end of file
+    }
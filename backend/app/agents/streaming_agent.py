@@ -1,25 +1,79 @@
-from app.config import client, DEPLOYMENT_NAME
+import asyncio
+import json
+from app.config import async_client, DEPLOYMENT_NAME
 from app.agents.dispatcher import execute
-from app.agents.orchestrator import update_context_after_execution
+from app.agents.orchestrator import route_request, update_context_after_execution
+from app.agents.response_renderer import render_response, resolve_locale
 from app.utils.logger import agent_logger
-from typing import Generator
+from app.utils.metrics import (
+    record_span, start_request_timing, timing_summary, LLM_FIRST_TOKEN_SECONDS, LLM_SECONDS, SERVER_TIMING_ENABLED
+)
+from app.utils.tokens import llm_usage
+import time
+from typing import AsyncGenerator, Awaitable, Callable, Optional
 
-def stream_response(user_message: str, intent_data: dict, session_id: str = "default") -> Generator[str, None, None]:
+DisconnectCheck = Optional[Callable[[], Awaitable[bool]]]
+
+STATUS_MESSAGES = {
+    "check_availability": "🔍 Checking availability",
+    "check_availability_batch": "🔍 Checking availability across doctors and days",
+    "book_appointment": "📅 Processing your booking",
+    "book_series": "📅 Booking your recurring appointments",
+    "cancel_appointment": "🗑️ Processing cancellation",
+    "confirm_cancellation": "🗑️ Confirming cancellation",
+    "reschedule_appointment": "🔄 Rescheduling appointment",
+    "get_appointments": "📋 Fetching your appointments",
+    "get_history": "📊 Loading appointment history",
+    "get_appointment_types": "🩺 Listing appointment types",
+    "find_next_available": "🔎 Searching for available slots",
+    "suggest_alternatives": "👨‍⚕️ Finding alternative doctors",
+    "get_optimal_slots": "🕐 Finding the best times",
+    "add_to_waitlist": "📝 Adding you to the waitlist",
+    "get_waitlist_status": "📋 Checking your waitlist status",
+    "remove_from_waitlist": "📝 Removing you from the waitlist",
+    "accept_waitlist_offer": "✅ Confirming your waitlist slot",
+    "schedule_follow_up": "📆 Scheduling follow-up",
+}
+
+
+def format_sse(event: str, data: dict) -> str:
+    """One server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def stream_chat(user_message: str, session_id: str = "default",
+                      is_disconnected: DisconnectCheck = None, locale: str = None,
+                      llm_response: bool = False) -> AsyncGenerator[str, None]:
     """
-    Stream response with real-time status updates.
-    Integrates with context management for multi-turn conversations.
+    Full chat turn as typed server-sent events, so the client sees progress
+    before routing finishes: thinking, intent, status, result (the structured
+    dispatcher result), token (reply text, possibly in several pieces), and
+    finally done. clarification and error end the turn early.
+    Results are rendered from localized templates; the LLM only writes the reply
+    for open-ended intents or when llm_response is set.
+    is_disconnected (e.g. Request.is_disconnected) stops LLM generation early
+    when the client goes away.
     """
     
+    yield format_sse("thinking", {"message": "🤔 Thinking..."})
+    
+    # Headers are long gone by the end of a stream, so the breakdown rides on the done event
+    timings = start_request_timing() if SERVER_TIMING_ENABLED else None
+    
+    intent_data = await route_request(user_message, session_id)
+    
     # Handle errors from orchestrator
     if intent_data.get("error"):
-        yield f"❌ Sorry, I encountered an error: {intent_data.get('error')}\n"
-        yield "Please try rephrasing your request."
+        yield format_sse("error", {
+            "message": f"❌ Sorry, I encountered an error: {intent_data.get('error')}\nPlease try rephrasing your request."
+        })
         return
     
     # Handle clarification needed
     if intent_data.get("needs_clarification"):
         question = intent_data.get("clarification_question", "Could you provide more details?")
-        yield f"🤔 {question}"
+        yield format_sse("clarification", {"message": f"🤔 {question}"})
+        yield format_sse("done", {"session_id": session_id})
         return
     
     intent = intent_data.get("intent")
@@ -30,55 +84,81 @@ def stream_response(user_message: str, intent_data: dict, session_id: str = "def
     if confidence < 0.7:
         agent_logger.warning(f"Low confidence intent: {intent} ({confidence})")
     
-    # Yield status update based on intent
-    status_messages = {
-        "check_availability": "🔍 Checking availability",
-        "book_appointment": "📅 Processing your booking",
-        "cancel_appointment": "🗑️ Processing cancellation",
-        "reschedule_appointment": "🔄 Rescheduling appointment",
-        "get_appointments": "📋 Fetching your appointments",
-        "get_history": "📊 Loading appointment history",
-        "find_next_available": "🔎 Searching for available slots",
-        "suggest_alternatives": "👨‍⚕️ Finding alternative doctors",
-        "add_to_waitlist": "📝 Adding you to the waitlist",
-        "get_waitlist_status": "📋 Checking your waitlist status",
-        "schedule_follow_up": "📆 Scheduling follow-up",
-    }
-    
-    status = status_messages.get(intent, "⚙️ Processing your request")
-    yield f"{status}...\n\n"
+    yield format_sse("intent", {
+        "intent": intent,
+        "parameters": parameters,
+        "confidence": confidence,
+        "source": intent_data.get("source", "llm")
+    })
+    yield format_sse("status", {"message": f"{STATUS_MESSAGES.get(intent, '⚙️ Processing your request')}..."})
     
     # Execute the action
     try:
-        result = execute(intent, parameters)
+        result = await execute(intent, parameters)
     except Exception as e:
         agent_logger.error(f"Execution failed: {e}")
-        yield f"❌ Sorry, something went wrong: {str(e)}"
+        yield format_sse("error", {"message": f"❌ Sorry, something went wrong: {str(e)}"})
         return
     
     # Update conversation context
-    update_context_after_execution(session_id, user_message, intent, parameters, result)
-    
-    # Handle execution errors
-    if not result.get("success", True) and result.get("error"):
-        yield f"❌ {result.get('error')}\n"
-        
-        # Provide helpful suggestions
-        if result.get("suggestion"):
-            yield f"\n💡 Suggestion: {result.get('suggestion')}"
-        return
+    await update_context_after_execution(session_id, user_message, intent, parameters, result)
     
-    # Handle confirmation required (e.g., late cancellation)
-    if result.get("confirm_required"):
-        yield f"⚠️ {result.get('warning')}\n\n"
-        yield "Would you like to proceed anyway? Reply with 'yes' to confirm."
-        return
+    yield format_sse("result", {"intent": intent, "data": result})
+    
+    # Failures and confirmations are always rendered from templates
+    text = None
+    if result.get("success") is False or result.get("confirm_required") or not llm_response:
+        text = render_response(intent, result, locale)
+    
+    if text is not None:
+        yield format_sse("token", {"text": text})
+    else:
+        async for chunk in _generate_natural_response(intent, result, is_disconnected, locale):
+            yield format_sse("token", {"text": chunk})
+    
+    done = {"session_id": session_id}
+    if timings is not None:
+        done["timings_ms"] = timing_summary(timings)
+    yield format_sse("done", done)
+
+
+async def _stream_completion(messages: list, is_disconnected: DisconnectCheck = None,
+                             call: str = "response", **options) -> AsyncGenerator[str, None]:
+    """Yield completion tokens as they arrive, closing the upstream stream on disconnect"""
+    
+    started = time.perf_counter()
+    first_token = None
+    response = await async_client.chat.completions.create(
+        model=DEPLOYMENT_NAME,
+        messages=messages,
+        stream=True,
+        # The final chunk then carries token usage
+        stream_options={"include_usage": True},
+        **options
+    )
     
-    # Generate natural language response using AI
-    yield from _generate_natural_response(intent, result)
+    try:
+        async for chunk in response:
+            if is_disconnected and await is_disconnected():
+                agent_logger.info("Client disconnected, stopping generation")
+                break
+            if getattr(chunk, "usage", None):
+                llm_usage.record(call, chunk.usage)
+            if chunk.choices and chunk.choices[0].delta.content:
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+                    LLM_FIRST_TOKEN_SECONDS.observe(first_token, call=call)
+                yield chunk.choices[0].delta.content
+    finally:
+        # Runs on normal completion, disconnect and task cancellation alike
+        await response.close()
+        elapsed = time.perf_counter() - started
+        LLM_SECONDS.observe(elapsed, call=call)
+        record_span("llm", elapsed)
 
 
-def _generate_natural_response(intent: str, result: dict) -> Generator[str, None, None]:
+async def _generate_natural_response(intent: str, result: dict, is_disconnected: DisconnectCheck = None,
+                                     locale: str = None) -> AsyncGenerator[str, None]:
     """Generate a conversational response from the result"""
     
     system_prompt = """You are a friendly clinical scheduling assistant. 
@@ -91,7 +171,8 @@ Guidelines:
 - For availability, list times in a readable format
 - For errors, be apologetic and suggest next steps
 - Don't mention JSON or technical terms
-- Keep responses under 150 words"""
+- Keep responses under 150 words
+- Reply in the language of this locale: """ + resolve_locale(locale)
 
     user_prompt = f"""Intent: {intent}
 Result: {result}
@@ -99,72 +180,49 @@ Result: {result}
 Generate a friendly response for the user."""
 
     try:
-        response = client.chat.completions.create(
-            model=DEPLOYMENT_NAME,
-            messages=[
+        async for token in _stream_completion(
+            [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
-            stream=True,
+            is_disconnected,
             temperature=0.7,
             max_tokens=300
-        )
-
-        for chunk in response:
-            if chunk.choices and chunk.choices[0].delta.content:
-                yield chunk.choices[0].delta.content
+        ):
+            yield token
                 
+    except asyncio.CancelledError:
+        raise
     except Exception as e:
         agent_logger.error(f"Streaming generation failed: {e}")
-        # Fallback to simple response
-        yield _generate_fallback_response(intent, result)
+        # Fall back to the template rendering
+        yield render_response(intent, result, locale) or _fallback_message(result)
 
 
-def _generate_fallback_response(intent: str, result: dict) -> str:
-    """Generate simple fallback response if AI streaming fails"""
-    
-    if result.get("success") == False:
-        return f"❌ {result.get('error', 'Request failed')}"
-    
-    fallback_templates = {
-        "check_availability": lambda r: f"✅ Dr. {r.get('doctor')} has {r.get('available_count', 0)} slots available on {r.get('date')}.",
-        "book_appointment": lambda r: f"✅ {r.get('message', 'Appointment booked successfully!')}",
-        "cancel_appointment": lambda r: f"✅ {r.get('message', 'Appointment cancelled.')}",
-        "get_appointments": lambda r: f"📋 Found {r.get('upcoming_count', 0)} upcoming appointments.",
-        "find_next_available": lambda r: f"✅ Next available slot: {r.get('next_available_date')} at {r.get('available_slots', ['N/A'])[0]}",
-    }
-    
-    template = fallback_templates.get(intent)
-    if template:
-        try:
-            return template(result)
-        except:
-            pass
-    
+def _fallback_message(result: dict) -> str:
     return f"✅ {result.get('message', 'Request completed successfully.')}"
 
 
-def stream_simple(message: str) -> Generator[str, None, None]:
+async def stream_simple(message: str, is_disconnected: DisconnectCheck = None) -> AsyncGenerator[str, None]:
     """Simple streaming for general responses without intent execution"""
     
     try:
-        response = client.chat.completions.create(
-            model=DEPLOYMENT_NAME,
-            messages=[
+        async for token in _stream_completion(
+            [
                 {
                     "role": "system", 
                     "content": "You are a helpful clinical scheduling assistant. Answer questions about scheduling, appointments, and clinic services."
                 },
                 {"role": "user", "content": message}
             ],
-            stream=True,
+            is_disconnected,
+            call="simple",
             temperature=0.7
-        )
-
-        for chunk in response:
-            if chunk.choices and chunk.choices[0].delta.content:
-                yield chunk.choices[0].delta.content
+        ):
+            yield token
                 
+    except asyncio.CancelledError:
+        raise
     except Exception as e:
         agent_logger.error(f"Simple streaming failed: {e}")
         yield "I apologize, but I'm having trouble responding right now. Please try again."
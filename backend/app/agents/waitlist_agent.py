@@ -1,9 +1,47 @@
 from app.database import supabase
-from app.utils.email_service import send_email
+from app.agents.booking_agent import APPOINTMENT_DURATIONS
+from app.utils.availability_index import availability_index, to_minutes, to_hhmm
 from app.utils.logger import agent_logger
-from datetime import datetime
+from app.utils.outbox import outbox
+from app.utils.waitlist_index import waitlist_index
+from datetime import datetime, timedelta
+import asyncio
+import os
 
-def add_to_waitlist(patient_name: str, doctor_name: str, preferred_date: str,
+WAITLIST_AUTO_OFFER = os.getenv("WAITLIST_AUTO_OFFER", "false").lower() == "true"
+WAITLIST_HOLD_MINUTES = int(os.getenv("WAITLIST_HOLD_MINUTES", "30"))
+
+WAITLIST_SLOT_TEMPLATE = """ 
+Good news, -patient_name-!
+
+An appointment slot has opened up:
+
+📅 Date: {date}
+🕐 Time: {time}
+👨‍⚕️ Doctor: Dr. {doctor_name}
+
+This slot is available on a first-come, first-served basis.
+Please book soon to secure this appointment.
+
+If you're no longer interested, you can ignore this message.
+                """
+
+WAITLIST_OFFER_TEMPLATE = """
+Good news, {patient_name}!
+
+A slot has opened up and we are holding it for you:
+
+📅 Date: {date}
+🕐 Time: {time}
+👨‍⚕️ Doctor: Dr. {doctor_name}
+
+The slot is reserved for the next {hold_minutes} minutes. To confirm it, accept
+waitlist offer {waitlist_id} in the scheduling assistant, giving the name or
+email this offer was sent to. If you don't, it will be offered to the next
+patient on the waitlist.
+                """
+
+async def add_to_waitlist(patient_name: str, doctor_name: str, preferred_date: str,
                     preferred_time: str = None, patient_email: str = None,
                     appointment_type: str = "consultation"):
     """Add patient to waitlist when no slots available"""
@@ -12,7 +50,7 @@ def add_to_waitlist(patient_name: str, doctor_name: str, preferred_date: str,
         return {"success": False, "error": "Patient name, doctor name, and date required"}
     
     # Check if already on waitlist
-    existing = supabase.table("waitlist").select("id").eq(
+    existing = await supabase.table("waitlist").select("id").eq(
         "patient_name", patient_name
     ).eq("doctor_name", doctor_name).eq("preferred_date", preferred_date).eq("status", "waiting").execute()
     
@@ -23,7 +61,7 @@ def add_to_waitlist(patient_name: str, doctor_name: str, preferred_date: str,
             "waitlist_id": existing.data[0]["id"]
         }
     
-    response = supabase.table("waitlist").insert({
+    response = await supabase.table("waitlist").insert({
         "patient_name": patient_name,
         "doctor_name": doctor_name,
         "preferred_date": preferred_date,
@@ -35,12 +73,15 @@ def add_to_waitlist(patient_name: str, doctor_name: str, preferred_date: str,
     }).execute()
     
     if response.data:
-        position = _get_waitlist_position(doctor_name, preferred_date)
+        waitlist_index.add(doctor_name, preferred_date, response.data[0])
+        position = await _get_waitlist_position(response.data[0]["id"])
         agent_logger.info(f"Added {patient_name} to waitlist for Dr. {doctor_name}")
         
         return {
             "success": True,
             "message": f"Added to waitlist for Dr. {doctor_name} on {preferred_date}",
+            "doctor": doctor_name,
+            "date": preferred_date,
             "waitlist_id": response.data[0].get("id"),
             "position": position,
             "notification": "You'll be notified if a slot opens up" if patient_email else "Provide email to receive notifications"
@@ -48,64 +89,268 @@ def add_to_waitlist(patient_name: str, doctor_name: str, preferred_date: str,
     
     return {"success": False, "error": "Failed to add to waitlist"}
 
-def check_waitlist_on_cancellation(doctor_name: str, date: str, time: str):
-    """Check waitlist when a slot opens up and notify patients"""
+async def check_waitlist_on_cancellation(doctor_name: str, date: str, time: str,
+                                         end_time: str = None, auto_offer: bool = None):
+    """
+    Check waitlist when a slot opens up and notify patients.
+    Candidates come from the in-memory waitlist index: entries whose appointment
+    type fits the freed interval near their preferred time, oldest first. With
+    auto_offer the slot is held for the top candidate for WAITLIST_HOLD_MINUTES.
+    """
     
-    response = supabase.table("waitlist").select("*").eq(
-        "doctor_name", doctor_name
-    ).eq("preferred_date", date).eq("status", "waiting").order("created_at").execute()
+    if auto_offer is None:
+        auto_offer = WAITLIST_AUTO_OFFER
     
-    waitlist = response.data or []
+    start = to_minutes(time)
+    end = to_minutes(end_time) if end_time else start + 30
     
-    if not waitlist:
+    queue = await waitlist_index.load(doctor_name, date)
+    if not len(queue):
         return {"success": True, "waitlist_empty": True}
     
-    # Find matching patients (preferred time matches or no preference)
-    matching = []
-    for patient in waitlist:
-        if not patient.get("preferred_time") or patient["preferred_time"] == time:
-            matching.append(patient)
+    candidates = await waitlist_index.candidates(doctor_name, date, start, end, APPOINTMENT_DURATIONS)
+    
+    result = {
+        "success": True,
+        "slot_opened": {"date": date, "time": time, "doctor": doctor_name},
+        "patients_notified": [],
+        "total_on_waitlist": len(queue)
+    }
+    
+    if not candidates:
+        return result
+    
+    if auto_offer:
+        offer = await _offer_slot(candidates, doctor_name, date, start, end)
+        if offer:
+            result["offered_to"] = offer
+            result["patients_notified"] = [offer["patient_name"]] if offer.get("notified") else []
+        return result
+    
+    recipients = [patient for patient in candidates if patient.get("patient_email")]
     
-    if not matching:
-        matching = waitlist[:3]  # Notify first 3 if no exact match
+    # Queued as one batch; the keys make a re-run for the same slot a no-op
+    await outbox.enqueue_many("email", [({
+        "to_email": patient["patient_email"],
+        "subject": f"Appointment Slot Available with Dr. {doctor_name}",
+        "content": WAITLIST_SLOT_TEMPLATE.format(date=date, time=time, doctor_name=doctor_name),
+        "substitutions": {"-patient_name-": patient["patient_name"]}
+    }, f"waitlist-slot-email:{doctor_name}:{date}:{time}:{patient['id']}") for patient in recipients])
     
-    notified = []
-    for patient in matching[:3]:
-        if patient.get("patient_email"):
-            success = send_email(
-                to_email=patient["patient_email"],
-                subject=f"Appointment Slot Available with Dr. {doctor_name}",
-                body=f""" 
-Good news, {patient['patient_name']}!
+    if recipients:
+        await supabase.table("waitlist").update({
+            "notified_at": datetime.utcnow().isoformat()
+        }).in_("id", [patient["id"] for patient in recipients]).execute()
+    
+    result["patients_notified"] = [patient["patient_name"] for patient in recipients]
+    return result
 
-An appointment slot has opened up:
+async def _slot_already_held(doctor_name: str, date: str, time: str, end_time: str = None) -> bool:
+    """True when a waitlist hold already overlaps the freed slot, i.e. this check ran before"""
+    end = end_time or to_hhmm(to_minutes(time) + 30)
+    response = await supabase.table("appointments").select("id").eq(
+        "doctor_name", doctor_name
+    ).eq("appointment_date", date).eq("status", "held").lt("appointment_time", end).gt(
+        "end_time", time
+    ).limit(1).execute()
+    return bool(response.data)
 
-📅 Date: {date}
-🕐 Time: {time}
-👨‍⚕️ Doctor: Dr. {doctor_name}
+async def _handle_freed_slots(payloads: list) -> list:
+    """
+    Outbox handler for slots freed by cancellations, one result per payload so a
+    failing slot doesn't fail (and redeliver) the rest of the batch. A job can be
+    delivered again after its worker dies, so a slot that already carries a hold
+    is skipped and notification emails are deduplicated by the outbox.
+    """
+    results = []
+    for payload in payloads:
+        try:
+            if payload.get("auto_offer", WAITLIST_AUTO_OFFER) and await _slot_already_held(
+                payload["doctor_name"], payload["date"], payload["time"], payload.get("end_time")
+            ):
+                results.append(True)
+                continue
+            result = await check_waitlist_on_cancellation(**payload)
+            results.append(result.get("success", False))
+        except Exception as e:
+            agent_logger.error(f"Waitlist check failed for {payload}: {e}")
+            results.append(False)
+    return results
 
-This slot is available on a first-come, first-served basis.
-Please book soon to secure this appointment.
+outbox.register("waitlist_check", _handle_freed_slots)
 
-If you're no longer interested, you can ignore this message.
-                """
+async def _offer_slot(candidates: list, doctor_name: str, date: str, start: int, end: int):
+    """
+    Hold the freed slot for the first candidate that can still take it and tell
+    the patient. The hold is checked and written atomically by hold_slot_atomic
+    (migrations/005_hold_slot_atomic.sql); when a booking or another worker got
+    there first, the slot goes to the next candidate.
+    """
+    
+    expires_at = datetime.utcnow() + timedelta(minutes=WAITLIST_HOLD_MINUTES)
+    
+    for entry in candidates:
+        appointment_type = entry.get("appointment_type") or "consultation"
+        duration = APPOINTMENT_DURATIONS.get(appointment_type.lower(), 30)
+        slot_start = waitlist_index.start_for(entry, start, end, duration)
+        
+        try:
+            response = await supabase.rpc("hold_slot_atomic", {
+                "p_waitlist_id": str(entry["id"]),
+                "p_patient_name": entry["patient_name"],
+                "p_doctor_name": doctor_name,
+                "p_appointment_date": date,
+                "p_appointment_time": to_hhmm(slot_start),
+                "p_end_time": to_hhmm(slot_start + duration),
+                "p_appointment_type": appointment_type,
+                "p_duration_minutes": duration,
+                "p_offer_expires_at": expires_at.isoformat(),
+                "p_patient_email": entry.get("patient_email"),
+                "p_notes": f"Held for waitlist entry {entry['id']}"
+            }).execute()
+        except Exception as e:
+            agent_logger.error(f"Could not hold slot for waitlist entry {entry['id']}: {e}")
+            return None
+        
+        result = response.data or {}
+        if result.get("status") == "held":
+            break
+        
+        if result.get("status") == "conflict":
+            availability_index.store_day(doctor_name, date, result.get("booked") or [])
+        else:
+            # Offered, removed or fulfilled since the index loaded it
+            waitlist_index.remove(doctor_name, date, entry["id"])
+        agent_logger.info(
+            f"Slot {date} {to_hhmm(slot_start)} with Dr. {doctor_name} could not be held for "
+            f"waitlist entry {entry['id']} ({result.get('status')}), trying the next candidate"
+        )
+    else:
+        return None
+    
+    held_id = result["appointment"]["id"]
+    waitlist_index.remove(doctor_name, date, entry["id"])
+    availability_index.invalidate(doctor_name, date)
+    
+    # Queued right after the hold commits, so the patient hears about it even
+    # if this worker stops before the email goes out
+    notified = False
+    if entry.get("patient_email"):
+        notified = await outbox.enqueue("email", {
+            "to_email": entry["patient_email"],
+            "subject": f"An appointment with Dr. {doctor_name} is being held for you",
+            "content": WAITLIST_OFFER_TEMPLATE.format(
+                patient_name=entry["patient_name"], date=date, time=to_hhmm(slot_start),
+                doctor_name=doctor_name, waitlist_id=entry["id"], hold_minutes=WAITLIST_HOLD_MINUTES
             )
-            
-            if success:
-                supabase.table("waitlist").update({
-                    "notified_at": datetime.utcnow().isoformat()
-                }).eq("id", patient["id"]).execute()
-                
-                notified.append(patient["patient_name"])
+        }, idempotency_key=f"waitlist-offer-email:{entry['id']}:{held_id}")
+    
+    agent_logger.info(f"Offered {date} {to_hhmm(slot_start)} with Dr. {doctor_name} to waitlist entry {entry['id']}")
+    return {
+        "waitlist_id": entry["id"],
+        "patient_name": entry["patient_name"],
+        "time": to_hhmm(slot_start),
+        "held_appointment_id": held_id,
+        "expires_at": expires_at.isoformat(),
+        "notified": notified
+    }
+
+def _same_patient(entry: dict, patient_name: str = None, patient_email: str = None) -> bool:
+    """Every detail given must match the entry; names and emails compare case-insensitively"""
+    def normalize(value):
+        return " ".join(str(value).split()).casefold() if value else None
+    
+    if patient_name and normalize(patient_name) != normalize(entry.get("patient_name")):
+        return False
+    if patient_email and normalize(patient_email) != normalize(entry.get("patient_email")):
+        return False
+    return True
+
+async def accept_waitlist_offer(waitlist_id: str, patient_name: str = None, patient_email: str = None):
+    """Confirm the held appointment offered to a waitlist entry, for the patient it was offered to"""
+    
+    if not waitlist_id or not (patient_name or patient_email):
+        return {"success": False, "error": "Waitlist ID and the patient's name or email are required"}
+    
+    response = await supabase.table("waitlist").select(
+        "id, patient_name, patient_email, doctor_name, preferred_date, offer_expires_at, held_appointment_id"
+    ).eq("id", waitlist_id).eq("status", "offered").execute()
+    
+    # A mismatch reads the same as a missing offer, so IDs can't be probed
+    if not response.data or not _same_patient(response.data[0], patient_name, patient_email):
+        return {"success": False, "error": "No open offer found for this waitlist entry"}
+    
+    entry = response.data[0]
+    if datetime.fromisoformat(entry["offer_expires_at"]).replace(tzinfo=None) < datetime.utcnow():
+        return {"success": False, "error": "This offer has expired"}
+    
+    confirmed = await supabase.table("appointments").update({
+        "status": "confirmed"
+    }).eq("id", entry["held_appointment_id"]).eq("status", "held").execute()
+    
+    if not confirmed.data:
+        return {"success": False, "error": "The held appointment is no longer available"}
+    
+    await fulfill_waitlist(waitlist_id, entry["held_appointment_id"])
+    apt = confirmed.data[0]
     
     return {
         "success": True,
-        "slot_opened": {"date": date, "time": time, "doctor": doctor_name},
-        "patients_notified": notified,
-        "total_on_waitlist": len(waitlist)
+        "message": f"Appointment confirmed with Dr. {apt['doctor_name']}",
+        "appointment": {
+            "id": apt["id"],
+            "date": apt["appointment_date"],
+            "time": apt["appointment_time"],
+            "end_time": apt.get("end_time"),
+            "type": apt.get("appointment_type")
+        }
     }
 
-def remove_from_waitlist(waitlist_id: str = None, patient_name: str = None, 
+async def expire_waitlist_offers() -> dict:
+    """
+    Release holds whose offer ran out and offer each slot to the next candidate.
+    Every worker runs this loop, so offers are claimed with one conditional
+    update: the database hands each expired row to exactly one worker, and the
+    others see it already moved to 'expired' and skip it.
+    """
+    
+    response = await supabase.table("waitlist").update({
+        "status": "expired"
+    }).eq("status", "offered").lt("offer_expires_at", datetime.utcnow().isoformat()).execute()
+    
+    expired = response.data or []
+    if not expired:
+        return {"expired": 0, "reoffered": 0}
+    
+    held_ids = [entry["held_appointment_id"] for entry in expired if entry.get("held_appointment_id")]
+    released = await supabase.table("appointments").update({
+        "status": "cancelled",
+        "cancellation_reason": "Waitlist offer expired",
+        "cancelled_at": datetime.utcnow().isoformat()
+    }).in_("id", held_ids).eq("status", "held").execute() if held_ids else None
+    
+    reoffered = 0
+    for apt in (released.data if released else None) or []:
+        availability_index.invalidate(apt["doctor_name"], apt["appointment_date"])
+        result = await check_waitlist_on_cancellation(
+            apt["doctor_name"], apt["appointment_date"], apt["appointment_time"],
+            apt.get("end_time"), auto_offer=True
+        )
+        reoffered += bool(result.get("offered_to"))
+    
+    agent_logger.info(f"Expired {len(expired)} waitlist offers, re-offered {reoffered} slots")
+    return {"expired": len(expired), "reoffered": reoffered}
+
+async def run_offer_expiry_loop(interval_seconds: int = 60):
+    """Background task that keeps held slots moving down the waitlist"""
+    while True:
+        try:
+            await expire_waitlist_offers()
+        except Exception as e:
+            agent_logger.error(f"Waitlist offer expiry failed: {e}")
+        await asyncio.sleep(interval_seconds)
+
+async def remove_from_waitlist(waitlist_id: str = None, patient_name: str = None, 
                           doctor_name: str = None, date: str = None):
     """Remove patient from waitlist"""
     
@@ -120,52 +365,56 @@ def remove_from_waitlist(waitlist_id: str = None, patient_name: str = None,
     else:
         return {"success": False, "error": "Provide waitlist_id or patient details"}
     
-    response = query.execute()
+    response = await query.execute()
+    
+    for row in response.data or []:
+        waitlist_index.remove(row["doctor_name"], row["preferred_date"], row["id"])
     
     if response.data:
         return {"success": True, "message": "Removed from waitlist"}
     return {"success": False, "error": "Entry not found"}
 
-def fulfill_waitlist(waitlist_id: str, appointment_id: str):
+async def fulfill_waitlist(waitlist_id: str, appointment_id: str):
     """Mark waitlist entry as fulfilled when appointment is booked"""
     
-    response = supabase.table("waitlist").update({
+    response = await supabase.table("waitlist").update({
         "status": "fulfilled",
         "fulfilled_appointment_id": appointment_id
     }).eq("id", waitlist_id).execute()
     
+    for row in response.data or []:
+        waitlist_index.remove(row["doctor_name"], row["preferred_date"], row["id"])
+    
     return {"success": bool(response.data)}
 
-def _get_waitlist_position(doctor_name: str, date: str) -> int:
-    """Get position on waitlist"""
-    response = supabase.table("waitlist").select("id").eq(
-        "doctor_name", doctor_name
-    ).eq("preferred_date", date).eq("status", "waiting").execute()
+async def _get_waitlist_position(waitlist_id) -> int:
+    """Rank of a single entry in its doctor/date queue"""
+    response = await supabase.table("waitlist_positions").select("position").eq(
+        "id", waitlist_id
+    ).execute()
     
-    return len(response.data or [])
+    return response.data[0]["position"] if response.data else None
 
-def get_waitlist_status(patient_name: str):
-    """Get patient's current waitlist entries"""
+async def get_waitlist_status(patient_name: str):
+    """Get patient's current waitlist entries with their queue positions in one query"""
     
-    response = supabase.table("waitlist").select("*").eq(
-        "patient_name", patient_name
-    ).eq("status", "waiting").order("preferred_date").execute()
-    
-    entries = []
-    for entry in response.data or []:
-        position = _get_waitlist_position(entry["doctor_name"], entry["preferred_date"])
-        entries.append({
-            "id": entry["id"],
-            "doctor": entry["doctor_name"],
-            "date": entry["preferred_date"],
-            "preferred_time": entry.get("preferred_time"),
-            "position": position,
-            "created_at": entry["created_at"]
-        })
+    response = await supabase.table("waitlist_positions").select(
+        "id, doctor_name, preferred_date, preferred_time, created_at, position, queue_length"
+    ).eq("patient_name", patient_name).order("preferred_date").execute()
+    
+    entries = [{
+        "id": entry["id"],
+        "doctor": entry["doctor_name"],
+        "date": entry["preferred_date"],
+        "preferred_time": entry.get("preferred_time"),
+        "position": entry["position"],
+        "queue_length": entry["queue_length"],
+        "created_at": entry["created_at"]
+    } for entry in response.data or []]
     
     return {
         "success": True,
         "patient": patient_name,
         "waitlist_entries": entries,
         "total": len(entries)
-    }
\ No newline at end of file
+    }
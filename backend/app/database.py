@@ -1,10 +1,22 @@
 import os
-from supabase import create_client
+from postgrest import AsyncPostgrestClient
 from dotenv import load_dotenv
+from app.utils.metrics import instrument_http_client
 
 load_dotenv()
 
-supabase = create_client(
-    os.getenv("SUPABASE_URL", ""),
-    os.getenv("SUPABASE_KEY", "")
+SUPABASE_URL = os.getenv("SUPABASE_URL", "")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY", "")
+
+# Async PostgREST client for the Supabase REST API. Queries are awaited
+# so database round trips never block the event loop.
+supabase = AsyncPostgrestClient(
+    f"{SUPABASE_URL.rstrip('/')}/rest/v1",
+    headers={
+        "apikey": SUPABASE_KEY,
+        "Authorization": f"Bearer {SUPABASE_KEY}"
+    }
 )
+
+# Per-table query latency for /metrics and the timing breakdown
+instrument_http_client(supabase.session)
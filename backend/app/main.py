@@ -1,14 +1,45 @@
-from fastapi import FastAPI
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.routes.chat import router as chat_router
-from app.routes import reminders
+from app.routes import reminders, staff
+from app.agents.context_manager import context_store
+from app.agents.waitlist_agent import run_offer_expiry_loop
+from app.utils.availability_index import availability_index
+from app.utils.waitlist_index import waitlist_index
+from app.utils.outbox import outbox
+from app.utils.tokens import llm_usage
+from app.utils.metrics import (
+    metrics, server_timing_header, start_request_timing, HTTP_SECONDS, SERVER_TIMING_ENABLED
+)
+from app.utils.email_service import email_transport
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the outbox and run the background workers for the life of the server"""
+    await asyncio.to_thread(outbox.open)
+    tasks = [
+        asyncio.create_task(run_offer_expiry_loop()),
+        asyncio.create_task(outbox.run())
+    ]
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await email_transport.close()
 
 app = FastAPI(
     title="AI Clinical Scheduling System",
     description="AI-powered appointment scheduling with natural language processing",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -17,10 +48,30 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Session-ID", "Server-Timing"],
 )
 
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    """Request latency histogram plus the optional Server-Timing breakdown"""
+    timings = start_request_timing()
+    started = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - started
+    
+    # Route templates, not raw paths, keep label cardinality bounded
+    route = request.scope.get("route")
+    HTTP_SECONDS.observe(
+        elapsed, method=request.method, path=getattr(route, "path", "unmatched"), status=response.status_code
+    )
+    if SERVER_TIMING_ENABLED:
+        timings.append(("total", elapsed))
+        response.headers["Server-Timing"] = server_timing_header(timings)
+    return response
+
 app.include_router(chat_router, prefix="/api", tags=["chat"])
 app.include_router(reminders.router, prefix="/api/reminders", tags=["reminders"])
+app.include_router(staff.router, prefix="/api/staff", tags=["staff"])
 
 @app.get("/")
 async def root():
@@ -32,4 +83,28 @@ async def root():
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+@app.get("/health/cache")
+async def cache_stats():
+    """Availability cache and session store counters for sizing TTL and capacity"""
+    return {
+        "availability": availability_index.stats(),
+        "contexts": context_store.stats(),
+        "waitlist": waitlist_index.stats()
+    }
+
+@app.get("/health/outbox")
+async def outbox_stats():
+    """Pending and dead-lettered side effects plus delivery throughput"""
+    return await asyncio.to_thread(outbox.stats)
+
+@app.get("/health/llm")
+async def llm_usage_stats():
+    """Prompt, cached and completion token totals per LLM call site"""
+    return llm_usage.stats()
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Latency histograms and counters in the Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Request
 from fastapi.responses import StreamingResponse
 from app.agents.orchestrator import route_request, update_context_after_execution, clear_context
 from app.agents.dispatcher import execute
-from app.agents.streaming_agent import stream_response
+from app.agents.streaming_agent import stream_chat
 from app.schemas.chat import ChatRequest
 import uuid
  
@@ -13,7 +13,7 @@ async def chat(request: ChatRequest, req: Request):
     
     session_id = req.headers.get("X-Session-ID") or str(uuid.uuid4())
     
-    intent_data = route_request(request.message, session_id)
+    intent_data = await route_request(request.message, session_id)
     
     if intent_data.get("needs_clarification"):
         return {
@@ -25,7 +25,7 @@ async def chat(request: ChatRequest, req: Request):
     intent = intent_data.get("intent")
     parameters = intent_data.get("parameters", {})
 
-    result = execute(intent, parameters)
+    result = await execute(intent, parameters)
 
     return {
         "intent": intent,
@@ -36,13 +36,21 @@ async def chat(request: ChatRequest, req: Request):
 
 @router.post("/chat/stream")
 async def chat_stream(request: ChatRequest, req: Request):
-    session_id = req.headers.get("X-Session-ID", str(uuid.uuid4()))
-    intent_data = route_request(request.message, session_id)
+    """Server-sent events; routing runs inside the stream so the first event goes out at once"""
+    session_id = req.headers.get("X-Session-ID") or str(uuid.uuid4())
     
     return StreamingResponse(
-        stream_response(request.message, intent_data, session_id),
+        stream_chat(
+            request.message, session_id, req.is_disconnected,
+            request.locale or req.headers.get("Accept-Language"), request.llm_response
+        ),
         media_type="text/event-stream",
-        headers={"X-Session-ID": session_id}
+        headers={
+            "X-Session-ID": session_id,
+            "Cache-Control": "no-cache",
+            # Keep reverse proxies from buffering the events
+            "X-Accel-Buffering": "no"
+        }
     )
     
 @router.post("/chat/clear")
@@ -50,5 +58,5 @@ async def clear_chat(req: Request):
     """Clear conversation context"""
     session_id = req.headers.get("X-Session-ID")
     if session_id:
-        clear_context(session_id)
+        await clear_context(session_id)
     return {"status": "Context cleared"}
\ No newline at end of file
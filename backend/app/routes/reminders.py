@@ -21,7 +21,7 @@ async def trigger_reminders(background_tasks: BackgroundTasks, hours_before: int
 @router.get("/pending")
 async def get_pending():
     """Get appointments pending reminders"""
-    return get_pending_reminders()
+    return await get_pending_reminders()
 
 @router.post("/send-now")
 async def send_reminders_sync(hours_before: int = 24):
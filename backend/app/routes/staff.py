@@ -0,0 +1,27 @@
+import os
+import secrets
+from fastapi import APIRouter, Depends, Header, HTTPException
+from app.agents.cancellation_agent import cancel_doctor_schedule
+from app.schemas.staff import DoctorAbsenceRequest
+from app.utils.logger import agent_logger
+
+router = APIRouter()
+
+def require_staff(x_staff_token: str = Header(None)):
+    """Staff routes are disabled unless STAFF_API_TOKEN is set, and then need it in X-Staff-Token"""
+    expected = os.getenv("STAFF_API_TOKEN")
+    if not expected or not x_staff_token or not secrets.compare_digest(x_staff_token, expected):
+        raise HTTPException(status_code=403, detail="Staff access required")
+
+@router.post("/doctor-absence", dependencies=[Depends(require_staff)])
+async def doctor_absence(request: DoctorAbsenceRequest):
+    """
+    Cancel a doctor's appointments for an absence. The first call returns a
+    preview and a confirm_token; repeat it with the token to cancel.
+    """
+    result = await cancel_doctor_schedule(
+        request.doctor_name, request.date_from, request.date_to, request.reason, request.confirm_token
+    )
+    if request.confirm_token:
+        agent_logger.info(f"Staff confirmed absence for Dr. {request.doctor_name}: {result.get('message')}")
+    return result
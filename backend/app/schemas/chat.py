@@ -1,4 +1,7 @@
 from pydantic import BaseModel
+from typing import Optional
 
 class ChatRequest(BaseModel):
-    message: str
\ No newline at end of file
+    message: str
+    locale: Optional[str] = None
+    llm_response: bool = False
@@ -0,0 +1,9 @@
+from pydantic import BaseModel
+from typing import Optional
+
+class DoctorAbsenceRequest(BaseModel):
+    doctor_name: str
+    date_from: str
+    date_to: Optional[str] = None
+    reason: Optional[str] = None
+    confirm_token: Optional[str] = None
@@ -0,0 +1,201 @@
+import os
+from datetime import datetime, timedelta
+from app.database import supabase
+from app.utils.cache import TTLCache
+from app.utils.logger import db_logger
+
+# Clinic day and slot resolution used by the bitmap (9am to 5pm in 5 minute slots)
+DAY_START_MINUTES = 9 * 60
+DAY_END_MINUTES = 17 * 60
+SLOT_MINUTES = 5
+SLOTS_PER_DAY = (DAY_END_MINUTES - DAY_START_MINUTES) // SLOT_MINUTES
+FULL_DAY_MASK = (1 << SLOTS_PER_DAY) - 1
+
+
+def to_minutes(hhmm: str) -> int:
+    """Convert "HH:MM" (or "HH:MM:SS") to minutes since midnight"""
+    hours, minutes = hhmm.split(":")[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+def to_hhmm(minutes: int) -> str:
+    """Convert minutes since midnight to "HH:MM" """
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def interval_mask(start: int, end: int) -> int:
+    """Bitmask of every slot overlapping [start, end) minutes, clipped to the clinic day"""
+    first = max(start - DAY_START_MINUTES, 0) // SLOT_MINUTES
+    last = min(-(-(end - DAY_START_MINUTES) // SLOT_MINUTES), SLOTS_PER_DAY)
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+
+def fits(mask: int, start: int, duration: int) -> bool:
+    """Check whether an appointment of `duration` minutes starting at `start` is free"""
+    if start < DAY_START_MINUTES or start + duration > DAY_END_MINUTES:
+        return False
+    return not mask & interval_mask(start, start + duration)
+
+
+def fit_mask(mask: int, duration: int) -> int:
+    """Bitmask of slots where a `duration` minute run of free slots begins"""
+    needed = -(-duration // SLOT_MINUTES)
+    free = ~mask & FULL_DAY_MASK
+    result = free
+    # Doubling trick: after each step `span` consecutive free slots are guaranteed
+    span = 1
+    while span < needed:
+        shift = min(span, needed - span)
+        result &= result >> shift
+        span += shift
+    # Runs may not spill past the end of the day
+    return result & ((1 << max(SLOTS_PER_DAY - needed + 1, 0)) - 1)
+
+
+def free_starts(mask: int, duration: int = 30, step: int = 30) -> list:
+    """Start times ("HH:MM") on a `step` minute grid where `duration` minutes are free"""
+    starts = fit_mask(mask, duration)
+    slot_step = max(step // SLOT_MINUTES, 1)
+    return [
+        to_hhmm(DAY_START_MINUTES + slot * SLOT_MINUTES)
+        for slot in range(0, SLOTS_PER_DAY, slot_step)
+        if starts >> slot & 1
+    ]
+
+
+def utilization(mask: int) -> float:
+    """Fraction of the clinic day that is booked"""
+    return mask.bit_count() / SLOTS_PER_DAY
+
+
+def date_range(date_from: str, date_to: str) -> list:
+    """Inclusive list of YYYY-MM-DD dates"""
+    start = datetime.strptime(date_from, "%Y-%m-%d")
+    days = (datetime.strptime(date_to, "%Y-%m-%d") - start).days
+    return [(start + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(days + 1)]
+
+
+def _empty_day() -> dict:
+    return {"mask": 0, "booked_count": 0, "intervals": []}
+
+
+def _add_to_day(day: dict, start_time: str, end_time: str = None):
+    """Mark an appointment as booked on a day entry"""
+    start = to_minutes(start_time)
+    end = to_minutes(end_time) if end_time else start
+    day["mask"] |= interval_mask(start, end)
+    day["booked_count"] += 1
+    day["intervals"].append((start, end))
+
+
+class AvailabilityIndex:
+    """
+    Per doctor-day booking bitmaps, loaded in bulk from the appointments table.
+    Days are kept in a TTL/LRU cache and read through on demand; agents that write
+    appointments invalidate the (doctor, date) entries they touch.
+    Readers use the days load() returns rather than the cache, so an entry
+    evicted or expired in the meantime never reads as an empty (fully free) day.
+    """
+
+    def __init__(self, max_entries: int = 4096, ttl_seconds: float = 60):
+        self._cache = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        # Keys each in-flight load is fetching, and those written to since it started
+        self._in_flight = []
+
+    async def load(self, doctor_names: list, date_from: str, date_to: str = None) -> dict:
+        """
+        Day entries for every (doctor, date) in the range, keyed by that tuple.
+        Cached days are reused and the rest come from at most one query.
+        """
+        date_to = date_to or date_from
+        if not doctor_names:
+            return {}
+
+        dates = date_range(date_from, date_to)
+        days, missing = {}, []
+        for doctor in doctor_names:
+            for date in dates:
+                day = self._cache.get((doctor, date))
+                if day is None:
+                    missing.append((doctor, date))
+                else:
+                    days[(doctor, date)] = day
+        if not missing:
+            return days
+
+        missing_doctors = list(dict.fromkeys(doctor for doctor, _ in missing))
+        missing_from = min(date for _, date in missing)
+        missing_to = max(date for _, date in missing)
+
+        query = supabase.table("appointments").select(
+            "doctor_name, appointment_date, appointment_time, end_time"
+        ).neq("status", "cancelled").gte("appointment_date", missing_from).lte("appointment_date", missing_to)
+
+        if len(missing_doctors) == 1:
+            query = query.eq("doctor_name", missing_doctors[0])
+        else:
+            query = query.in_("doctor_name", missing_doctors)
+
+        in_flight = {"keys": set(missing), "stale": set()}
+        self._in_flight.append(in_flight)
+        try:
+            response = await query.execute()
+        finally:
+            self._in_flight.remove(in_flight)
+
+        fetched = {key: _empty_day() for key in missing}
+        for apt in response.data or []:
+            day = fetched.get((apt["doctor_name"], apt["appointment_date"]))
+            if day is not None:
+                _add_to_day(day, apt["appointment_time"], apt.get("end_time"))
+
+        for key, day in fetched.items():
+            # A write landed while the query ran, so these rows may predate it
+            if key not in in_flight["stale"]:
+                self._cache.set(key, day)
+        days.update(fetched)
+
+        db_logger.debug(
+            f"Availability index loaded {len(response.data or [])} appointments "
+            f"for {len(missing_doctors)} doctor(s) from {missing_from} to {missing_to}"
+        )
+        return days
+
+    async def load_day(self, doctor_name: str, date: str) -> dict:
+        return (await self.load([doctor_name], date))[(doctor_name, date)]
+
+    def store_day(self, doctor_name: str, date: str, appointments: list) -> dict:
+        """Cache a doctor-day from rows that already came back from the database"""
+        day = _empty_day()
+        for apt in appointments:
+            _add_to_day(day, apt["appointment_time"], apt.get("end_time"))
+        self._mark_stale((doctor_name, date))
+        self._cache.set((doctor_name, date), day)
+        return day
+
+    def invalidate(self, doctor_name: str, date: str):
+        """Drop a cached doctor-day after a booking, cancellation or reschedule"""
+        if doctor_name and date:
+            self._mark_stale((doctor_name, date))
+            self._cache.invalidate((doctor_name, date))
+
+    def clear(self):
+        """Drop every cached doctor-day"""
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+    def _mark_stale(self, key: tuple):
+        for in_flight in self._in_flight:
+            if key in in_flight["keys"]:
+                in_flight["stale"].add(key)
+
+
+# Global availability index
+availability_index = AvailabilityIndex(
+    max_entries=int(os.getenv("AVAILABILITY_CACHE_MAX_ENTRIES", "4096")),
+    ttl_seconds=float(os.getenv("AVAILABILITY_CACHE_TTL_SECONDS", "60"))
+)
@@ -1,22 +1,217 @@
+import asyncio
+import json
 import os
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
+import smtplib
+from datetime import datetime
+from email.message import EmailMessage
+import httpx
 from dotenv import load_dotenv
+from app.utils.logger import app_logger
+from app.utils.metrics import span, EMAIL_SECONDS, EMAILS
 
 load_dotenv()
 
-def send_email(to_email: str, subject: str, content: str):
-    message = Mail(
-        from_email=os.getenv("SENDER_EMAIL"),
-        to_emails=to_email,
-        subject=subject,
-        plain_text_content=content
-    )
+SENDER_EMAIL = os.getenv("SENDER_EMAIL") or os.getenv("FROM_EMAIL")
 
+# SendGrid accepts at most 1000 personalizations per request
+SENDGRID_MAX_PERSONALIZATIONS = 1000
+
+
+def apply_substitutions(text: str, substitutions: dict = None) -> str:
+    """Render a template the way SendGrid substitutions do"""
+    for token, value in (substitutions or {}).items():
+        text = text.replace(token, str(value))
+    return text
+
+
+def _group_by_template(messages: list) -> dict:
+    """Group message indexes that share a subject and content template"""
+    groups = {}
+    for i, message in enumerate(messages):
+        groups.setdefault((message["subject"], message["content"]), []).append(i)
+    return groups
+
+
+class SendGridTransport:
+    """
+    SendGrid v3 mail API over one pooled HTTP client.
+    Messages sharing a subject/content template go out as a single API call
+    with one personalization (recipient + substitutions) each. A request
+    rejected as invalid is retried message by message.
+    """
+
+    def __init__(self, api_key: str, sender: str):
+        self.sender = sender
+        self._client = httpx.AsyncClient(
+            base_url="https://api.sendgrid.com",
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=httpx.Timeout(10.0),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10)
+        )
+
+    async def send_batch(self, messages: list) -> list:
+        results = [False] * len(messages)
+
+        for (subject, content), indexes in _group_by_template(messages).items():
+            for start in range(0, len(indexes), SENDGRID_MAX_PERSONALIZATIONS):
+                chunk = indexes[start:start + SENDGRID_MAX_PERSONALIZATIONS]
+                status = await self._post(subject, content, [messages[i] for i in chunk])
+
+                if status == 400 and len(chunk) > 1:
+                    # One bad recipient rejects the whole request; send the chunk
+                    # one message at a time so the rest still go out
+                    statuses = await asyncio.gather(*(
+                        self._post(subject, content, [messages[i]]) for i in chunk
+                    ))
+                    for i, message_status in zip(chunk, statuses):
+                        results[i] = message_status is not None and message_status < 300
+                    continue
+
+                for i in chunk:
+                    results[i] = status is not None and status < 300
+
+        return results
+
+    async def _post(self, subject: str, content: str, batch: list):
+        """One mail/send request; returns the HTTP status, or None when the request failed"""
+        payload = {
+            "personalizations": [
+                {"to": [{"email": message["to_email"]}],
+                 **({"substitutions": message["substitutions"]} if message.get("substitutions") else {})}
+                for message in batch
+            ],
+            "from": {"email": self.sender},
+            "subject": subject,
+            "content": [{"type": "text/plain", "value": content}]
+        }
+        try:
+            response = await self._client.post("/v3/mail/send", json=payload)
+        except httpx.HTTPError as e:
+            app_logger.error(f"SendGrid request failed for batch of {len(batch)}: {e}")
+            return None
+
+        if response.status_code >= 300:
+            app_logger.error(f"SendGrid rejected batch of {len(batch)}: {response.status_code} {response.text}")
+        return response.status_code
+
+    async def close(self):
+        await self._client.aclose()
+
+
+class FileSinkTransport:
+    """Writes rendered messages as JSON lines to a local file instead of sending them"""
+
+    def __init__(self, path: str, sender: str = None):
+        self.path = path
+        self.sender = sender
+        self._lock = asyncio.Lock()
+
+    async def send_batch(self, messages: list) -> list:
+        lines = [
+            json.dumps({
+                "from": self.sender,
+                "to": message["to_email"],
+                "subject": apply_substitutions(message["subject"], message.get("substitutions")),
+                "content": apply_substitutions(message["content"], message.get("substitutions")),
+                "sent_at": datetime.utcnow().isoformat()
+            }) + "\n"
+            for message in messages
+        ]
+        async with self._lock:
+            await asyncio.to_thread(self._append, lines)
+        return [True] * len(messages)
+
+    def _append(self, lines: list):
+        with open(self.path, "a", encoding="utf-8") as sink:
+            sink.writelines(lines)
+
+    async def close(self):
+        pass
+
+
+class SMTPTransport:
+    """Plain SMTP delivery, e.g. to a local SMTP sink during development"""
+
+    def __init__(self, host: str, port: int, sender: str = None):
+        self.host = host
+        self.port = port
+        self.sender = sender or "scheduler@localhost"
+
+    async def send_batch(self, messages: list) -> list:
+        return await asyncio.to_thread(self._send_all, messages)
+
+    def _send_all(self, messages: list) -> list:
+        results = []
+        try:
+            with smtplib.SMTP(self.host, self.port, timeout=10) as smtp:
+                for message in messages:
+                    email = EmailMessage()
+                    email["From"] = self.sender
+                    email["To"] = message["to_email"]
+                    email["Subject"] = apply_substitutions(message["subject"], message.get("substitutions"))
+                    email.set_content(apply_substitutions(message["content"], message.get("substitutions")))
+                    try:
+                        smtp.send_message(email)
+                        results.append(True)
+                    except smtplib.SMTPException as e:
+                        app_logger.error(f"SMTP send to {message['to_email']} failed: {e}")
+                        results.append(False)
+        except (OSError, smtplib.SMTPException) as e:
+            app_logger.error(f"SMTP connection failed: {e}")
+        return results + [False] * (len(messages) - len(results))
+
+    async def close(self):
+        pass
+
+
+def create_transport():
+    """Build the transport selected by EMAIL_TRANSPORT (sendgrid, file or smtp)"""
+    transport = os.getenv("EMAIL_TRANSPORT", "sendgrid").lower()
+
+    if transport == "file":
+        return FileSinkTransport(os.getenv("EMAIL_SINK_PATH", "sent_emails.jsonl"), SENDER_EMAIL)
+    if transport == "smtp":
+        return SMTPTransport(os.getenv("SMTP_HOST", "localhost"), int(os.getenv("SMTP_PORT", "1025")), SENDER_EMAIL)
+    if transport != "sendgrid":
+        raise ValueError(f"Unknown EMAIL_TRANSPORT: {transport}")
+    return SendGridTransport(os.getenv("SENDGRID_API_KEY", ""), SENDER_EMAIL)
+
+
+email_transport = create_transport()
+
+
+async def _send_batch(messages: list) -> list:
+    """Transport call with latency and per-message outcome metrics"""
+    with span("email", EMAIL_SECONDS, transport=type(email_transport).__name__):
+        results = await email_transport.send_batch(messages)
+    delivered = sum(1 for ok in results if ok)
+    EMAILS.inc(delivered, result="sent")
+    EMAILS.inc(len(results) - delivered, result="failed")
+    return results
+
+
+async def send_email(to_email: str, subject: str, content: str) -> bool:
+    """Send a single message"""
     try:
-        sg = SendGridAPIClient(os.getenv("SENDGRID_API_KEY"))
-        sg.send(message)
-        return True
+        results = await _send_batch(
+            [{"to_email": to_email, "subject": subject, "content": content}]
+        )
+        return results[0]
     except Exception as e:
-        print("Email error:", e)
+        app_logger.error(f"Email error: {e}")
         return False
+
+
+async def send_email_batch(messages: list) -> list:
+    """
+    Send many messages, one result per message.
+    Each message is a dict with to_email, subject, content and optional
+    substitutions ({token: value}) applied to subject and content per recipient.
+    """
+    if not messages:
+        return []
+    try:
+        return await _send_batch(messages)
+    except Exception as e:
+        app_logger.error(f"Batch email error: {e}")
+        return [False] * len(messages)
@@ -0,0 +1,62 @@
+def merge_intervals(intervals: list, buffer: int = 0) -> list:
+    """Merge overlapping or touching (start, end) minute intervals, padding each by `buffer`"""
+    merged = []
+    for start, end in sorted(intervals):
+        start, end = start - buffer, end + buffer
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def free_intervals(booked: list, day_start: int, day_end: int) -> list:
+    """Gaps between merged booked intervals within [day_start, day_end)"""
+    free = []
+    cursor = day_start
+    for start, end in booked:
+        if start > cursor:
+            free.append((cursor, min(start, day_end)))
+        cursor = max(cursor, end)
+        if cursor >= day_end:
+            break
+    if cursor < day_end:
+        free.append((cursor, day_end))
+    return [(start, end) for start, end in free if end > start]
+
+
+def fit_starts(free: list, duration: int, step: int = 15, min_gap: int = 0) -> list:
+    """
+    Every start minute where `duration` fits inside a free interval.
+    Starts are stepped from the beginning of each free interval so short visits pack
+    tightly against existing bookings, and the latest start flush with the next booking
+    is always included. With `min_gap`, starts that would leave an idle fragment shorter
+    than `min_gap` minutes before or after the visit are skipped.
+    """
+    step = max(step, 1)
+    starts = []
+    for free_start, free_end in free:
+        latest = free_end - duration
+        if latest < free_start:
+            continue
+
+        candidates = list(range(free_start, latest + 1, step))
+        if candidates[-1] != latest:
+            candidates.append(latest)
+
+        for start in candidates:
+            before = start - free_start
+            after = free_end - (start + duration)
+            if min_gap and (0 < before < min_gap or 0 < after < min_gap):
+                continue
+            starts.append(start)
+    return starts
+
+
+def nearest_starts(booked: list, target: int, duration: int, day_start: int, day_end: int,
+                   step: int = 15, limit: int = 3) -> list:
+    """The `limit` free start minutes closest to `target` for a visit of `duration`"""
+    free = free_intervals(merge_intervals(booked), day_start, day_end)
+    starts = fit_starts(free, duration, step)
+    return sorted(starts, key=lambda start: (abs(start - target), start))[:limit]
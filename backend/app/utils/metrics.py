@@ -0,0 +1,196 @@
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+
+# Prometheus' default latency buckets, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> list:
+        with self._lock:
+            return [f"{self.name}{_label_text(key)} {value}" for key, value in self._values.items()]
+
+
+class Histogram:
+    """Latency histogram with fixed cumulative buckets, per label set"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0}
+            series["counts"][bisect_left(self.buckets, value)] += 1
+            series["sum"] += value
+
+    def samples(self) -> list:
+        lines = []
+        with self._lock:
+            for key, series in self._series.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), series["counts"]):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{self.name}_bucket{_label_text(key + (('le', le),))} {cumulative}")
+                lines.append(f"{self.name}_sum{_label_text(key)} {series['sum']}")
+                lines.append(f"{self.name}_count{_label_text(key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named counters and histograms rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, help_text))
+
+    def histogram(self, name: str, help_text: str, buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, help_text, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+# Global registry
+metrics = MetricsRegistry()
+
+HTTP_SECONDS = metrics.histogram("scheduler_http_request_seconds", "HTTP request latency until response headers")
+ROUTE_SECONDS = metrics.histogram("scheduler_route_seconds", "Intent routing latency")
+DISPATCH_SECONDS = metrics.histogram("scheduler_dispatch_seconds", "Dispatcher handler latency per intent")
+DB_SECONDS = metrics.histogram("scheduler_db_query_seconds", "Supabase REST query latency until response headers")
+DB_ERRORS = metrics.counter("scheduler_db_query_errors_total", "Supabase REST responses with an error status")
+LLM_SECONDS = metrics.histogram("scheduler_llm_seconds", "LLM call latency (whole stream for streaming calls)")
+LLM_FIRST_TOKEN_SECONDS = metrics.histogram("scheduler_llm_first_token_seconds", "Time to first streamed LLM token")
+LLM_TOKENS = metrics.counter("scheduler_llm_tokens_total", "LLM tokens by call site and kind (prompt, cached, completion)")
+EMAIL_SECONDS = metrics.histogram("scheduler_email_send_seconds", "Email transport batch latency")
+EMAILS = metrics.counter("scheduler_emails_total", "Emails handed to the transport, by result")
+
+
+# Per-request timing breakdown in a Server-Timing header (and the stream's done event)
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING", "false").lower() == "true"
+
+# Spans recorded during the current request, for the optional Server-Timing header
+_request_timings: ContextVar = ContextVar("request_timings", default=None)
+
+
+def start_request_timing() -> list:
+    """Collect span durations for the current request; returns the (shared, mutable) list"""
+    timings = []
+    _request_timings.set(timings)
+    return timings
+
+
+def record_span(name: str, seconds: float):
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+@contextmanager
+def span(name: str, histogram: Histogram = None, **labels):
+    """Time a block into `histogram` and the current request's timing breakdown"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        if histogram is not None:
+            histogram.observe(elapsed, **labels)
+        record_span(name, elapsed)
+
+
+def server_timing_header(timings: list) -> str:
+    """Server-Timing value with total duration and call count per span name"""
+    totals = {}
+    for name, seconds in timings:
+        total, count = totals.get(name, (0.0, 0))
+        totals[name] = (total + seconds, count + 1)
+    return ", ".join(
+        f'{name};dur={total * 1000:.1f};desc="{count}x"' for name, (total, count) in totals.items()
+    )
+
+
+def timing_summary(timings: list) -> dict:
+    """Milliseconds per span name, for places a header can't carry them (e.g. after streaming)"""
+    totals = {}
+    for name, seconds in timings:
+        totals[name] = totals.get(name, 0.0) + seconds * 1000
+    return {name: round(total, 1) for name, total in totals.items()}
+
+
+def _query_labels(request) -> dict:
+    """table/operation labels from a PostgREST request URL"""
+    path = request.url.path.split("/rest/v1/", 1)[-1].strip("/")
+    if path.startswith("rpc/"):
+        return {"table": path[4:], "operation": "rpc"}
+    operation = {"GET": "select", "POST": "insert", "PATCH": "update", "DELETE": "delete"}.get(request.method, request.method.lower())
+    return {"table": path or "unknown", "operation": operation}
+
+
+async def _on_db_request(request):
+    request.extensions["metrics_started"] = time.perf_counter()
+
+
+async def _on_db_response(response):
+    started = response.request.extensions.get("metrics_started")
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    labels = _query_labels(response.request)
+    DB_SECONDS.observe(elapsed, **labels)
+    if response.status_code >= 400:
+        DB_ERRORS.inc(status=response.status_code, **labels)
+    record_span("db", elapsed)
+
+
+def instrument_http_client(client):
+    """Time every request of an httpx.AsyncClient as a Supabase query"""
+    hooks = client.event_hooks
+    hooks.setdefault("request", []).append(_on_db_request)
+    hooks.setdefault("response", []).append(_on_db_response)
+    client.event_hooks = hooks
@@ -0,0 +1,279 @@
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from app.utils.email_service import send_email_batch
+from app.utils.logger import app_logger
+
+
+class Outbox:
+    """
+    Durable queue of side effects (emails, waitlist fan-out) in a local SQLite file.
+    Agents enqueue a job right after their state change commits and return; a
+    background worker drains due jobs in batches, retrying failures with
+    exponential backoff. A job's idempotency key is unique, so enqueueing the
+    same effect twice (a retried request, two workers) delivers it once.
+    The SQLite file is opened on first use (or by open() at startup), so
+    importing the module never creates it.
+    """
+
+    # Claimed jobs whose worker died become due again after this long
+    LEASE_SECONDS = 120
+    # Delivered jobs (and their idempotency keys) are kept this long
+    RETENTION_SECONDS = 24 * 3600
+    PURGE_INTERVAL_SECONDS = 300
+
+    def __init__(self, path: str, batch_size: int = 100, max_attempts: int = 8,
+                 base_delay: float = 2.0, max_delay: float = 600.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._handlers = {}
+        self._lock = threading.Lock()
+        self._wakeup = None
+        self._last_purge = 0.0
+        self._busy_seconds = 0.0
+        self.metrics = {"enqueued": 0, "duplicates": 0, "delivered": 0, "retried": 0, "dead": 0}
+        self._latency_total = 0.0
+        self._db = None
+
+    def open(self):
+        """Open (and if needed create) the SQLite file; safe to call more than once"""
+        with self._lock:
+            self._open()
+
+    def _open(self) -> sqlite3.Connection:
+        if self._db is None:
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS outbox ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, payload TEXT NOT NULL, "
+                "idempotency_key TEXT UNIQUE, status TEXT NOT NULL DEFAULT 'pending', "
+                "attempts INTEGER NOT NULL DEFAULT 0, next_attempt_at REAL NOT NULL, "
+                "last_error TEXT, created_at REAL NOT NULL, done_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at)")
+            self._db = conn
+        return self._db
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # Callers hold self._lock
+        return self._open()
+
+    def register(self, kind: str, handler):
+        """
+        Handle jobs of `kind`. The handler is an async function taking a list of
+        payloads and returning one bool per payload (True = delivered).
+        """
+        self._handlers[kind] = handler
+
+    async def enqueue(self, kind: str, payload: dict, idempotency_key: str = None) -> bool:
+        """Persist a job; returns False if a job with this idempotency key already exists"""
+        return await self.enqueue_many(kind, [(payload, idempotency_key)]) == 1
+
+    async def enqueue_many(self, kind: str, jobs: list) -> int:
+        """Persist (payload, idempotency_key) pairs in one transaction; returns how many were new"""
+        if not jobs:
+            return 0
+        # The write (and the lock the worker holds while claiming) stays off the event loop
+        inserted = await asyncio.to_thread(self._insert, kind, jobs)
+
+        self.metrics["enqueued"] += inserted
+        self.metrics["duplicates"] += len(jobs) - inserted
+        if inserted and self._wakeup is not None:
+            self._wakeup.set()
+        return inserted
+
+    def _insert(self, kind: str, jobs: list) -> int:
+        now = time.time()
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO outbox (kind, payload, idempotency_key, next_attempt_at, created_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [(kind, json.dumps(payload, separators=(",", ":")), key, now, now) for payload, key in jobs]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return self._conn.total_changes - before
+
+    def _claim(self) -> list:
+        """
+        Lease up to batch_size due jobs so no other worker picks them up.
+        The attempt is counted as part of the claim, so a job whose worker dies
+        mid-delivery still uses up an attempt; one that has run out of attempts
+        when its lease lapses is dead-lettered instead of handed out again.
+        Returned rows carry the attempt number of this delivery.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT id, kind, payload, attempts, created_at FROM outbox "
+                    "WHERE status IN ('pending', 'in_flight') AND next_attempt_at <= ? "
+                    "ORDER BY next_attempt_at LIMIT ?",
+                    (now, self.batch_size)
+                ).fetchall()
+                dead = [row for row in rows if row[3] >= self.max_attempts]
+                rows = [(job_id, kind, payload, attempts + 1, created_at)
+                        for job_id, kind, payload, attempts, created_at in rows if attempts < self.max_attempts]
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE outbox SET status = 'in_flight', next_attempt_at = ?, attempts = attempts + 1 "
+                        f"WHERE id IN ({','.join('?' * len(rows))})",
+                        (now + self.LEASE_SECONDS, *[row[0] for row in rows])
+                    )
+                if dead:
+                    self._conn.execute(
+                        f"UPDATE outbox SET status = 'dead', last_error = 'Lease expired on the last attempt' "
+                        f"WHERE id IN ({','.join('?' * len(dead))})",
+                        [row[0] for row in dead]
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        self.metrics["dead"] += len(dead)
+        for row in dead:
+            app_logger.error(f"Outbox job {row[0]} gave up after {self.max_attempts} attempts: lease expired")
+        return rows
+
+    def _retry_delay(self, attempts: int) -> float:
+        return min(self.base_delay * 2 ** (attempts - 1), self.max_delay) * random.uniform(0.5, 1.0)
+
+    def _record(self, delivered: list, failed: list):
+        """Mark delivered jobs done and reschedule (or give up on) failed ones"""
+        now = time.time()
+        dead = [(job_id, error) for job_id, attempts, error in failed if attempts >= self.max_attempts]
+        retry = [(now + self._retry_delay(attempts), attempts, error, job_id)
+                 for job_id, attempts, error in failed if attempts < self.max_attempts]
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "UPDATE outbox SET status = 'done', done_at = ? WHERE id = ?",
+                    [(now, job_id) for job_id in delivered]
+                )
+                self._conn.executemany(
+                    "UPDATE outbox SET status = 'pending', next_attempt_at = ?, attempts = ?, last_error = ? WHERE id = ?",
+                    retry
+                )
+                self._conn.executemany(
+                    "UPDATE outbox SET status = 'dead', attempts = ?, last_error = ? WHERE id = ?",
+                    [(self.max_attempts, error, job_id) for job_id, error in dead]
+                )
+                if now - self._last_purge > self.PURGE_INTERVAL_SECONDS:
+                    self._last_purge = now
+                    self._conn.execute(
+                        "DELETE FROM outbox WHERE status = 'done' AND done_at <= ?",
+                        (now - self.RETENTION_SECONDS,)
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        self.metrics["retried"] += len(retry)
+        self.metrics["dead"] += len(dead)
+        for job_id, error in dead:
+            app_logger.error(f"Outbox job {job_id} gave up after {self.max_attempts} attempts: {error}")
+
+    async def drain_once(self) -> int:
+        """Deliver one claimed batch; returns the number of jobs processed (dead-lettered ones excluded)"""
+        rows = await asyncio.to_thread(self._claim)
+        if not rows:
+            return 0
+
+        started = time.monotonic()
+        by_kind = {}
+        for row in rows:
+            by_kind.setdefault(row[1], []).append(row)
+
+        delivered, failed = [], []
+        for kind, jobs in by_kind.items():
+            handler = self._handlers.get(kind)
+            if handler is None:
+                failed.extend((job[0], job[3], f"No handler for {kind}") for job in jobs)
+                continue
+
+            try:
+                results = await handler([json.loads(job[2]) for job in jobs])
+                error = "Handler reported failure"
+            except Exception as e:
+                results = [False] * len(jobs)
+                error = str(e)
+                app_logger.error(f"Outbox handler {kind} failed for {len(jobs)} jobs: {e}")
+
+            # A handler that returns fewer results than jobs failed the rest;
+            # they would otherwise sit in_flight until the lease lapsed
+            results = list(results or [])
+            if len(results) < len(jobs):
+                app_logger.error(f"Outbox handler {kind} returned {len(results)} results for {len(jobs)} jobs")
+
+            for i, job in enumerate(jobs):
+                if i >= len(results):
+                    failed.append((job[0], job[3], "Handler returned no result for this job"))
+                elif results[i]:
+                    delivered.append(job[0])
+                    self._latency_total += time.time() - job[4]
+                else:
+                    failed.append((job[0], job[3], error))
+
+        await asyncio.to_thread(self._record, delivered, failed)
+        self.metrics["delivered"] += len(delivered)
+        self._busy_seconds += time.monotonic() - started
+        return len(rows)
+
+    async def run(self, poll_interval: float = 1.0):
+        """Worker loop: drain while there is work, then sleep until enqueue or the next poll"""
+        self._wakeup = asyncio.Event()
+        while True:
+            try:
+                while await self.drain_once() >= self.batch_size:
+                    pass
+            except Exception as e:
+                app_logger.error(f"Outbox worker error: {e}")
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+        delivered = self.metrics["delivered"]
+        return {
+            "path": self.path,
+            "pending": counts.get("pending", 0) + counts.get("in_flight", 0),
+            "dead_letters": counts.get("dead", 0),
+            **self.metrics,
+            "throughput_per_second": round(delivered / self._busy_seconds, 1) if self._busy_seconds else 0.0,
+            "avg_delivery_lag_seconds": round(self._latency_total / delivered, 3) if delivered else 0.0
+        }
+
+
+outbox = Outbox(
+    os.getenv("OUTBOX_PATH", "outbox.db"),
+    batch_size=int(os.getenv("OUTBOX_BATCH_SIZE", "100")),
+    max_attempts=int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+)
+
+# Emails are the common case: a whole batch goes out through one transport call
+outbox.register("email", send_email_batch)
@@ -0,0 +1,73 @@
+import re
+from app.utils.metrics import LLM_TOKENS
+
+# Rough GPT-4o tokenisation: words, numbers and punctuation runs, with long
+# words costing about one token per four characters
+_PIECE_RE = re.compile(r"\w+|[^\w\s]+|\s+")
+
+
+def count_tokens(text: str) -> int:
+    """Approximate token count, close enough for budgeting prompt sections"""
+    if not text:
+        return 0
+    tokens = 0
+    for piece in _PIECE_RE.findall(text):
+        if piece.isspace():
+            tokens += piece.count("\n") // 2
+        else:
+            tokens += -(-len(piece) // 4)
+    return tokens
+
+
+def count_message_tokens(messages: list) -> int:
+    """Approximate prompt size of a chat messages list (about 4 tokens of overhead per message)"""
+    return sum(count_tokens(message.get("content") or "") + 4 for message in messages) + 2
+
+
+def fit_lines(lines: list, budget: int) -> list:
+    """Keep lines in order until the budget is spent"""
+    kept = []
+    for line in lines:
+        budget -= count_tokens(line) + 1
+        if budget < 0:
+            break
+        kept.append(line)
+    return kept
+
+
+class UsageTracker:
+    """Running totals of prompt, cached and completion tokens per LLM call site"""
+
+    def __init__(self):
+        self._totals = {}
+
+    def record(self, name: str, usage) -> dict:
+        """Add a response's usage (OpenAI usage object or None); returns the per-request numbers"""
+        if usage is None:
+            return {}
+        details = getattr(usage, "prompt_tokens_details", None)
+        numbers = {
+            "prompt_tokens": usage.prompt_tokens or 0,
+            "cached_tokens": (getattr(details, "cached_tokens", 0) or 0) if details else 0,
+            "completion_tokens": usage.completion_tokens or 0
+        }
+
+        totals = self._totals.setdefault(name, {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0})
+        totals["requests"] += 1
+        for key, value in numbers.items():
+            totals[key] += value
+            LLM_TOKENS.inc(value, call=name, kind=key.replace("_tokens", ""))
+        return numbers
+
+    def stats(self) -> dict:
+        return {
+            name: {
+                **totals,
+                "cache_hit_rate": round(totals["cached_tokens"] / totals["prompt_tokens"], 3) if totals["prompt_tokens"] else 0.0
+            }
+            for name, totals in self._totals.items()
+        }
+
+
+# Global LLM usage totals
+llm_usage = UsageTracker()
@@ -0,0 +1,143 @@
+import os
+from sortedcontainers import SortedKeyList
+from app.database import supabase
+from app.utils.availability_index import to_minutes
+from app.utils.cache import TTLCache
+from app.utils.logger import db_logger
+
+# How far from their preferred time a waitlisted patient is still offered a slot
+WAITLIST_TIME_FLEX_MINUTES = int(os.getenv("WAITLIST_TIME_FLEX_MINUTES", "60"))
+
+
+def _preferred_minutes(preferred_time) -> int:
+    """Minutes for an "HH:MM" preferred time; None for free text like "morning", which means anytime"""
+    if not preferred_time:
+        return None
+    try:
+        return to_minutes(preferred_time)
+    except (ValueError, AttributeError):
+        return None
+
+
+class _DayQueue:
+    """Waiting entries for one doctor-day, split by whether they have a preferred time"""
+
+    def __init__(self):
+        # Keyed by preferred start minute so a freed interval is a range lookup
+        self.timed = SortedKeyList(key=lambda entry: (entry["_preferred"], entry["created_at"]))
+        # Keyed by created_at: first come, first served
+        self.anytime = SortedKeyList(key=lambda entry: entry["created_at"])
+
+    def add(self, entry: dict):
+        preferred = _preferred_minutes(entry.get("preferred_time"))
+        if preferred is not None:
+            entry["_preferred"] = preferred
+            self.timed.add(entry)
+        else:
+            self.anytime.add(entry)
+
+    def remove(self, waitlist_id) -> bool:
+        for entries in (self.timed, self.anytime):
+            for entry in entries:
+                if entry["id"] == waitlist_id:
+                    entries.remove(entry)
+                    return True
+        return False
+
+    def __len__(self) -> int:
+        return len(self.timed) + len(self.anytime)
+
+
+class WaitlistIndex:
+    """
+    In-memory waitlist matcher keyed by (doctor, date).
+    Entries with a preferred time are ordered by that time, so the patients who
+    can use a freed interval are found with a bisect (O(log n + k)) rather than
+    a scan of the whole queue. Days are loaded from the waitlist table on first
+    use and refreshed after a TTL so other workers' changes show up.
+    """
+
+    def __init__(self, ttl_seconds: float = 60, max_days: int = 2048,
+                 flex_minutes: int = WAITLIST_TIME_FLEX_MINUTES):
+        self._days = TTLCache(max_entries=max_days, ttl_seconds=ttl_seconds)
+        self.flex_minutes = flex_minutes
+
+    async def load(self, doctor_name: str, date: str) -> _DayQueue:
+        queue = self._days.get((doctor_name, date))
+        if queue is not None:
+            return queue
+
+        response = await supabase.table("waitlist").select(
+            "id, patient_name, patient_email, preferred_time, appointment_type, created_at"
+        ).eq("doctor_name", doctor_name).eq("preferred_date", date).eq("status", "waiting").execute()
+
+        queue = _DayQueue()
+        for entry in response.data or []:
+            queue.add(dict(entry))
+        self._days.set((doctor_name, date), queue)
+
+        db_logger.debug(f"Waitlist index loaded {len(queue)} entries for Dr. {doctor_name} on {date}")
+        return queue
+
+    def add(self, doctor_name: str, date: str, entry: dict):
+        """Keep a loaded day in step with a new waitlist row"""
+        queue = self._days.peek((doctor_name, date))
+        if queue is not None:
+            queue.add(dict(entry))
+
+    def remove(self, doctor_name: str, date: str, waitlist_id):
+        queue = self._days.peek((doctor_name, date))
+        if queue is not None:
+            queue.remove(waitlist_id)
+
+    def invalidate(self, doctor_name: str, date: str):
+        self._days.invalidate((doctor_name, date))
+
+    def clear(self):
+        self._days.clear()
+
+    async def candidates(self, doctor_name: str, date: str, start: int, end: int,
+                         durations: dict, default_duration: int = 30, limit: int = 3) -> list:
+        """
+        Waiting entries that fit inside the freed interval [start, end) minutes,
+        oldest request first, at most `limit` of them. An entry fits when its
+        appointment type's duration can start within flex_minutes of its preferred
+        time (or anywhere, if it has none) without running past the interval end.
+        """
+        queue = await self.load(doctor_name, date)
+        flex = self.flex_minutes
+
+        def duration_of(entry):
+            return durations.get((entry.get("appointment_type") or "").lower(), default_duration)
+
+        eligible = []
+        for entry in queue.timed.irange_key((start - flex, ""), (end + flex, "\uffff")):
+            duration = duration_of(entry)
+            earliest = max(start, entry["_preferred"] - flex)
+            latest = min(end - duration, entry["_preferred"] + flex)
+            if earliest <= latest:
+                eligible.append(entry)
+
+        # Already in created_at order, so only the first `limit` fitting entries can matter
+        anytime = []
+        for entry in queue.anytime:
+            if duration_of(entry) <= end - start:
+                anytime.append(entry)
+                if len(anytime) >= limit:
+                    break
+
+        eligible.extend(anytime)
+        eligible.sort(key=lambda entry: entry["created_at"])
+        return eligible[:limit]
+
+    def start_for(self, entry: dict, start: int, end: int, duration: int) -> int:
+        """Start minute inside [start, end) closest to the entry's preferred time"""
+        preferred = entry.get("_preferred", start)
+        return min(max(preferred, start), end - duration)
+
+    def stats(self) -> dict:
+        return self._days.stats()
+
+
+# Global waitlist index
+waitlist_index = WaitlistIndex()
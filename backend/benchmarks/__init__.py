@@ -0,0 +1 @@
+"""Performance benchmarks run against local Supabase and Azure OpenAI stand-ins; see benchmarks/run.py"""
@@ -0,0 +1,119 @@
+import random
+from datetime import datetime, timedelta
+
+DOCTORS = [
+    ("Sarah Smith", "cardiology"),
+    ("James Lee", "cardiology"),
+    ("Maria Garcia", "dermatology"),
+    ("David Chen", "dermatology"),
+    ("Emily Brown", "pediatrics"),
+    ("Omar Khan", "pediatrics"),
+    ("Anna Novak", "general practice"),
+    ("Peter Walsh", "general practice"),
+]
+
+APPOINTMENT_TYPES = [("checkup", 30), ("consultation", 45), ("follow_up", 15), ("lab_review", 20)]
+PAST_STATUSES = ["completed", "completed", "completed", "cancelled", "no_show"]
+
+# Half-hour starts between 09:00 and 16:30
+SLOT_TIMES = [f"{minutes // 60:02d}:{minutes % 60:02d}" for minutes in range(9 * 60, 17 * 60, 30)]
+
+
+def _end_time(time: str, duration: int) -> str:
+    hours, minutes = map(int, time.split(":"))
+    total = hours * 60 + minutes + duration
+    return f"{total // 60:02d}:{total % 60:02d}"
+
+
+def weekdays(start: datetime, count: int) -> list:
+    days, day = [], start
+    while len(days) < count:
+        if day.weekday() < 5:
+            days.append(day.strftime("%Y-%m-%d"))
+        day += timedelta(days=1)
+    return days
+
+
+def seed(db, days: int = 20, past_days: int = 20, patients: int = 200,
+         fill: float = 0.5, seed_value: int = 7) -> dict:
+    """
+    Fill a FakePostgrest with a deterministic clinic: doctors, about `fill` of
+    every weekday slot booked over the next `days` weekdays, past visits,
+    and waitlist entries (some holding an offered slot).
+    Returns the pools scenarios draw their inputs from.
+    """
+    rng = random.Random(seed_value)
+    # Upcoming days start two days out so cancellations clear the 24 hour notice
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    future = weekdays(today + timedelta(days=2), days)
+    past = weekdays(today - timedelta(days=past_days * 7 // 5 + 1), past_days)
+    past = [date for date in past if date < today.strftime("%Y-%m-%d")]
+    names = [f"Patient {i:04d}" for i in range(patients)]
+
+    db.insert_rows("doctors", [
+        {"name": name, "specialty": specialty, "active": True} for name, specialty in DOCTORS
+    ])
+
+    def appointment(doctor: str, date: str, time: str, status: str) -> dict:
+        apt_type, duration = rng.choice(APPOINTMENT_TYPES)
+        patient = rng.choice(names)
+        return {
+            "patient_name": patient,
+            "patient_email": f"{patient.lower().replace(' ', '.')}@example.com",
+            "doctor_name": doctor,
+            "appointment_date": date,
+            "appointment_time": time,
+            "end_time": _end_time(time, duration),
+            "appointment_type": apt_type,
+            "duration_minutes": duration,
+            "status": status,
+            "reminder_sent": date < today.strftime("%Y-%m-%d"),
+        }
+
+    # free: half-hour slots no appointment overlaps, so bookings there succeed
+    rows, free = [], []
+    for doctor, _ in DOCTORS:
+        for date in past + future:
+            busy_until = "00:00"
+            for time in SLOT_TIMES:
+                if rng.random() < fill:
+                    status = rng.choice(PAST_STATUSES) if date in past else "confirmed"
+                    rows.append(appointment(doctor, date, time, status))
+                    busy_until = max(busy_until, rows[-1]["end_time"])
+                elif date in future and time >= busy_until:
+                    free.append((doctor, date, time))
+    appointments = db.insert_rows("appointments", rows)
+
+    # Waiting entries, and offers holding one of the free slots
+    rng.shuffle(free)
+    waitlist, holds = [], []
+    for doctor, date, time in free[:len(free) // 10]:
+        waitlist.append({
+            "patient_name": rng.choice(names), "doctor_name": doctor, "preferred_date": date,
+            "preferred_time": time, "appointment_type": "checkup", "status": "waiting",
+        })
+    offer_slots = free[len(free) // 10:len(free) // 10 + len(free) // 20]
+    for doctor, date, time in offer_slots:
+        holds.append(appointment(doctor, date, time, "held"))
+    held = db.insert_rows("appointments", holds)
+    expires = (datetime.utcnow() + timedelta(days=1)).isoformat()
+    for (doctor, date, time), hold in zip(offer_slots, held):
+        waitlist.append({
+            "patient_name": hold["patient_name"], "doctor_name": doctor, "preferred_date": date,
+            "preferred_time": time, "appointment_type": "checkup", "status": "offered",
+            "offer_expires_at": expires, "held_appointment_id": str(hold["id"]),
+        })
+    entries = db.insert_rows("waitlist", waitlist)
+
+    upcoming = [row for row in appointments if row["status"] == "confirmed"]
+    rng.shuffle(upcoming)
+    return {
+        "doctors": DOCTORS,
+        "future_dates": future,
+        "past_dates": past,
+        "patients": sorted({row["patient_name"] for row in appointments}),
+        "free_slots": free[len(free) // 10 + len(free) // 20:],
+        "upcoming": upcoming,
+        "waiting": [row for row in entries if row["status"] == "waiting"],
+        "offers": [row for row in entries if row["status"] == "offered"],
+    }
@@ -0,0 +1,151 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import Counter
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DEFAULT_ROUTE = {
+    "intent": "general_inquiry",
+    "parameters": {},
+    "needs_clarification": False,
+    "clarification_question": None,
+    "extracted_entities": {},
+    "confidence": 0.9
+}
+
+REPLY_WORDS = (
+    "Your request has been handled and the details are below. Let me know if "
+    "you would like to book, move or cancel anything else."
+).split()
+
+# Azure only caches prompts of at least 1024 tokens, in 128 token increments
+CACHE_MIN_TOKENS = 1024
+CACHE_BLOCK_TOKENS = 128
+
+
+def approx_tokens(text: str) -> int:
+    return max(1, len(text) // 4) if text else 0
+
+
+class FakeChatCompletions:
+    """
+    Azure OpenAI chat-completions stand-in. JSON-mode calls (the router) answer
+    with `router_replies[user message]` or a general_inquiry route; other calls
+    answer with `reply_tokens` words of filler text, streamed or not.
+    first_token_ms is the model's think time and token_ms the delay between
+    tokens. Usage is reported with simulated prefix caching so cache hit rates
+    in /health/llm behave as they would against the real service.
+    """
+
+    def __init__(self, first_token_ms: float = 0.0, token_ms: float = 0.0, reply_tokens: int = 40):
+        self.first_token_ms = first_token_ms
+        self.token_ms = token_ms
+        self.reply_tokens = reply_tokens
+        self.router_replies = {}
+        self.requests = Counter()
+        self._requests_lock = threading.Lock()
+        self._seen_prefixes = set()
+
+    def request_total(self) -> int:
+        with self._requests_lock:
+            return sum(self.requests.values())
+
+    def _count(self, key: str):
+        with self._requests_lock:
+            self.requests[key] += 1
+
+    def reply_for(self, body: dict) -> str:
+        if (body.get("response_format") or {}).get("type") == "json_object":
+            user_messages = [m.get("content") for m in body.get("messages", []) if m.get("role") == "user"]
+            message = user_messages[-1] if user_messages else ""
+            return json.dumps(self.router_replies.get(message, DEFAULT_ROUTE))
+        words = [REPLY_WORDS[i % len(REPLY_WORDS)] for i in range(self.reply_tokens)]
+        return " ".join(words)
+
+    def usage_for(self, messages: list, completion: str) -> dict:
+        """Token usage, counting the longest previously seen message prefix as cached"""
+        digest = hashlib.sha256()
+        prompt_tokens = cached = 0
+        for message in messages:
+            digest.update(json.dumps(message, sort_keys=True).encode())
+            prompt_tokens += approx_tokens(message.get("content") or "") + 4
+            key = digest.hexdigest()
+            if key in self._seen_prefixes:
+                cached = prompt_tokens
+            self._seen_prefixes.add(key)
+
+        cached = cached // CACHE_BLOCK_TOKENS * CACHE_BLOCK_TOKENS if cached >= CACHE_MIN_TOKENS else 0
+        completion_tokens = approx_tokens(completion)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached}
+        }
+
+    def create_app(self) -> FastAPI:
+        app = FastAPI()
+
+        # Azure path layout, plus the plain OpenAI one
+        @app.post("/openai/deployments/{deployment}/chat/completions")
+        @app.post("/v1/chat/completions")
+        async def chat_completions(request: Request, deployment: str = None):
+            body = await request.json()
+            model = body.get("model") or deployment
+            content = self.reply_for(body)
+            usage = self.usage_for(body.get("messages", []), content)
+            kind = "json" if (body.get("response_format") or {}).get("type") == "json_object" else "text"
+
+            if body.get("stream"):
+                self._count(f"stream:{kind}")
+                include_usage = (body.get("stream_options") or {}).get("include_usage")
+                return StreamingResponse(
+                    self._stream(model, content, usage if include_usage else None),
+                    media_type="text/event-stream"
+                )
+
+            self._count(kind)
+            await self._sleep(self.first_token_ms + self.token_ms * len(content.split()))
+            return JSONResponse({
+                "id": f"chatcmpl-bench-{time.time_ns()}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop"
+                }],
+                "usage": usage
+            })
+
+        return app
+
+    async def _stream(self, model: str, content: str, usage: dict = None):
+        chunk_id = f"chatcmpl-bench-{time.time_ns()}"
+        created = int(time.time())
+
+        def event(choices: list, **extra) -> str:
+            chunk = {"id": chunk_id, "object": "chat.completion.chunk", "created": created,
+                     "model": model, "choices": choices, **extra}
+            return f"data: {json.dumps(chunk)}\n\n"
+
+        await self._sleep(self.first_token_ms)
+        words = content.split(" ")
+        for i, word in enumerate(words):
+            if i:
+                await self._sleep(self.token_ms)
+            text = word if i == len(words) - 1 else word + " "
+            yield event([{"index": 0, "delta": {"content": text}, "finish_reason": None}])
+        yield event([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if usage:
+            yield event([], usage=usage)
+        yield "data: [DONE]\n\n"
+
+    @staticmethod
+    async def _sleep(ms: float):
+        if ms:
+            await asyncio.sleep(ms / 1000)
@@ -0,0 +1,326 @@
+import asyncio
+import json
+import threading
+from collections import Counter
+from datetime import datetime
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+TABLES = ("appointments", "doctors", "waitlist")
+
+# Column defaults the real tables fill in
+DEFAULTS = {
+    "appointments": {"status": "confirmed", "reminder_sent": False},
+    "doctors": {"active": True},
+    "waitlist": {"status": "waiting"},
+}
+
+# Query string keys that are not column filters
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "or", "and", "columns", "on_conflict"}
+
+
+def _split(text: str) -> list:
+    """Split a PostgREST list on top-level commas, honouring parentheses and quotes"""
+    parts, depth, quoted, current = [], 0, False, ""
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and char == ",":
+            parts.append(current)
+            current = ""
+            continue
+        current += char
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _unquote(value: str) -> str:
+    return value[1:-1] if len(value) >= 2 and value[0] == value[-1] == '"' else value
+
+
+def _coerce(raw: str, current):
+    """Parse a filter value as the type of the stored value it is compared with"""
+    if isinstance(current, bool):
+        return raw.lower() == "true"
+    if isinstance(current, int):
+        return int(raw)
+    if isinstance(current, float):
+        return float(raw)
+    return raw
+
+
+def _matches(current, operator: str, raw: str) -> bool:
+    if operator == "is":
+        return current is None if raw == "null" else current is (raw == "true")
+    if current is None:
+        return False
+    if operator == "in":
+        return current in {_coerce(_unquote(value), current) for value in _split(raw.strip("()"))}
+    value = _coerce(_unquote(raw), current)
+    if operator == "eq":
+        return current == value
+    if operator == "neq":
+        return current != value
+    if operator == "gt":
+        return current > value
+    if operator == "gte":
+        return current >= value
+    if operator == "lt":
+        return current < value
+    if operator == "lte":
+        return current <= value
+    raise ValueError(f"Unsupported operator: {operator}")
+
+
+def column_filter(column: str, expression: str):
+    """Predicate for `column=op.value` (optionally `not.op.value`)"""
+    negate = expression.startswith("not.")
+    if negate:
+        expression = expression[4:]
+    operator, _, raw = expression.partition(".")
+    return lambda row: _matches(row.get(column), operator, raw) != negate
+
+
+def logic_filter(operator: str, expression: str):
+    """Predicate for `or=(...)` / `and=(...)`, with nested and()/or() groups"""
+    predicates = []
+    for part in _split(expression.strip()[1:-1]):
+        if part.startswith(("and(", "or(")):
+            nested, _, body = part.partition("(")
+            predicates.append(logic_filter(nested, "(" + body))
+        else:
+            column, _, rest = part.partition(".")
+            predicates.append(column_filter(column, rest))
+    combine = any if operator == "or" else all
+    return lambda row: combine(predicate(row) for predicate in predicates)
+
+
+def order_rows(rows: list, order: str) -> list:
+    """Stable multi-column sort; nulls last ascending and first descending, like Postgres"""
+    for term in reversed(_split(order)):
+        column, _, direction = term.partition(".")
+        rows = sorted(
+            rows, key=lambda row: (row.get(column) is None, "" if row.get(column) is None else row.get(column)),
+            reverse=direction.startswith("desc")
+        )
+    return rows
+
+
+def project(row: dict, select: str) -> dict:
+    columns = [column.strip() for column in select.split(",") if column.strip()]
+    if not columns or "*" in columns:
+        return dict(row)
+    return {column: row.get(column) for column in columns}
+
+
+def _overlaps(row: dict, start: str, end: str) -> bool:
+    return row["appointment_time"] < end and (row.get("end_time") or row["appointment_time"]) > start
+
+
+class FakePostgrest:
+    """
+    In-memory stand-in for the Supabase REST API: the appointments, doctors and
+    waitlist tables, the waitlist_positions view and the booking functions
+    from migrations/, with an optional per-request delay for network latency.
+    """
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.tables = {name: [] for name in TABLES}
+        self.requests = Counter()
+        self._requests_lock = threading.Lock()
+        self._next_id = {name: 1 for name in TABLES}
+        self.views = {"waitlist_positions": self._waitlist_positions}
+        self.functions = {
+            "book_appointment_atomic": self._book_appointment_atomic,
+            "book_series_atomic": self._book_series_atomic,
+            "hold_slot_atomic": self._hold_slot_atomic,
+        }
+
+    def request_total(self) -> int:
+        with self._requests_lock:
+            return sum(self.requests.values())
+
+    def _count(self, key: str):
+        with self._requests_lock:
+            self.requests[key] += 1
+
+    def insert_rows(self, table: str, rows: list) -> list:
+        inserted = []
+        for row in rows:
+            row = {**DEFAULTS.get(table, {}), **row}
+            if row.get("id") is None:
+                row["id"] = self._next_id[table]
+            self._next_id[table] = max(self._next_id[table], row["id"] + 1)
+            row.setdefault("created_at", datetime.utcnow().isoformat())
+            self.tables[table].append(row)
+            inserted.append(dict(row))
+        return inserted
+
+    def query(self, table: str, params: list):
+        """Rows matching PostgREST query params, plus the unpaginated count"""
+        source = self.views[table]() if table in self.views else self.tables[table]
+        options = dict(params)
+        predicates = []
+        for key, value in params:
+            if key in ("or", "and"):
+                predicates.append(logic_filter(key, value))
+            elif key not in RESERVED_PARAMS:
+                predicates.append(column_filter(key, value))
+
+        rows = [row for row in source if all(predicate(row) for predicate in predicates)]
+        total = len(rows)
+        if "order" in options:
+            rows = order_rows(rows, options["order"])
+        offset = int(options.get("offset", 0))
+        rows = rows[offset:]
+        if "limit" in options:
+            rows = rows[:int(options["limit"])]
+        return rows, total, offset
+
+    # -- views and functions ---------------------------------------------------
+
+    def _waitlist_positions(self) -> list:
+        queues = {}
+        for entry in self.tables["waitlist"]:
+            if entry.get("status") == "waiting":
+                queues.setdefault((entry["doctor_name"], entry["preferred_date"]), []).append(entry)
+        rows = []
+        for queue in queues.values():
+            queue.sort(key=lambda entry: (entry["created_at"], entry["id"]))
+            for position, entry in enumerate(queue, start=1):
+                rows.append({**entry, "position": position, "queue_length": len(queue)})
+        return rows
+
+    def _day_bookings(self, doctor_name: str, date: str) -> list:
+        return sorted(
+            (row for row in self.tables["appointments"]
+             if row["doctor_name"] == doctor_name and row["appointment_date"] == date
+             and row.get("status") != "cancelled"),
+            key=lambda row: row["appointment_time"]
+        )
+
+    def _book_appointment_atomic(self, args: dict) -> dict:
+        booked = [
+            {"id": row["id"], "appointment_time": row["appointment_time"], "end_time": row.get("end_time")}
+            for row in self._day_bookings(args["p_doctor_name"], args["p_appointment_date"])
+        ]
+        conflicts = [
+            interval for interval in booked
+            if _overlaps(interval, args["p_appointment_time"], args["p_end_time"])
+        ]
+        if conflicts:
+            return {"status": "conflict", "conflicts": conflicts, "booked": booked}
+
+        row = {key[2:]: value for key, value in args.items()}
+        row["status"] = "confirmed"
+        return {"status": "booked", "appointment": self.insert_rows("appointments", [row])[0]}
+
+    def _book_series_atomic(self, args: dict) -> dict:
+        booked, conflicts = [], []
+        for row in args["p_rows"]:
+            day = self._day_bookings(row["doctor_name"], row["appointment_date"])
+            if any(_overlaps(existing, row["appointment_time"], row["end_time"]) for existing in day):
+                conflicts.append({
+                    "appointment_date": row["appointment_date"],
+                    "appointment_time": row["appointment_time"],
+                    "booked": [
+                        {"appointment_time": existing["appointment_time"], "end_time": existing.get("end_time")}
+                        for existing in day
+                    ]
+                })
+            else:
+                booked.extend(self.insert_rows("appointments", [{**row, "status": "confirmed"}]))
+        return {"booked": booked, "conflicts": conflicts}
+
+    def _hold_slot_atomic(self, args: dict) -> dict:
+        entry = next(
+            (row for row in self.tables["waitlist"]
+             if str(row["id"]) == str(args["p_waitlist_id"]) and row.get("status") == "waiting"),
+            None
+        )
+        if entry is None:
+            return {"status": "unavailable"}
+
+        day = self._day_bookings(args["p_doctor_name"], args["p_appointment_date"])
+        if any(_overlaps(row, args["p_appointment_time"], args["p_end_time"]) for row in day):
+            return {"status": "conflict", "booked": [
+                {"appointment_time": row["appointment_time"], "end_time": row.get("end_time")} for row in day
+            ]}
+
+        row = {key[2:]: value for key, value in args.items()
+               if key not in ("p_waitlist_id", "p_offer_expires_at")}
+        row["status"] = "held"
+        held = self.insert_rows("appointments", [row])[0]
+        entry.update({
+            "status": "offered", "offer_expires_at": args["p_offer_expires_at"],
+            "held_appointment_id": str(held["id"]), "notified_at": datetime.utcnow().isoformat()
+        })
+        return {"status": "held", "appointment": held}
+
+    # -- HTTP ------------------------------------------------------------------
+
+    def create_app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.post("/rest/v1/rpc/{function}")
+        async def rpc(function: str, request: Request):
+            await self._delay()
+            self._count(f"rpc:{function}")
+            handler = self.functions.get(function)
+            if handler is None:
+                return _error(404, "PGRST202", f"Could not find the function public.{function}")
+            return JSONResponse(handler(await request.json()))
+
+        @app.api_route("/rest/v1/{table}", methods=["GET", "POST", "PATCH", "DELETE"])
+        async def table(table: str, request: Request):
+            await self._delay()
+            self._count(f"{request.method}:{table}")
+            if table not in self.tables and table not in self.views:
+                return _error(404, "42P01", f'relation "public.{table}" does not exist')
+
+            params = list(request.query_params.multi_items())
+            select = dict(params).get("select", "*")
+            try:
+                if request.method == "GET":
+                    return self._select(table, params, select, request.headers.get("prefer", ""))
+                if table in self.views:
+                    return _error(405, "PGRST205", f"{table} is a read-only view")
+                if request.method == "POST":
+                    body = await request.json()
+                    rows = self.insert_rows(table, body if isinstance(body, list) else [body])
+                    return JSONResponse([project(row, select) for row in rows], status_code=201)
+
+                rows, _, _ = self.query(table, params)
+                if request.method == "PATCH":
+                    changes = await request.json()
+                    for row in rows:
+                        row.update(changes)
+                else:
+                    ids = {id(row) for row in rows}
+                    self.tables[table] = [row for row in self.tables[table] if id(row) not in ids]
+                return JSONResponse([project(row, select) for row in rows])
+            except (ValueError, KeyError, json.JSONDecodeError) as e:
+                return _error(400, "PGRST100", str(e))
+
+        return app
+
+    def _select(self, table: str, params: list, select: str, prefer: str) -> Response:
+        rows, total, offset = self.query(table, params)
+        headers = {}
+        if "count=" in prefer:
+            headers["Content-Range"] = f"{offset}-{offset + len(rows) - 1}/{total}" if rows else f"*/{total}"
+        return JSONResponse([project(row, select) for row in rows], headers=headers)
+
+    async def _delay(self):
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+
+
+def _error(status: int, code: str, message: str) -> JSONResponse:
+    return JSONResponse({"code": code, "message": message, "details": None, "hint": None}, status_code=status)
@@ -0,0 +1,107 @@
+import json
+import math
+
+# Latency keys compared between reports; p99 is shown but too noisy to gate on
+GATED_PERCENTILES = ("p50",)
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def latency_summary(seconds: list) -> dict:
+    """p50/p90/p99/mean/min/max in milliseconds"""
+    values = sorted(value * 1000 for value in seconds)
+    if not values:
+        return {}
+    return {
+        "p50": round(percentile(values, 50), 3),
+        "p90": round(percentile(values, 90), 3),
+        "p99": round(percentile(values, 99), 3),
+        "mean": round(sum(values) / len(values), 3),
+        "min": round(values[0], 3),
+        "max": round(values[-1], 3),
+    }
+
+
+def scenario_result(kind: str, samples: list, wall_seconds: float, failed: int,
+                    concurrency: int = 1, db_requests: int = 0, llm_requests: int = 0, **extra) -> dict:
+    """One scenario's entry in the report; extra latency series (e.g. first_token) are summarised too"""
+    count = len(samples)
+    result = {
+        "kind": kind,
+        "iterations": count,
+        "concurrency": concurrency,
+        "failed": failed,
+        "throughput_rps": round(count / wall_seconds, 2) if wall_seconds else 0.0,
+        "latency_ms": latency_summary(samples),
+        "db_requests_per_op": round(db_requests / count, 2) if count else 0.0,
+        "llm_requests_per_op": round(llm_requests / count, 2) if count else 0.0,
+    }
+    for name, series in extra.items():
+        if series:
+            result[f"{name}_ms"] = latency_summary(series)
+    return result
+
+
+def load_report(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_report(report: dict, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.2) -> tuple:
+    """
+    Per-scenario deltas against a baseline report. A scenario regresses when
+    its p50 grows by more than `threshold` (a fraction) or it makes more
+    database or LLM requests per operation. Returns (rows, regressions).
+    """
+    rows, regressions = [], []
+    for name, result in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        row = {"scenario": name, "current": result, "baseline": before, "changes": {}}
+        rows.append(row)
+        if not before:
+            continue
+
+        for key in ("p50", "p99"):
+            old, new = before["latency_ms"].get(key), result["latency_ms"].get(key)
+            if old:
+                row["changes"][key] = (new - old) / old
+                if key in GATED_PERCENTILES and row["changes"][key] > threshold:
+                    regressions.append(f"{name}: {key} {old:.1f}ms -> {new:.1f}ms")
+
+        for key in ("db_requests_per_op", "llm_requests_per_op"):
+            if result[key] > before[key]:
+                regressions.append(f"{name}: {key} {before[key]} -> {result[key]}")
+    return rows, regressions
+
+
+def _change(value) -> str:
+    return "" if value is None else f"{value * 100:+.0f}%"
+
+
+def format_table(report: dict, rows: list = None) -> str:
+    """Plain-text summary, with deltas against the baseline when `rows` come from compare()"""
+    changes = {row["scenario"]: row["changes"] for row in rows or []}
+    header = f"{'scenario':<34}{'p50 ms':>10}{'':>7}{'p99 ms':>10}{'':>7}{'req/s':>9}{'db/op':>7}{'llm/op':>7}{'failed':>8}"
+    lines = [header, "-" * len(header)]
+    for name, result in report["scenarios"].items():
+        latency = result["latency_ms"]
+        delta = changes.get(name, {})
+        lines.append(
+            f"{name:<34}{latency.get('p50', 0):>10.1f}{_change(delta.get('p50')):>7}"
+            f"{latency.get('p99', 0):>10.1f}{_change(delta.get('p99')):>7}"
+            f"{result['throughput_rps']:>9.1f}{result['db_requests_per_op']:>7.1f}"
+            f"{result['llm_requests_per_op']:>7.1f}{result['failed']:>8}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,285 @@
+"""
+Benchmark the scheduler against local stand-ins for Supabase and Azure OpenAI.
+
+    cd backend
+    python -m benchmarks.run --output baseline.json
+    # ...make a change...
+    python -m benchmarks.run --compare baseline.json --output current.json
+
+Every dispatcher intent runs in-process; /api/chat and /api/chat/stream run
+through uvicorn with concurrent clients. Reports carry p50/p90/p99 latency,
+throughput and database/LLM requests per operation; --compare exits non-zero
+when a scenario's p50 regresses past --threshold or it makes more requests.
+No credentials or network access are needed.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+import httpx
+from benchmarks.data import seed
+from benchmarks.fake_openai import FakeChatCompletions
+from benchmarks.fake_postgrest import FakePostgrest
+from benchmarks.report import compare, format_table, load_report, scenario_result, write_report
+from benchmarks.scenarios import CHAT_SCENARIOS, DISPATCH_SCENARIOS
+from benchmarks.servers import BackgroundServer
+
+APP_LOGGERS = ("clinical_scheduler", "agents", "database")
+
+# Settings that make two reports comparable
+CONFIG_KEYS = ("iterations", "warmup", "requests", "concurrency", "db_latency_ms",
+               "llm_first_token_ms", "llm_token_ms", "reply_tokens", "seed")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scenarios", help="comma-separated scenario names (default: all)")
+    parser.add_argument("--list", action="store_true", help="list scenarios and exit")
+    parser.add_argument("--iterations", type=int, default=50, help="measured calls per dispatcher scenario")
+    parser.add_argument("--warmup", type=int, default=5, help="unmeasured calls before each scenario")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per chat scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent clients for chat scenarios")
+    parser.add_argument("--db-latency-ms", type=float, default=2.0, help="delay added to every Supabase request")
+    parser.add_argument("--llm-first-token-ms", type=float, default=250.0, help="LLM time to first token")
+    parser.add_argument("--llm-token-ms", type=float, default=10.0, help="LLM delay between streamed tokens")
+    parser.add_argument("--reply-tokens", type=int, default=40, help="length of generated LLM replies")
+    parser.add_argument("--seed", type=int, default=7, help="seed for the generated clinic data")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="baseline JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed p50 growth before failing --compare")
+    parser.add_argument("--verbose", action="store_true", help="keep the app's INFO logging")
+    return parser.parse_args(argv)
+
+
+def configure_environment(db_url: str, llm_url: str, workdir: str):
+    """Point the app at the stand-ins; must run before anything under app/ is imported"""
+    os.environ.update({
+        "SUPABASE_URL": db_url,
+        "SUPABASE_KEY": "benchmark",
+        "AZURE_OPENAI_KEY": "benchmark",
+        "AZURE_OPENAI_ENDPOINT": llm_url,
+        "AZURE_OPENAI_DEPLOYMENT": "gpt-4o",
+        "EMAIL_TRANSPORT": "file",
+        "EMAIL_SINK_PATH": os.path.join(workdir, "sent_emails.jsonl"),
+        "OUTBOX_PATH": os.path.join(workdir, "outbox.db"),
+        "CONTEXT_BACKEND": "memory",
+    })
+
+
+def _reset_caches():
+    """Start every scenario cold, so its numbers don't depend on which scenarios ran before it"""
+    from app.utils.availability_index import availability_index
+    from app.utils.waitlist_index import waitlist_index
+    availability_index.clear()
+    waitlist_index.clear()
+
+
+def _selected(names: list, selection: str) -> list:
+    if not selection:
+        return names
+    wanted = [name.strip() for name in selection.split(",") if name.strip()]
+    return [name for name in names if name in wanted]
+
+
+async def run_dispatch_scenarios(names: list, pools: dict, args, db: FakePostgrest,
+                                 llm: FakeChatCompletions) -> dict:
+    from app.agents.dispatcher import execute
+    from app.utils.outbox import outbox
+
+    # The app's loggers set their level when first imported
+    if not args.verbose:
+        for name in APP_LOGGERS:
+            logging.getLogger(name).setLevel(logging.WARNING)
+
+    results = {}
+    for name in names:
+        scenario = DISPATCH_SCENARIOS[name]
+        # Staff actions have no intent and call the agent directly
+        call = scenario.get("call") or (lambda parameters, intent=scenario["intent"]: execute(intent, parameters))
+        _reset_caches()
+        for i in range(args.warmup):
+            await call(scenario["params"](i, pools))
+
+        samples, failed = [], 0
+        db_before, llm_before = db.request_total(), llm.request_total()
+        started = time.perf_counter()
+        for i in range(args.warmup, args.warmup + args.iterations):
+            parameters = scenario["params"](i, pools)
+            call_started = time.perf_counter()
+            result = await call(parameters)
+            samples.append(time.perf_counter() - call_started)
+            failed += result.get("success") is False
+        wall = time.perf_counter() - started
+        results[name] = scenario_result(
+            "dispatch", samples, wall, failed,
+            db_requests=db.request_total() - db_before, llm_requests=llm.request_total() - llm_before
+        )
+
+    # Side effects the cancellations queued (waitlist checks, emails), timed per job
+    samples, db_before, delivered_before = [], db.request_total(), outbox.metrics["delivered"]
+    started = time.perf_counter()
+    while True:
+        batch_started = time.perf_counter()
+        processed = await outbox.drain_once()
+        if not processed:
+            break
+        samples.extend([(time.perf_counter() - batch_started) / processed] * processed)
+    if samples:
+        results["outbox_drain"] = scenario_result(
+            "background", samples, time.perf_counter() - started,
+            len(samples) - (outbox.metrics["delivered"] - delivered_before),
+            db_requests=db.request_total() - db_before
+        )
+    return results
+
+
+async def _chat_request(client: httpx.AsyncClient, path: str, message: str, llm_response: bool) -> dict:
+    """One chat turn; the streaming endpoint also reports time to first event and first token"""
+    body = {"message": message, "llm_response": llm_response}
+    headers = {"X-Session-ID": str(uuid.uuid4())}
+    started = time.perf_counter()
+    timing = {"ok": True, "first_event": None, "first_token": None}
+
+    if not path.endswith("/stream"):
+        response = await client.post(path, json=body, headers=headers)
+        result = response.json().get("response") if response.status_code == 200 else None
+        timing["ok"] = isinstance(result, dict) and result.get("success") is not False
+        timing["total"] = time.perf_counter() - started
+        return timing
+
+    async with client.stream("POST", path, json=body, headers=headers) as response:
+        event = None
+        timing["ok"] = response.status_code == 200
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[7:]
+                elapsed = time.perf_counter() - started
+                timing["first_event"] = timing["first_event"] or elapsed
+                if event == "token":
+                    timing["first_token"] = timing["first_token"] or elapsed
+                elif event == "error":
+                    timing["ok"] = False
+            elif line.startswith("data: ") and event == "result":
+                timing["ok"] = timing["ok"] and json.loads(line[6:])["data"].get("success") is not False
+    timing["total"] = time.perf_counter() - started
+    return timing
+
+
+async def run_chat_scenarios(names: list, pools: dict, args, db: FakePostgrest,
+                             llm: FakeChatCompletions) -> dict:
+    from app.main import app
+
+    server = await BackgroundServer(app, lifespan="on").serve()
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+    try:
+        async with httpx.AsyncClient(base_url=server.url, timeout=60, limits=limits) as client:
+            for name in names:
+                scenario = CHAT_SCENARIOS[name]
+                _reset_caches()
+                llm_response = scenario.get("llm_response", False)
+
+                def turn(i):
+                    message, route = scenario["message"](i, pools)
+                    if route:
+                        llm.router_replies[message] = route
+                    return _chat_request(client, scenario["path"], message, llm_response)
+
+                await asyncio.gather(*(turn(i) for i in range(args.warmup)))
+
+                semaphore = asyncio.Semaphore(args.concurrency)
+
+                async def limited(i):
+                    async with semaphore:
+                        return await turn(i)
+
+                db_before, llm_before = db.request_total(), llm.request_total()
+                started = time.perf_counter()
+                timings = await asyncio.gather(*(limited(i) for i in range(args.warmup, args.warmup + args.requests)))
+                wall = time.perf_counter() - started
+                results[name] = scenario_result(
+                    "http", [t["total"] for t in timings], wall, sum(not t["ok"] for t in timings),
+                    concurrency=args.concurrency,
+                    db_requests=db.request_total() - db_before, llm_requests=llm.request_total() - llm_before,
+                    first_event=[t["first_event"] for t in timings if t["first_event"] is not None],
+                    first_token=[t["first_token"] for t in timings if t["first_token"] is not None]
+                )
+    finally:
+        await server.shutdown()
+    return results
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args, dispatch_names: list, chat_names: list, pools: dict, db, llm) -> dict:
+    scenarios = await run_dispatch_scenarios(dispatch_names, pools, args, db, llm)
+    if chat_names:
+        scenarios.update(await run_chat_scenarios(chat_names, pools, args, db, llm))
+    return scenarios
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    dispatch_names = _selected(list(DISPATCH_SCENARIOS), args.scenarios)
+    chat_names = _selected(list(CHAT_SCENARIOS), args.scenarios)
+    if args.list:
+        print("\n".join(list(DISPATCH_SCENARIOS) + list(CHAT_SCENARIOS)))
+        return 0
+
+    db = FakePostgrest(latency_ms=args.db_latency_ms)
+    llm = FakeChatCompletions(args.llm_first_token_ms, args.llm_token_ms, args.reply_tokens)
+    pools = seed(db, seed_value=args.seed)
+    db_server = BackgroundServer(db.create_app()).start()
+    llm_server = BackgroundServer(llm.create_app()).start()
+
+    try:
+        with tempfile.TemporaryDirectory(prefix="scheduler-bench-") as workdir:
+            configure_environment(db_server.url, llm_server.url, workdir)
+            scenarios = asyncio.run(run(args, dispatch_names, chat_names, pools, db, llm))
+    finally:
+        db_server.stop()
+        llm_server.stop()
+
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": {key: getattr(args, key) for key in CONFIG_KEYS},
+        },
+        "scenarios": scenarios,
+    }
+    if args.output:
+        write_report(report, args.output)
+
+    rows, regressions = None, []
+    if args.compare:
+        baseline = load_report(args.compare)
+        if baseline.get("meta", {}).get("config") != report["meta"]["config"]:
+            print("warning: baseline was recorded with different settings; deltas are not comparable")
+        rows, regressions = compare(baseline, report, args.threshold)
+
+    print(format_table(report, rows))
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""
+Benchmark scenarios. Dispatcher scenarios call app.agents.dispatcher.execute
+directly, one per intent, or their own `call` coroutine for staff actions;
+chat scenarios go through /api/chat and /api/chat/stream. Parameters come from the seeded pools (benchmarks/data.py):
+`_cycle` reuses read-only inputs, `.pop()` consumes rows a scenario changes
+so every iteration works on fresh data.
+"""
+
+
+def _cycle(pool: list, i: int):
+    return pool[i % len(pool)]
+
+
+def _doctor_day(i: int, pools: dict) -> tuple:
+    doctor, _ = _cycle(pools["doctors"], i)
+    return doctor, _cycle(pools["future_dates"], i // len(pools["doctors"]))
+
+
+def _book(i, pools):
+    doctor, date, time = pools["free_slots"].pop()
+    return {"patient_name": f"Bench Patient {i}", "doctor_name": doctor, "date": date,
+            "time": time, "appointment_type": "checkup"}
+
+
+def _book_series(i, pools):
+    doctor, date, time = pools["free_slots"].pop()
+    return {"patient_name": f"Bench Series {i}", "doctor_name": doctor, "start_date": date,
+            "time": time, "frequency": "weekly", "count": 4, "appointment_type": "follow_up"}
+
+
+def _reschedule(i, pools):
+    apt = pools["upcoming"].pop()
+    _, date, time = pools["free_slots"].pop()
+    return {"appointment_id": str(apt["id"]), "new_date": date, "new_time": time}
+
+
+def _add_to_waitlist(i, pools):
+    doctor, date = _doctor_day(i, pools)
+    return {"patient_name": f"Bench Waiting {i}", "doctor_name": doctor, "date": date,
+            "time": "10:00", "patient_email": f"waiting{i}@example.com"}
+
+
+def _accept_offer(i, pools):
+    entry = pools["offers"].pop()
+    return {"waitlist_id": str(entry["id"]), "patient_name": entry["patient_name"]}
+
+
+def _cancel_doctor_schedule(i, pools):
+    # Days from the end of the horizon, one doctor-day per iteration
+    doctor, _ = _cycle(pools["doctors"], i)
+    date = pools["future_dates"][-1 - (i // len(pools["doctors"])) % len(pools["future_dates"])]
+    return {"doctor_name": doctor, "date_from": date, "reason": "Benchmark absence"}
+
+
+async def _doctor_absence(parameters):
+    """The staff endpoint's preview-then-confirm round trip"""
+    from app.agents.cancellation_agent import cancel_doctor_schedule
+    preview = await cancel_doctor_schedule(**parameters)
+    if not preview.get("confirm_token"):
+        return preview
+    return await cancel_doctor_schedule(**parameters, confirm_token=preview["confirm_token"])
+
+
+DISPATCH_SCENARIOS = {
+    "check_availability": {
+        "intent": "check_availability",
+        "params": lambda i, pools: dict(zip(("doctor_name", "date"), _doctor_day(i, pools))),
+    },
+    "check_availability_batch": {
+        "intent": "check_availability_batch",
+        "params": lambda i, pools: {
+            "doctor_names": [name for name, _ in pools["doctors"][:4]],
+            "date": _cycle(pools["future_dates"], i), "date_to": _cycle(pools["future_dates"], i + 4),
+        },
+    },
+    "find_next_available": {
+        "intent": "find_next_available",
+        "params": lambda i, pools: {
+            "doctor_name": _doctor_day(i, pools)[0], "preferred_date": _doctor_day(i, pools)[1], "max_results": 3,
+        },
+    },
+    "suggest_alternatives": {
+        "intent": "suggest_alternatives",
+        "params": lambda i, pools: {
+            "specialty": _cycle(pools["doctors"], i)[1], "date": _cycle(pools["future_dates"], i), "time": "11:00",
+        },
+    },
+    "get_optimal_slots": {
+        "intent": "get_optimal_slots",
+        "params": lambda i, pools: {
+            "doctor_name": _doctor_day(i, pools)[0], "date": _doctor_day(i, pools)[1],
+            "appointment_type": "consultation", "buffer_minutes": 5,
+        },
+    },
+    "get_appointment_types": {"intent": "get_appointment_types", "params": lambda i, pools: {}},
+    "get_appointments": {
+        "intent": "get_appointments",
+        "params": lambda i, pools: {"patient_name": _cycle(pools["patients"], i)},
+    },
+    "get_appointments_doctor": {
+        "intent": "get_appointments",
+        "params": lambda i, pools: {"doctor_name": _cycle(pools["doctors"], i)[0], "page_size": 20},
+    },
+    "get_history": {
+        "intent": "get_history",
+        "params": lambda i, pools: {"patient_name": _cycle(pools["patients"], i)},
+    },
+    "get_waitlist_status": {
+        "intent": "get_waitlist_status",
+        "params": lambda i, pools: {"patient_name": _cycle(pools["waiting"], i)["patient_name"]},
+    },
+    "schedule_follow_up": {
+        "intent": "schedule_follow_up",
+        "params": lambda i, pools: {"appointment_id": str(_cycle(pools["upcoming"], i)["id"])},
+    },
+    "general_inquiry": {"intent": "general_inquiry", "params": lambda i, pools: {}},
+    "book_appointment": {"intent": "book_appointment", "params": _book},
+    "book_series": {"intent": "book_series", "params": _book_series},
+    "reschedule_appointment": {"intent": "reschedule_appointment", "params": _reschedule},
+    "add_to_waitlist": {"intent": "add_to_waitlist", "params": _add_to_waitlist},
+    "remove_from_waitlist": {
+        "intent": "remove_from_waitlist",
+        "params": lambda i, pools: {"waitlist_id": str(pools["waiting"].pop()["id"])},
+    },
+    "accept_waitlist_offer": {
+        "intent": "accept_waitlist_offer",
+        "params": _accept_offer,
+    },
+    "cancel_appointment": {
+        "intent": "cancel_appointment",
+        "params": lambda i, pools: {"appointment_id": str(pools["upcoming"].pop()["id"]), "reason": "Benchmark"},
+    },
+    "confirm_cancellation": {
+        "intent": "confirm_cancellation",
+        "params": lambda i, pools: {"appointment_id": str(pools["upcoming"].pop()["id"])},
+    },
+    # Last: it cancels whole doctor-days other scenarios draw from
+    "cancel_doctor_schedule": {"call": _doctor_absence, "params": _cancel_doctor_schedule},
+}
+
+
+def _availability_message(i, pools):
+    doctor, date = _doctor_day(i, pools)
+    return f"Is {doctor} available on {date}?", None
+
+
+def _alternatives_message(i, pools):
+    # "or" keeps the rule parser out of it, so this takes the LLM router path
+    _, specialty = _cycle(pools["doctors"], i)
+    date = _cycle(pools["future_dates"], i)
+    message = f"Could someone in {specialty} see me on {date}, or later that week?"
+    return message, {
+        "intent": "suggest_alternatives",
+        "parameters": {"specialty": specialty, "date": date},
+        "needs_clarification": False,
+        "clarification_question": None,
+        "extracted_entities": {"date": date},
+        "confidence": 0.9,
+    }
+
+
+CHAT_SCENARIOS = {
+    "chat_local_route": {"path": "/api/chat", "message": _availability_message},
+    "chat_llm_route": {"path": "/api/chat", "message": _alternatives_message},
+    "chat_stream_local_route": {"path": "/api/chat/stream", "message": _availability_message},
+    "chat_stream_llm_route": {"path": "/api/chat/stream", "message": _alternatives_message},
+    "chat_stream_llm_response": {"path": "/api/chat/stream", "message": _availability_message, "llm_response": True},
+}
@@ -0,0 +1,74 @@
+-- Atomic single round trip booking.
+--
+-- book_appointment_atomic checks for overlapping appointments and inserts the
+-- new one inside a single transaction. Bookings for the same doctor-day are
+-- serialised with a transaction-scoped advisory lock, so two concurrent
+-- requests can no longer both pass the conflict check and double-book a slot.
+--
+-- Returns jsonb:
+--   {"status": "booked",   "appointment": {...inserted row...}}
+--   {"status": "conflict", "conflicts": [...], "booked": [...all intervals of the day...]}
+--
+-- Call through PostgREST: POST /rest/v1/rpc/book_appointment_atomic
+
+create or replace function book_appointment_atomic(
+    p_patient_name text,
+    p_doctor_name text,
+    p_appointment_date text,
+    p_appointment_time text,
+    p_end_time text,
+    p_appointment_type text,
+    p_duration_minutes integer,
+    p_patient_email text default null,
+    p_patient_phone text default null,
+    p_notes text default null
+) returns jsonb
+language plpgsql
+as $$
+declare
+    v_conflicts jsonb;
+    v_booked jsonb;
+    v_row appointments;
+begin
+    perform pg_advisory_xact_lock(hashtext(p_doctor_name || '|' || p_appointment_date));
+
+    select coalesce(jsonb_agg(jsonb_build_object(
+               'id', id,
+               'appointment_time', appointment_time,
+               'end_time', end_time,
+               'overlaps', appointment_time::time < p_end_time::time
+                           and coalesce(end_time, appointment_time)::time > p_appointment_time::time
+           ) order by appointment_time), '[]'::jsonb)
+      into v_booked
+      from appointments
+     where doctor_name = p_doctor_name
+       and appointment_date::date = p_appointment_date::date
+       and status <> 'cancelled';
+
+    select coalesce(jsonb_agg(b - 'overlaps'), '[]'::jsonb)
+      into v_conflicts
+      from jsonb_array_elements(v_booked) b
+     where (b ->> 'overlaps')::boolean;
+
+    if jsonb_array_length(v_conflicts) > 0 then
+        return jsonb_build_object(
+            'status', 'conflict',
+            'conflicts', v_conflicts,
+            'booked', v_booked
+        );
+    end if;
+
+    insert into appointments (
+        patient_name, doctor_name, appointment_date, appointment_time, end_time,
+        appointment_type, duration_minutes, patient_email, patient_phone, notes,
+        status, created_at
+    ) values (
+        p_patient_name, p_doctor_name, p_appointment_date, p_appointment_time, p_end_time,
+        p_appointment_type, p_duration_minutes, p_patient_email, p_patient_phone, p_notes,
+        'confirmed', now()
+    )
+    returning * into v_row;
+
+    return jsonb_build_object('status', 'booked', 'appointment', to_jsonb(v_row));
+end;
+$$;
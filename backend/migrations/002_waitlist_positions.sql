@@ -0,0 +1,45 @@
+-- Waitlist positions computed in the database.
+--
+-- waitlist_positions exposes every waiting entry with its true rank in the
+-- queue for its doctor and date (earliest created_at first) and the queue
+-- length, so a patient's status is served by a single query. Removing or
+-- fulfilling an entry shifts everyone behind it automatically.
+--
+-- Ranks are correlated counts rather than a window function: a window over
+-- the view would number every waiting row in the table before the caller's
+-- filter applied, whereas each count here is an index range scan over just
+-- the selected entry's queue. security_invoker makes the view run with the
+-- caller's privileges, so row level security on waitlist still applies.
+
+drop index if exists waitlist_queue_idx;
+
+create index if not exists waitlist_queue_idx
+    on waitlist (doctor_name, preferred_date, status, created_at, id);
+
+create index if not exists waitlist_patient_idx
+    on waitlist (patient_name)
+    where status = 'waiting';
+
+drop view if exists waitlist_positions;
+
+create view waitlist_positions
+with (security_invoker = true) as
+select
+    w.*,
+    (
+        select count(*)
+        from waitlist ahead
+        where ahead.doctor_name = w.doctor_name
+          and ahead.preferred_date = w.preferred_date
+          and ahead.status = 'waiting'
+          and (ahead.created_at, ahead.id) <= (w.created_at, w.id)
+    ) as position,
+    (
+        select count(*)
+        from waitlist queued
+        where queued.doctor_name = w.doctor_name
+          and queued.preferred_date = w.preferred_date
+          and queued.status = 'waiting'
+    ) as queue_length
+from waitlist w
+where w.status = 'waiting';
@@ -0,0 +1,14 @@
+-- Auto-offer of freed slots to the top waitlist candidate.
+--
+-- When a slot is offered, a 'held' appointment reserves it for the patient and
+-- the waitlist entry moves to status 'offered' until offer_expires_at. Accepted
+-- offers become 'fulfilled'; offers that run out become 'expired', the hold is
+-- cancelled and the slot goes to the next candidate.
+
+alter table waitlist add column if not exists offer_expires_at timestamptz;
+-- text so it works whether appointments.id is a bigint or a uuid
+alter table waitlist add column if not exists held_appointment_id text;
+
+create index if not exists waitlist_offer_expiry_idx
+    on waitlist (offer_expires_at)
+    where status = 'offered';
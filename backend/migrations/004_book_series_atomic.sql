@@ -0,0 +1,92 @@
+-- Bulk booking for recurring series.
+--
+-- book_series_atomic inserts every occurrence that is still free with one
+-- INSERT ... SELECT and reports the ones that are not. Every affected
+-- doctor-day is locked first (same advisory lock key as
+-- book_appointment_atomic, taken in a fixed order), so a series can't
+-- double-book against a concurrent single booking or another series.
+--
+-- p_rows is a JSON array of appointment objects with patient_name,
+-- doctor_name, appointment_date, appointment_time, end_time,
+-- appointment_type, duration_minutes, patient_email, patient_phone, notes.
+--
+-- Returns jsonb:
+--   {"booked": [...inserted rows...],
+--    "conflicts": [{"appointment_date", "appointment_time", "booked": [...intervals of that day...]}]}
+--
+-- Call through PostgREST: POST /rest/v1/rpc/book_series_atomic
+
+create or replace function book_series_atomic(p_rows jsonb) returns jsonb
+language plpgsql
+as $$
+declare
+    v_key text;
+    v_result jsonb;
+begin
+    for v_key in
+        select distinct r ->> 'doctor_name' || '|' || (r ->> 'appointment_date')
+          from jsonb_array_elements(p_rows) r
+         order by 1
+    loop
+        perform pg_advisory_xact_lock(hashtext(v_key));
+    end loop;
+
+    with candidate as (
+        select *
+          from jsonb_to_recordset(p_rows) as r(
+              patient_name text, doctor_name text, appointment_date text,
+              appointment_time text, end_time text, appointment_type text,
+              duration_minutes integer, patient_email text, patient_phone text, notes text
+          )
+    ),
+    checked as (
+        select c.*,
+               exists (
+                   select 1
+                     from appointments a
+                    where a.doctor_name = c.doctor_name
+                      and a.appointment_date::date = c.appointment_date::date
+                      and a.status <> 'cancelled'
+                      and a.appointment_time::time < c.end_time::time
+                      and coalesce(a.end_time, a.appointment_time)::time > c.appointment_time::time
+               ) as clashes
+          from candidate c
+    ),
+    inserted as (
+        insert into appointments (
+            patient_name, doctor_name, appointment_date, appointment_time, end_time,
+            appointment_type, duration_minutes, patient_email, patient_phone, notes,
+            status, created_at
+        )
+        select patient_name, doctor_name, appointment_date, appointment_time, end_time,
+               appointment_type, duration_minutes, patient_email, patient_phone, notes,
+               'confirmed', now()
+          from checked
+         where not clashes
+        returning *
+    )
+    select jsonb_build_object(
+        'booked', coalesce((select jsonb_agg(to_jsonb(i)) from inserted i), '[]'::jsonb),
+        'conflicts', coalesce((
+            select jsonb_agg(jsonb_build_object(
+                'appointment_date', c.appointment_date,
+                'appointment_time', c.appointment_time,
+                'booked', coalesce((
+                    select jsonb_agg(jsonb_build_object(
+                        'appointment_time', a.appointment_time,
+                        'end_time', a.end_time
+                    ) order by a.appointment_time)
+                      from appointments a
+                     where a.doctor_name = c.doctor_name
+                       and a.appointment_date::date = c.appointment_date::date
+                       and a.status <> 'cancelled'
+                ), '[]'::jsonb)
+            ))
+              from checked c
+             where c.clashes
+        ), '[]'::jsonb)
+    ) into v_result;
+
+    return v_result;
+end;
+$$;
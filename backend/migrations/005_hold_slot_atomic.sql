@@ -0,0 +1,92 @@
+-- Atomic waitlist holds.
+--
+-- hold_slot_atomic reserves a freed slot for one waitlist entry inside a
+-- single transaction: it takes the same doctor-day advisory lock as
+-- book_appointment_atomic, checks the slot is still free and the entry is
+-- still waiting, inserts the 'held' appointment and moves the entry to
+-- 'offered'. A booking or another worker's offer that lands first makes the
+-- hold fail cleanly instead of double-booking the slot.
+--
+-- Returns jsonb:
+--   {"status": "held",        "appointment": {...inserted row...}}
+--   {"status": "conflict",    "booked": [...intervals of the day...]}
+--   {"status": "unavailable"}  (the entry is no longer waiting)
+--
+-- Call through PostgREST: POST /rest/v1/rpc/hold_slot_atomic
+
+create or replace function hold_slot_atomic(
+    p_waitlist_id text,
+    p_patient_name text,
+    p_doctor_name text,
+    p_appointment_date text,
+    p_appointment_time text,
+    p_end_time text,
+    p_appointment_type text,
+    p_duration_minutes integer,
+    p_offer_expires_at timestamptz,
+    p_patient_email text default null,
+    p_notes text default null
+) returns jsonb
+language plpgsql
+as $$
+declare
+    v_booked jsonb;
+    v_entry waitlist;
+    v_row appointments;
+begin
+    perform pg_advisory_xact_lock(hashtext(p_doctor_name || '|' || p_appointment_date));
+
+    select *
+      into v_entry
+      from waitlist
+     where doctor_name = p_doctor_name
+       and preferred_date::date = p_appointment_date::date
+       and status = 'waiting'
+       and id::text = p_waitlist_id
+       for update;
+
+    if not found then
+        return jsonb_build_object('status', 'unavailable');
+    end if;
+
+    if exists (
+        select 1
+          from appointments
+         where doctor_name = p_doctor_name
+           and appointment_date::date = p_appointment_date::date
+           and status <> 'cancelled'
+           and appointment_time::time < p_end_time::time
+           and coalesce(end_time, appointment_time)::time > p_appointment_time::time
+    ) then
+        select coalesce(jsonb_agg(jsonb_build_object(
+                   'appointment_time', appointment_time,
+                   'end_time', end_time
+               ) order by appointment_time), '[]'::jsonb)
+          into v_booked
+          from appointments
+         where doctor_name = p_doctor_name
+           and appointment_date::date = p_appointment_date::date
+           and status <> 'cancelled';
+
+        return jsonb_build_object('status', 'conflict', 'booked', v_booked);
+    end if;
+
+    insert into appointments (
+        patient_name, doctor_name, appointment_date, appointment_time, end_time,
+        appointment_type, duration_minutes, patient_email, notes, status, created_at
+    ) values (
+        p_patient_name, p_doctor_name, p_appointment_date, p_appointment_time, p_end_time,
+        p_appointment_type, p_duration_minutes, p_patient_email, p_notes, 'held', now()
+    )
+    returning * into v_row;
+
+    update waitlist
+       set status = 'offered',
+           offer_expires_at = p_offer_expires_at,
+           held_appointment_id = v_row.id::text,
+           notified_at = now()
+     where id = v_entry.id;
+
+    return jsonb_build_object('status', 'held', 'appointment', to_jsonb(v_row));
+end;
+$$;
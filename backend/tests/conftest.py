@@ -0,0 +1,59 @@
+import asyncio
+import os
+import tempfile
+
+# Settings app/ reads at import time. Nothing here talks to a real service:
+# the Supabase client is pointed at an in-memory PostgREST per test (db fixture).
+_workdir = tempfile.mkdtemp(prefix="scheduler-tests-")
+os.environ.update({
+    "SUPABASE_URL": "http://supabase.test",
+    "SUPABASE_KEY": "test",
+    "AZURE_OPENAI_KEY": "test",
+    "AZURE_OPENAI_ENDPOINT": "http://openai.test",
+    "AZURE_OPENAI_DEPLOYMENT": "gpt-4o",
+    "EMAIL_TRANSPORT": "file",
+    "EMAIL_SINK_PATH": os.path.join(_workdir, "sent_emails.jsonl"),
+    "OUTBOX_PATH": os.path.join(_workdir, "outbox.db"),
+    "CONTEXT_BACKEND": "memory",
+})
+
+import httpx
+import pytest
+from benchmarks.fake_openai import FakeChatCompletions
+from benchmarks.fake_postgrest import FakePostgrest
+
+
+def run(coroutine):
+    """Run a coroutine to completion on a fresh event loop"""
+    return asyncio.run(coroutine)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """A fresh in-memory PostgREST behind the app's Supabase client, with cold caches"""
+    from app.agents.intent_parser import _doctor_cache
+    from app.database import supabase
+    from app.utils.availability_index import availability_index
+    from app.utils.waitlist_index import waitlist_index
+
+    fake = FakePostgrest()
+    monkeypatch.setattr(supabase, "session", httpx.AsyncClient(transport=httpx.ASGITransport(app=fake.create_app())))
+    availability_index.clear()
+    waitlist_index.clear()
+    _doctor_cache.clear()
+    return fake
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    """An in-memory chat-completions endpoint behind the orchestrator's OpenAI client"""
+    from openai import AsyncAzureOpenAI
+    import app.agents.orchestrator as orchestrator
+
+    fake = FakeChatCompletions()
+    client = AsyncAzureOpenAI(
+        api_key="test", azure_endpoint="http://openai.test", api_version="2024-08-01-preview",
+        http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=fake.create_app()))
+    )
+    monkeypatch.setattr(orchestrator, "async_client", client)
+    return fake
@@ -0,0 +1,123 @@
+import asyncio
+import random
+from app.utils.availability_index import (
+    DAY_END_MINUTES, DAY_START_MINUTES, SLOT_MINUTES, SLOTS_PER_DAY, AvailabilityIndex,
+    fit_mask, fits, free_starts, interval_mask, to_hhmm, to_minutes, utilization
+)
+from tests.conftest import run
+
+
+def test_time_conversions_round_trip():
+    assert to_minutes("09:30") == 570
+    assert to_minutes("14:05:00") == 845
+    assert to_hhmm(570) == "09:30"
+
+
+def test_interval_mask_covers_partial_slots_and_clips_to_day():
+    assert interval_mask(DAY_START_MINUTES, DAY_START_MINUTES + 5) == 0b1
+    # 09:02-09:07 touches the first two slots
+    assert interval_mask(DAY_START_MINUTES + 2, DAY_START_MINUTES + 7) == 0b11
+    assert interval_mask(8 * 60, DAY_START_MINUTES + 10) == 0b11
+    assert interval_mask(DAY_END_MINUTES, DAY_END_MINUTES + 60) == 0
+    assert interval_mask(600, 600) == 0
+
+
+def test_fits_respects_bookings_and_day_bounds():
+    mask = interval_mask(600, 630)  # 10:00-10:30 booked
+    assert fits(mask, 540, 60)
+    assert not fits(mask, 570, 45)
+    assert fits(mask, 630, 30)
+    assert not fits(mask, 8 * 60 + 30, 30)
+    assert not fits(mask, DAY_END_MINUTES - 15, 30)
+
+
+def _brute_force_starts(mask: int, duration: int) -> int:
+    result = 0
+    for slot in range(SLOTS_PER_DAY):
+        if fits(mask, DAY_START_MINUTES + slot * SLOT_MINUTES, duration):
+            result |= 1 << slot
+    return result
+
+
+def test_fit_mask_matches_brute_force():
+    rng = random.Random(3)
+    for _ in range(200):
+        mask = 0
+        for _ in range(rng.randint(0, 6)):
+            start = rng.randrange(DAY_START_MINUTES, DAY_END_MINUTES, 5)
+            mask |= interval_mask(start, start + rng.choice((5, 15, 30, 45, 60)))
+        duration = rng.choice((5, 15, 20, 30, 45, 60, 90))
+        assert fit_mask(mask, duration) == _brute_force_starts(mask, duration)
+
+
+def test_free_starts_on_grid():
+    mask = interval_mask(DAY_START_MINUTES, DAY_END_MINUTES - 60)
+    assert free_starts(mask, 30, 30) == ["16:00", "16:30"]
+    assert free_starts(0, 480, 30) == ["09:00"]
+    assert free_starts(0, 485) == []
+
+
+def test_utilization():
+    assert utilization(0) == 0
+    assert utilization(interval_mask(DAY_START_MINUTES, DAY_END_MINUTES)) == 1
+    assert utilization(interval_mask(DAY_START_MINUTES, DAY_START_MINUTES + 240)) == 0.5
+
+
+def _appointment(doctor: str, date: str, time: str, end_time: str) -> dict:
+    return {"patient_name": "Pat", "doctor_name": doctor, "appointment_date": date,
+            "appointment_time": time, "end_time": end_time}
+
+
+def test_load_returns_every_requested_day(db):
+    db.insert_rows("appointments", [_appointment("Dr. A", "2026-03-03", "10:00", "10:30")])
+    index = AvailabilityIndex()
+
+    days = run(index.load(["Dr. A", "Dr. B"], "2026-03-02", "2026-03-04"))
+
+    assert len(days) == 6
+    assert days[("Dr. A", "2026-03-03")]["mask"] == interval_mask(600, 630)
+    assert days[("Dr. A", "2026-03-03")]["booked_count"] == 1
+    assert days[("Dr. B", "2026-03-03")]["mask"] == 0
+
+
+def test_load_reads_correct_days_when_range_exceeds_cache(db):
+    # Regression: readers went back to the cache after load(), and an evicted
+    # day read as empty, i.e. fully free
+    db.insert_rows("appointments", [
+        _appointment("Dr. A", date, "09:00", "17:00")
+        for date in ("2026-03-02", "2026-03-03", "2026-03-04", "2026-03-05")
+    ])
+    index = AvailabilityIndex(max_entries=2)
+
+    days = run(index.load(["Dr. A"], "2026-03-02", "2026-03-05"))
+
+    assert all(utilization(day["mask"]) == 1 for day in days.values())
+
+
+def test_load_does_not_cache_a_day_written_during_the_fetch(db):
+    # Regression: a booking that invalidated the day while the query was in
+    # flight was overwritten by the pre-booking rows
+    db.latency_ms = 50
+    index = AvailabilityIndex()
+
+    async def scenario():
+        load = asyncio.create_task(index.load(["Dr. A"], "2026-03-02", "2026-03-03"))
+        await asyncio.sleep(0.01)
+        db.insert_rows("appointments", [_appointment("Dr. A", "2026-03-02", "10:00", "10:30")])
+        index.invalidate("Dr. A", "2026-03-02")
+        await load
+        return await index.load_day("Dr. A", "2026-03-02")
+
+    day = run(scenario())
+
+    assert day["mask"] == interval_mask(600, 630)
+    assert index.stats()["entries"] == 2
+
+
+def test_store_day_returns_the_cached_day(db):
+    index = AvailabilityIndex()
+    day = index.store_day("Dr. A", "2026-03-02", [{"appointment_time": "11:00", "end_time": "11:15"}])
+
+    assert day["intervals"] == [(660, 675)]
+    assert run(index.load_day("Dr. A", "2026-03-02")) is day
+    assert db.request_total() == 0
@@ -0,0 +1,36 @@
+from app.agents.booking_agent import book_series, expand_recurrence
+from app.agents.response_renderer import render_response
+from tests.conftest import run
+
+
+def test_expand_recurrence_weekly_count():
+    assert expand_recurrence("2026-03-02", "weekly", count=3) == ["2026-03-02", "2026-03-09", "2026-03-16"]
+
+
+def test_expand_recurrence_daily_until():
+    assert expand_recurrence("2026-03-02", "daily", interval=2, until="2026-03-07") == [
+        "2026-03-02", "2026-03-04", "2026-03-06"
+    ]
+
+
+def test_series_skips_weekend_occurrences(db):
+    # Regression: a daily series sent Saturday and Sunday to book_series_atomic
+    # 2026-03-05 is a Thursday
+    result = run(book_series("Pat", "Dr. A", "2026-03-05", "10:00", frequency="daily", count=5))
+
+    assert result["success"]
+    assert [apt["date"] for apt in result["booked"]] == ["2026-03-05", "2026-03-06", "2026-03-09"]
+    assert result["skipped_weekends"] == ["2026-03-07", "2026-03-08"]
+    assert sorted(row["appointment_date"] for row in db.tables["appointments"]) == [
+        "2026-03-05", "2026-03-06", "2026-03-09"
+    ]
+    assert "Skipped weekend dates" in render_response("book_series", result, "en")
+
+
+def test_series_entirely_on_weekends_books_nothing(db):
+    # 2026-03-07 is a Saturday
+    result = run(book_series("Pat", "Dr. A", "2026-03-07", "10:00", frequency="weekly", count=3))
+
+    assert result["success"] is False
+    assert result["skipped_weekends"] == ["2026-03-07", "2026-03-14", "2026-03-21"]
+    assert not db.tables.get("appointments")
@@ -0,0 +1,80 @@
+import app.utils.cache as cache_module
+from app.utils.cache import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _cache(monkeypatch, **kwargs) -> tuple:
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, "monotonic", clock)
+    return TTLCache(**kwargs), clock
+
+
+def test_entries_expire_after_their_ttl(monkeypatch):
+    cache, clock = _cache(monkeypatch, ttl_seconds=60)
+    cache.set("day", {"booked": 1})
+
+    clock.now += 59.9
+    assert cache.get("day") == {"booked": 1}
+    clock.now += 0.1
+    assert "day" not in cache
+    assert cache.get("day") is None
+    assert len(cache) == 0
+    assert cache.stats()["expirations"] == 1
+
+
+def test_least_recently_used_entry_is_evicted(monkeypatch):
+    cache, _ = _cache(monkeypatch, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert "b" not in cache
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_peek_leaves_counters_and_order_alone(monkeypatch):
+    cache, _ = _cache(monkeypatch, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    assert cache.peek("a") == 1
+    cache.set("c", 3)
+
+    assert "a" not in cache
+    assert cache.stats()["hits"] == cache.stats()["misses"] == 0
+
+
+def test_resetting_a_key_renews_its_ttl(monkeypatch):
+    cache, clock = _cache(monkeypatch, ttl_seconds=10)
+    cache.set("a", 1)
+    clock.now += 8
+    cache.set("a", 2)
+    clock.now += 8
+
+    assert cache.get("a") == 2
+
+
+def test_invalidate_and_stats(monkeypatch):
+    cache, _ = _cache(monkeypatch)
+    cache.set("a", 1)
+
+    assert cache.invalidate("a") is True
+    assert cache.invalidate("a") is False
+    cache.get("a")
+    cache.set("b", 2)
+    cache.get("b")
+
+    stats = cache.stats()
+    assert stats["invalidations"] == 1
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+    cache.clear()
+    assert len(cache) == 0
@@ -0,0 +1,108 @@
+import httpx
+from app.agents.cancellation_agent import MAX_ABSENCE_DAYS, cancel_doctor_schedule
+from app.agents.dispatcher import execute
+from app.main import app
+from tests.conftest import run
+
+
+def _seed(db):
+    db.insert_rows("doctors", [
+        {"name": "Dr. A", "specialty": "Cardiology", "active": True},
+        {"name": "Dr. B", "specialty": "Cardiology", "active": True},
+    ])
+    db.insert_rows("appointments", [
+        {"id": 1, "patient_name": "Pat", "patient_email": "pat@example.com", "doctor_name": "Dr. A",
+         "appointment_date": "2026-03-02", "appointment_time": "10:00", "end_time": "10:30", "status": "confirmed"},
+        {"id": 2, "patient_name": "Sam", "patient_email": "sam@example.com", "doctor_name": "Dr. A",
+         "appointment_date": "2026-03-03", "appointment_time": "11:00", "end_time": "11:30", "status": "held"},
+    ])
+    db.insert_rows("waitlist", [{
+        "id": 9, "patient_name": "Sam", "doctor_name": "Dr. A", "preferred_date": "2026-03-03",
+        "preferred_time": "11:00", "status": "offered", "offer_expires_at": "2026-03-01T12:00:00",
+        "held_appointment_id": "2", "notified_at": "2026-03-01T11:30:00"
+    }])
+
+
+def _statuses(db) -> dict:
+    return {row["id"]: row["status"] for row in db.tables["appointments"]}
+
+
+def test_absence_needs_a_confirmed_preview(db):
+    _seed(db)
+
+    preview = run(cancel_doctor_schedule("Dr. A", "2026-03-02", "2026-03-03"))
+
+    assert preview["requires_confirmation"] and preview["to_cancel"] == 2
+    assert _statuses(db) == {1: "confirmed", 2: "held"}
+
+    result = run(cancel_doctor_schedule("Dr. A", "2026-03-02", "2026-03-03", confirm_token=preview["confirm_token"]))
+
+    assert result["cancelled_count"] == 1
+    assert _statuses(db) == {1: "cancelled", 2: "cancelled"}
+
+
+def test_stale_token_previews_again(db):
+    _seed(db)
+    preview = run(cancel_doctor_schedule("Dr. A", "2026-03-02", "2026-03-03"))
+    db.insert_rows("appointments", [{
+        "id": 3, "patient_name": "New", "doctor_name": "Dr. A", "appointment_date": "2026-03-02",
+        "appointment_time": "14:00", "end_time": "14:30", "status": "confirmed"
+    }])
+
+    result = run(cancel_doctor_schedule("Dr. A", "2026-03-02", "2026-03-03", confirm_token=preview["confirm_token"]))
+
+    assert result["requires_confirmation"] and result["to_cancel"] == 3
+    assert result["confirm_token"] != preview["confirm_token"]
+    assert set(_statuses(db).values()) == {"confirmed", "held"}
+
+
+def test_absence_range_is_capped(db):
+    result = run(cancel_doctor_schedule("Dr. A", "2026-03-01", "2026-06-01"))
+
+    assert result["success"] is False
+    assert str(MAX_ABSENCE_DAYS) in result["error"]
+    assert not db.request_total()
+
+
+def test_cancelled_holds_send_their_waitlist_entry_back_to_waiting(db):
+    # Regression: the entry stayed 'offered' for an appointment that no longer existed
+    _seed(db)
+    preview = run(cancel_doctor_schedule("Dr. A", "2026-03-02", "2026-03-03"))
+
+    result = run(cancel_doctor_schedule("Dr. A", "2026-03-02", "2026-03-03", confirm_token=preview["confirm_token"]))
+
+    entry = db.tables["waitlist"][0]
+    assert result["offers_withdrawn"] == 1
+    assert entry["status"] == "waiting"
+    assert entry["held_appointment_id"] is None and entry["offer_expires_at"] is None
+    # Only the confirmed patient is told about the cancellation
+    assert [item["patient"] for item in result["affected"]] == ["Pat"]
+
+
+def test_absence_is_not_a_chat_intent(db):
+    _seed(db)
+
+    result = run(execute("cancel_doctor_schedule", {"doctor_name": "Dr. A", "date_from": "2026-03-02"}))
+
+    assert result["success"] is False
+    assert _statuses(db) == {1: "confirmed", 2: "held"}
+
+
+def _post(body: dict, headers: dict = None) -> httpx.Response:
+    async def request():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://app.test") as client:
+            return await client.post("/api/staff/doctor-absence", json=body, headers=headers or {})
+    return run(request())
+
+
+def test_staff_endpoint_requires_the_staff_token(db, monkeypatch):
+    _seed(db)
+    body = {"doctor_name": "Dr. A", "date_from": "2026-03-02"}
+
+    assert _post(body).status_code == 403
+    monkeypatch.setenv("STAFF_API_TOKEN", "secret")
+    assert _post(body, {"X-Staff-Token": "wrong"}).status_code == 403
+
+    response = _post(body, {"X-Staff-Token": "secret"})
+    assert response.status_code == 200
+    assert response.json()["requires_confirmation"]
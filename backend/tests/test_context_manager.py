@@ -0,0 +1,73 @@
+import os
+import pytest
+from app.agents.context_manager import (
+    ContextBackend, ContextStore, ConversationContext, SQLiteContextStore
+)
+from tests.conftest import run
+
+
+def test_backend_interface_is_abstract():
+    class Incomplete(ContextBackend):
+        async def get_or_create(self, session_id):
+            return ConversationContext(session_id)
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_context_round_trips_through_bytes():
+    context = ConversationContext("s1")
+    context.update_entity("doctor_name", "Dr. A")
+    context.add_turn("hi", "general_inquiry", {}, {"success": True, "message": "Hello"})
+
+    restored = ConversationContext.from_bytes(context.to_bytes())
+
+    assert restored.get_entity("doctor_name") == "Dr. A"
+    assert restored.history[0]["response_summary"] == "Hello"
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = ContextStore(max_sessions=2)
+
+    async def scenario():
+        await store.get_or_create("a")
+        await store.get_or_create("b")
+        await store.get_or_create("a")
+        await store.get_or_create("c")
+
+    run(scenario())
+
+    assert list(store._contexts) == ["a", "c"]
+    assert store.stats()["evicted_sessions_cap"] == 1
+
+
+def test_sqlite_store_shares_sessions_between_instances(tmp_path):
+    path = os.path.join(tmp_path, "contexts.db")
+    writer, reader = SQLiteContextStore(path), SQLiteContextStore(path)
+
+    async def scenario():
+        context = await writer.get_or_create("s1")
+        context.update_entity("patient_name", "Pat Doe")
+        await writer.save(context)
+        loaded = await reader.get_or_create("s1")
+        await reader.clear_session("s1")
+        cleared = await writer.get_or_create("s1")
+        return loaded, cleared
+
+    loaded, cleared = run(scenario())
+
+    assert loaded.get_entity("patient_name") == "Pat Doe"
+    assert cleared.get_entity("patient_name") is None
+    assert writer.stats()["saved"] == 1
+
+
+def test_sqlite_store_ignores_expired_sessions(tmp_path):
+    store = SQLiteContextStore(os.path.join(tmp_path, "contexts.db"), timeout_minutes=0)
+
+    async def scenario():
+        context = await store.get_or_create("s1")
+        context.update_entity("patient_name", "Pat Doe")
+        await store.save(context)
+        return await store.get_or_create("s1")
+
+    assert run(scenario()).get_entity("patient_name") is None
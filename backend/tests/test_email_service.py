@@ -0,0 +1,55 @@
+import json
+import httpx
+from app.utils.email_service import FileSinkTransport, SendGridTransport, apply_substitutions
+from tests.conftest import run
+
+
+def _message(to_email: str, name: str) -> dict:
+    return {"to_email": to_email, "subject": "Hi -name-", "content": "Hello -name-",
+            "substitutions": {"-name-": name}}
+
+
+def _sendgrid(requests: list) -> SendGridTransport:
+    """SendGrid transport whose API rejects any request with an address lacking an @"""
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        emails = [p["to"][0]["email"] for p in body["personalizations"]]
+        requests.append(emails)
+        if any("@" not in email for email in emails):
+            return httpx.Response(400, json={"errors": [{"message": "Invalid email"}]})
+        return httpx.Response(202)
+
+    transport = SendGridTransport("key", "clinic@example.com")
+    transport._client = httpx.AsyncClient(base_url="https://api.sendgrid.com", transport=httpx.MockTransport(handler))
+    return transport
+
+
+def test_apply_substitutions():
+    assert apply_substitutions("Hello -name-", {"-name-": "Pat"}) == "Hello Pat"
+    assert apply_substitutions("Hello", None) == "Hello"
+
+
+def test_sendgrid_sends_one_request_per_template():
+    requests = []
+    messages = [_message("a@example.com", "A"), _message("b@example.com", "B")]
+
+    assert run(_sendgrid(requests).send_batch(messages)) == [True, True]
+    assert requests == [["a@example.com", "b@example.com"]]
+
+
+def test_sendgrid_falls_back_to_single_sends_when_a_batch_is_rejected():
+    # Regression: one bad address failed every message in the request
+    requests = []
+    messages = [_message("a@example.com", "A"), _message("not-an-address", "B"), _message("c@example.com", "C")]
+
+    assert run(_sendgrid(requests).send_batch(messages)) == [True, False, True]
+    assert len(requests) == 4
+
+
+def test_file_sink_renders_substitutions(tmp_path):
+    path = tmp_path / "sent.jsonl"
+    run(FileSinkTransport(str(path), "clinic@example.com").send_batch([_message("a@example.com", "Pat")]))
+
+    sent = json.loads(path.read_text())
+    assert sent["subject"] == "Hi Pat"
+    assert sent["content"] == "Hello Pat"
@@ -0,0 +1,111 @@
+from datetime import datetime
+import pytest
+from app.agents.intent_parser import is_complete, parse_date, parse_intent, parse_time
+from app.agents.orchestrator import route_request
+from app.agents.context_manager import context_store
+from tests.conftest import run
+
+TODAY = datetime(2026, 3, 4, 9, 0)  # a Wednesday
+DOCTORS = ["Dr. Alice Smith", "Dr. Bob Jones"]
+
+
+def parse(message: str):
+    return parse_intent(message, DOCTORS, today=TODAY)
+
+
+def test_parse_date_forms():
+    assert parse_date("tomorrow", TODAY) == "2026-03-05"
+    assert parse_date("on 2026-03-10", TODAY) == "2026-03-10"
+    assert parse_date("march 10th", TODAY) == "2026-03-10"
+    assert parse_date("10 of march", TODAY) == "2026-03-10"
+    assert parse_date("next monday", TODAY) == "2026-03-09"
+    # Month-day dates already past this year mean next year
+    assert parse_date("jan 5", TODAY) == "2027-01-05"
+
+
+def test_parse_date_rejects_impossible_iso_dates():
+    # Regression: 2026-02-30 was passed through unchecked
+    assert parse_date("on 2026-02-30", TODAY) is None
+    assert parse_date("on 2026-13-01", TODAY) is None
+
+
+def test_parse_time_forms():
+    assert parse_time("at 2pm") == "14:00"
+    assert parse_time("at 9:30 a.m.") == "09:30"
+    assert parse_time("at 12am") == "00:00"
+    assert parse_time("around noon") == "12:00"
+    assert parse_time("at 14:45") == "14:45"
+    assert parse_time("at 25:00") is None
+
+
+def test_check_availability_is_routed_locally():
+    result = parse("Is Dr. Smith available on 2026-03-10?")
+    assert result["intent"] == "check_availability"
+    assert result["parameters"] == {"doctor_name": "Dr. Alice Smith", "date": "2026-03-10"}
+    assert result["source"] == "local"
+    assert is_complete(result["intent"], result["parameters"])
+
+
+def test_booking_is_routed_locally():
+    result = parse("Book a checkup with Dr. Jones on march 10 at 2pm")
+    assert result["intent"] == "book_appointment"
+    assert result["parameters"] == {
+        "doctor_name": "Dr. Bob Jones", "date": "2026-03-10", "time": "14:00", "appointment_type": "checkup"
+    }
+
+
+@pytest.mark.parametrize("message", [
+    "Don't cancel my appointment on 2026-03-10",
+    "Do not cancel appointment 42",
+    "I no longer want to cancel appointment 42",
+    "Never book me with Dr. Smith on friday at 2pm",
+    "I don’t want to reschedule appointment 42 to 2026-03-10 at 10:00",
+    "What if I cancel appointment 42?",
+    "Suppose I book Dr. Smith on friday at 2pm",
+])
+def test_negated_and_hypothetical_requests_go_to_the_llm(message):
+    # Regression: the keyword alone used to trigger the action
+    assert parse(message) is None
+
+
+def test_cancel_needs_an_id_or_date_in_the_message():
+    assert parse("Cancel my appointment") is None
+    assert parse("Cancel appointment 42")["parameters"] == {"appointment_id": "42"}
+
+
+def test_dates_are_not_read_as_appointment_ids():
+    # Regression: the year of "2026-03-05" became appointment_id 2026 and that row was cancelled
+    for message in ("cancel appointment 2026-03-05", "cancel my appointment 2026-03-05"):
+        assert parse(message)["parameters"] == {"date": "2026-03-05"}
+    # Slash dates aren't parsed, so neither reading is taken locally
+    assert parse("cancel appointment 3/5") is None
+
+
+def test_an_id_and_a_date_together_go_to_the_llm():
+    assert parse("cancel appointment 42 on 2026-03-05") is None
+    assert parse("reschedule appointment 42 to 2026-03-10 at 10:00") is None
+
+
+def test_leaving_the_waitlist_is_not_a_cancellation():
+    assert parse("Cancel my waitlist entry") is None
+
+
+def test_local_booking_does_not_take_date_and_time_from_context(db, llm):
+    # Regression: a remembered date and time completed "book with Dr. Smith"
+    # and booked a slot the user never named in this message
+    db.insert_rows("doctors", [{"name": "Dr. Alice Smith", "specialty": "Cardiology"}])
+    context = run(context_store.get_or_create("stale-context"))
+    context.update_entity("patient_name", "Pat Doe")
+    context.update_entity("date", "2026-03-10")
+    context.update_entity("time", "10:00")
+    run(context_store.save(context))
+
+    result = run(route_request("Book a checkup with Dr. Smith", "stale-context"))
+
+    assert result.get("source") != "local"
+    assert llm.request_total() == 1
+
+    result = run(route_request("Book a checkup with Dr. Smith on march 12 at 11am", "stale-context"))
+
+    assert result["source"] == "local"
+    assert result["parameters"]["patient_name"] == "Pat Doe"
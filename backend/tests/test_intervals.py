@@ -0,0 +1,35 @@
+from app.utils.intervals import fit_starts, free_intervals, merge_intervals, nearest_starts
+
+
+def test_merge_intervals_joins_overlapping_and_touching():
+    assert merge_intervals([(600, 630), (540, 560), (620, 660), (660, 670)]) == [(540, 560), (600, 670)]
+    assert merge_intervals([]) == []
+
+
+def test_merge_intervals_pads_each_side_with_the_buffer():
+    assert merge_intervals([(600, 630), (640, 660)], buffer=5) == [(595, 665)]
+
+
+def test_free_intervals_clips_to_the_day():
+    booked = [(500, 560), (600, 630), (1000, 1100)]
+    assert free_intervals(booked, 540, 1020) == [(560, 600), (630, 1000)]
+    assert free_intervals([], 540, 1020) == [(540, 1020)]
+    assert free_intervals([(540, 1020)], 540, 1020) == []
+
+
+def test_fit_starts_includes_the_start_flush_with_the_next_booking():
+    assert fit_starts([(540, 600)], 40, step=15) == [540, 555, 560]
+    assert fit_starts([(540, 560)], 30) == []
+
+
+def test_fit_starts_min_gap_skips_idle_fragments():
+    # A 10 minute fragment either side of the visit is too short to use
+    assert fit_starts([(540, 600)], 40, step=5, min_gap=15) == [540, 560]
+
+
+def test_nearest_starts_orders_by_distance_then_time():
+    booked = [(600, 660)]
+    assert nearest_starts(booked, 630, 30, 540, 1020) == [660, 675, 570]
+    # 570 and 660 are both 45 minutes from 615; the earlier one wins
+    assert nearest_starts(booked, 615, 30, 540, 1020, limit=2) == [570, 660]
+    assert nearest_starts(booked, 540, 30, 540, 1020, limit=1) == [540]
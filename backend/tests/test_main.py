@@ -0,0 +1,17 @@
+import asyncio
+from app.main import app, lifespan
+from tests.conftest import run
+
+
+def test_background_workers_run_for_the_lifespan(db):
+    async def scenario():
+        async with lifespan(app):
+            await asyncio.sleep(0)
+            workers = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        return workers
+
+    workers = run(scenario())
+
+    assert len(workers) == 2
+    assert all(task.done() for task in workers)
+    assert not app.router.on_startup and not app.router.on_shutdown
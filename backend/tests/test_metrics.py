@@ -0,0 +1,96 @@
+import httpx
+from app.main import app
+from app.utils.metrics import (
+    Counter, Histogram, MetricsRegistry, server_timing_header, span, start_request_timing, timing_summary
+)
+from tests.conftest import run
+
+
+def test_histogram_buckets_are_cumulative_and_inclusive():
+    histogram = Histogram("latency_seconds", "Latency", buckets=(0.1, 0.5))
+    for value in (0.05, 0.1, 0.3, 2.0):
+        histogram.observe(value, path="/api/chat")
+
+    assert histogram.samples() == [
+        'latency_seconds_bucket{path="/api/chat",le="0.1"} 2',
+        'latency_seconds_bucket{path="/api/chat",le="0.5"} 3',
+        'latency_seconds_bucket{path="/api/chat",le="+Inf"} 4',
+        'latency_seconds_sum{path="/api/chat"} 2.45',
+        'latency_seconds_count{path="/api/chat"} 4',
+    ]
+
+
+def test_histogram_keeps_a_series_per_label_set_in_sorted_label_order():
+    histogram = Histogram("dispatch_seconds", "Dispatch", buckets=(1.0,))
+    histogram.observe(0.5, intent="book_appointment", call="x")
+    histogram.observe(0.5, call="x", intent="book_appointment")
+    histogram.observe(1.5, intent="cancel_appointment", call="x")
+
+    samples = histogram.samples()
+    assert 'dispatch_seconds_count{call="x",intent="book_appointment"} 2' in samples
+    assert 'dispatch_seconds_bucket{call="x",intent="cancel_appointment",le="1.0"} 0' in samples
+    assert 'dispatch_seconds_bucket{call="x",intent="cancel_appointment",le="+Inf"} 1' in samples
+
+
+def test_unlabelled_series_and_label_escaping():
+    histogram = Histogram("plain_seconds", "Plain", buckets=(1.0,))
+    histogram.observe(0.25)
+    counter = Counter("errors_total", "Errors")
+    counter.inc(table='say "hi"\\now')
+    counter.inc(2, table='say "hi"\\now')
+
+    assert histogram.samples()[-1] == "plain_seconds_count 1"
+    assert counter.samples() == ['errors_total{table="say \\"hi\\"\\\\now"} 3']
+
+
+def test_registry_renders_help_and_type_once_per_metric():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("route_seconds", "Routing latency", buckets=(1.0,))
+    assert registry.histogram("route_seconds", "Routing latency") is histogram
+    histogram.observe(0.5)
+    registry.counter("emails_total", "Emails").inc(result="sent")
+
+    assert registry.render() == (
+        "# HELP route_seconds Routing latency\n"
+        "# TYPE route_seconds histogram\n"
+        'route_seconds_bucket{le="1.0"} 1\n'
+        'route_seconds_bucket{le="+Inf"} 1\n'
+        "route_seconds_sum 0.5\n"
+        "route_seconds_count 1\n"
+        "# HELP emails_total Emails\n"
+        "# TYPE emails_total counter\n"
+        'emails_total{result="sent"} 1\n'
+    )
+
+
+def test_spans_feed_the_histogram_and_the_request_breakdown():
+    histogram = Histogram("db_seconds", "DB", buckets=(10.0,))
+    timings = start_request_timing()
+    with span("db", histogram, table="appointments"):
+        pass
+    with span("db"):
+        pass
+
+    assert [name for name, _ in timings] == ["db", "db"]
+    assert histogram.samples()[-1] == 'db_seconds_count{table="appointments"} 1'
+    assert server_timing_header([("db", 0.002), ("db", 0.003), ("llm", 0.25)]) == (
+        'db;dur=5.0;desc="2x", llm;dur=250.0;desc="1x"'
+    )
+    assert timing_summary([("db", 0.002), ("db", 0.003)]) == {"db": 5.0}
+
+
+def test_metrics_endpoint_labels_requests_by_route_template(db):
+    async def scrape():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://app.test") as client:
+            await client.get("/")
+            await client.get("/no/such/page")
+            return await client.get("/metrics")
+
+    response = run(scrape())
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert "# TYPE scheduler_http_request_seconds histogram" in body
+    assert 'scheduler_http_request_seconds_count{method="GET",path="/",status="200"}' in body
+    assert 'path="unmatched",status="404"' in body
@@ -0,0 +1,28 @@
+import inspect
+import re
+from app.agents import dispatcher
+from app.agents.orchestrator import ROUTER_SYSTEM_PROMPT, route_request
+from app.utils.tokens import count_tokens
+from benchmarks.fake_openai import CACHE_MIN_TOKENS, approx_tokens
+from tests.conftest import run
+
+
+def test_router_prefix_is_long_enough_to_be_cached():
+    # Regression: at ~800 tokens the static prefix never reached the provider's cache threshold
+    assert count_tokens(ROUTER_SYSTEM_PROMPT) >= CACHE_MIN_TOKENS
+    assert approx_tokens(ROUTER_SYSTEM_PROMPT) >= CACHE_MIN_TOKENS
+
+
+def test_router_prompt_documents_every_dispatcher_intent():
+    handled = set(re.findall(r'"(\w+)": lambda p', inspect.getsource(dispatcher.execute)))
+    documented = set(re.findall(r"^- (\w+):", ROUTER_SYSTEM_PROMPT, re.MULTILINE))
+
+    assert handled - documented == set()
+    assert documented - handled == set()
+
+
+def test_second_router_call_reads_the_prefix_from_cache(db, llm):
+    run(route_request("hello there", "session-a"))
+    second = run(route_request("what can you do?", "session-b"))
+
+    assert second["usage"]["cached_tokens"] >= CACHE_MIN_TOKENS
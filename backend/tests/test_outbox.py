@@ -0,0 +1,130 @@
+import asyncio
+import os
+import sqlite3
+import time
+from app.utils.outbox import Outbox
+from tests.conftest import run
+
+
+def _outbox(tmp_path, **options) -> Outbox:
+    return Outbox(os.path.join(tmp_path, "outbox.db"), **options)
+
+
+def _row(outbox: Outbox, job_id: int) -> dict:
+    conn = sqlite3.connect(outbox.path)
+    conn.row_factory = sqlite3.Row
+    return dict(conn.execute("SELECT * FROM outbox WHERE id = ?", (job_id,)).fetchone())
+
+
+def test_file_is_created_on_first_use_not_on_construction(tmp_path):
+    # Regression: importing the module left an outbox.db in the working directory
+    outbox = _outbox(tmp_path)
+    assert not os.path.exists(outbox.path)
+
+    outbox.open()
+    assert os.path.exists(outbox.path)
+
+
+def test_enqueue_is_idempotent_per_key(tmp_path):
+    outbox = _outbox(tmp_path)
+
+    assert run(outbox.enqueue("email", {"n": 1}, idempotency_key="k1"))
+    assert not run(outbox.enqueue("email", {"n": 2}, idempotency_key="k1"))
+    assert run(outbox.enqueue_many("email", [({"n": 3}, "k1"), ({"n": 4}, "k2")])) == 1
+    assert outbox.stats()["pending"] == 2
+
+
+def test_handler_results_are_recorded_per_job(tmp_path):
+    outbox = _outbox(tmp_path, base_delay=60)
+    outbox.register("echo", lambda payloads: _async([payload["ok"] for payload in payloads]))
+    run(outbox.enqueue_many("echo", [({"ok": True}, "a"), ({"ok": False}, "b")]))
+
+    assert run(outbox.drain_once()) == 2
+
+    assert _row(outbox, 1)["status"] == "done"
+    failed = _row(outbox, 2)
+    assert failed["status"] == "pending"
+    assert failed["attempts"] == 1
+    assert failed["next_attempt_at"] > time.time() + 25
+
+
+def test_jobs_a_handler_returns_no_result_for_are_failed(tmp_path):
+    # Regression: zip() dropped them, leaving them in_flight until the lease lapsed
+    outbox = _outbox(tmp_path, base_delay=60)
+    outbox.register("echo", lambda payloads: _async([True]))
+    run(outbox.enqueue_many("echo", [({}, "a"), ({}, "b"), ({}, "c")]))
+
+    assert run(outbox.drain_once()) == 3
+
+    assert _row(outbox, 1)["status"] == "done"
+    for job_id in (2, 3):
+        row = _row(outbox, job_id)
+        assert row["status"] == "pending"
+        assert row["last_error"] == "Handler returned no result for this job"
+
+
+def test_enqueue_does_not_block_the_event_loop_on_the_worker_lock(tmp_path):
+    # Regression: enqueue wrote to SQLite on the loop thread, stalling every
+    # request while the worker held the lock to claim or record a batch
+    outbox = _outbox(tmp_path)
+    outbox.open()
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(ticker())
+        with outbox._lock:
+            enqueue = asyncio.create_task(outbox.enqueue("email", {}, idempotency_key="k"))
+            await asyncio.sleep(0.1)
+        inserted = await enqueue
+        task.cancel()
+        return ticks, inserted
+
+    ticks, inserted = run(scenario())
+
+    assert inserted
+    assert ticks >= 5
+
+
+def test_attempts_are_counted_when_claimed(tmp_path):
+    # Regression: a worker dying mid-delivery never used up an attempt, so a
+    # job that crashed its worker was retried forever
+    outbox = _outbox(tmp_path)
+    run(outbox.enqueue("email", {}, idempotency_key="k"))
+
+    claimed = outbox._claim()
+
+    assert claimed[0][3] == 1
+    assert _row(outbox, 1)["attempts"] == 1
+    assert _row(outbox, 1)["status"] == "in_flight"
+
+
+def test_lapsed_lease_on_the_last_attempt_is_dead_lettered(tmp_path):
+    outbox = _outbox(tmp_path, max_attempts=2)
+    outbox.LEASE_SECONDS = 0
+    run(outbox.enqueue("email", {}, idempotency_key="k"))
+
+    assert len(outbox._claim()) == 1
+    assert len(outbox._claim()) == 1
+    assert outbox._claim() == []
+
+    assert _row(outbox, 1)["status"] == "dead"
+    assert outbox.metrics["dead"] == 1
+
+
+def test_retry_delay_backs_off_exponentially_with_jitter(tmp_path):
+    outbox = _outbox(tmp_path, base_delay=2, max_delay=30)
+
+    for attempts, ceiling in ((1, 2), (2, 4), (3, 8), (10, 30)):
+        delay = outbox._retry_delay(attempts)
+        assert ceiling / 2 <= delay <= ceiling
+
+
+async def _async(value):
+    return value
@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+from app.agents.patient_agent import decode_cursor, encode_cursor, get_patient_appointments
+from tests.conftest import run
+
+
+def _days_from_today(days: int) -> str:
+    return (datetime.now() + timedelta(days=days)).strftime("%Y-%m-%d")
+
+
+def _seed(db):
+    db.insert_rows("appointments", [
+        {"patient_name": "Pat", "doctor_name": "Dr. A", "appointment_date": _days_from_today(day),
+         "appointment_time": "10:00", "end_time": "10:30"}
+        for day in (-3, -2, -1, 1, 2, 3, 4, 5)
+    ])
+
+
+def test_cursor_round_trip():
+    row = {"appointment_date": "2026-03-02", "appointment_time": "10:00", "id": 7}
+    assert decode_cursor(encode_cursor(row)) == ["2026-03-02", "10:00", 7]
+
+
+def test_pages_follow_the_cursor_without_overlap(db):
+    _seed(db)
+
+    first = run(get_patient_appointments("Pat", page_size=2, past_limit=2))
+    second = run(get_patient_appointments("Pat", page_size=2, cursor=first["next_cursor"]))
+    third = run(get_patient_appointments("Pat", page_size=2, cursor=second["next_cursor"]))
+
+    dates = [apt["appointment_date"] for page in (first, second, third) for apt in page["upcoming"]]
+    assert dates == [_days_from_today(day) for day in (1, 2, 3, 4, 5)]
+    assert third["next_cursor"] is None
+    assert [apt["appointment_date"] for apt in first["past"]] == [_days_from_today(-1), _days_from_today(-2)]
+
+
+def test_totals_count_the_whole_list_and_only_on_the_first_page(db):
+    # Regression: the count ran with the cursor predicate, so later pages
+    # reported only the rows after the cursor as the total
+    _seed(db)
+
+    first = run(get_patient_appointments("Pat", page_size=2, past_limit=2))
+    second = run(get_patient_appointments("Pat", page_size=2, cursor=first["next_cursor"]))
+
+    assert first["upcoming_total"] == 5
+    assert first["past_total"] == 3
+    assert first["total"] == 8
+    assert "upcoming_total" not in second and "total" not in second
+
+
+def test_later_pages_render_as_a_continuation(db):
+    from app.agents.response_renderer import render_response
+    _seed(db)
+
+    first = run(get_patient_appointments("Pat", page_size=2))
+    second = run(get_patient_appointments("Pat", page_size=2, cursor=first["next_cursor"]))
+
+    assert "2 more upcoming appointments" in render_response("get_appointments", second, "en")
@@ -0,0 +1,84 @@
+import asyncio
+from datetime import datetime, timedelta
+import httpx
+import pytest
+import app.agents.reminder_agent as reminder_agent
+from app.database import supabase
+from tests.conftest import run
+
+
+@pytest.fixture
+def tomorrow(db, monkeypatch):
+    monkeypatch.setattr(reminder_agent, "REMINDER_BACKOFF_SECONDS", 0)
+    date = (datetime.now() + timedelta(hours=24)).strftime("%Y-%m-%d")
+    db.insert_rows("appointments", [
+        {"patient_name": f"Patient {i}", "patient_email": f"p{i}@example.com", "doctor_name": "Dr. A",
+         "appointment_date": date, "appointment_time": f"{9 + i:02d}:00", "end_time": f"{9 + i:02d}:30"}
+        for i in range(3)
+    ])
+    return date
+
+
+def _failing_patches(db, monkeypatch, failures: int):
+    """Serve the fake database, answering the first `failures` PATCH requests with a 503"""
+    app = db.create_app()
+    remaining = [failures]
+
+    async def flaky(scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "PATCH" and remaining[0]:
+            remaining[0] -= 1
+            await send({"type": "http.response.start", "status": 503,
+                        "headers": [(b"content-type", b"application/json")]})
+            await send({"type": "http.response.body", "body": b'{"message": "unavailable"}'})
+            return
+        await app(scope, receive, send)
+
+    monkeypatch.setattr(supabase, "session", httpx.AsyncClient(transport=httpx.ASGITransport(app=flaky)))
+
+
+def test_reminders_are_sent_and_marked(db, tomorrow):
+    result = run(reminder_agent.send_appointment_reminders())
+
+    assert result["reminders_sent"] == 3
+    assert result["failed"] == 0
+    assert result["mark_failed"] == 0
+    assert all(row["reminder_sent"] for row in db.tables["appointments"])
+
+
+def test_mark_sent_is_retried(db, tomorrow, monkeypatch):
+    _failing_patches(db, monkeypatch, failures=1)
+
+    result = run(reminder_agent.send_appointment_reminders())
+
+    assert result["reminders_sent"] == 3
+    assert result["mark_failed"] == 0
+    assert result["mark_retries"] == 1
+    assert all(row["reminder_sent"] for row in db.tables["appointments"])
+
+
+def test_mark_failure_is_reported_apart_from_send_failures(db, tomorrow, monkeypatch):
+    # Regression: reminders that went out were counted as failed sends
+    _failing_patches(db, monkeypatch, failures=reminder_agent.REMINDER_MAX_ATTEMPTS)
+
+    result = run(reminder_agent.send_appointment_reminders())
+
+    assert result["reminders_sent"] == 3
+    assert result["failed"] == 0
+    assert result["mark_failed"] == 3
+    assert not any(row["reminder_sent"] for row in db.tables["appointments"])
+
+
+def test_send_timing_is_wall_time_not_summed_batches(db, tomorrow, monkeypatch):
+    # Regression: concurrent batch times were added up and exceeded the run time
+    async def slow_send(messages):
+        await asyncio.sleep(0.05)
+        return [True] * len(messages)
+
+    monkeypatch.setattr(reminder_agent, "send_email_batch", slow_send)
+    monkeypatch.setattr(reminder_agent, "REMINDER_BATCH_SIZE", 1)
+
+    result = run(reminder_agent.send_appointment_reminders())
+
+    assert result["reminders_sent"] == 3
+    assert result["timings_seconds"]["send"] <= result["elapsed_seconds"]
+    assert result["timings_seconds"]["send"] < 0.14
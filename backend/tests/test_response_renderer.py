@@ -0,0 +1,118 @@
+from datetime import datetime
+from string import Formatter
+from app.agents.response_renderer import (
+    MAX_LISTED, RESPONSE_STRINGS, _Renderer, render_error, render_response, resolve_locale
+)
+
+THIS_YEAR = datetime.now().year
+
+
+def _fields(template: str) -> set:
+    return {field for _, field, _, _ in Formatter().parse(template) if field}
+
+
+def test_every_locale_has_the_same_templates_and_placeholders():
+    english = RESPONSE_STRINGS["en"]
+    for locale, strings in RESPONSE_STRINGS.items():
+        assert strings.keys() == english.keys(), locale
+        for key, template in english.items():
+            if isinstance(template, str):
+                assert _fields(strings[key]) == _fields(template), (locale, key)
+            else:
+                assert len(strings[key]) == len(template), (locale, key)
+
+
+def test_resolve_locale_from_accept_language():
+    assert resolve_locale("es-MX,es;q=0.9,en;q=0.8") == "es"
+    assert resolve_locale("es_ES") == "es"
+    assert resolve_locale("fr-FR") == "en"
+    assert resolve_locale(None) == "en"
+
+
+def test_dates_spell_out_the_year_only_when_it_differs():
+    r = _Renderer("en")
+
+    assert r.date("2020-03-02") == "Monday, March 2, 2020"
+    assert str(THIS_YEAR) not in r.date(f"{THIS_YEAR}-03-02")
+    assert _Renderer("es").date("2020-03-02") == "lunes 2 de marzo de 2020"
+    # Values that aren't dates pass through
+    assert r.date("next week") == "next week"
+    assert r.date(None) == "None"
+
+
+def test_long_lists_are_cut_with_a_count():
+    slots = [f"{hour:02d}:00" for hour in range(8, 8 + MAX_LISTED + 2)]
+
+    assert _Renderer("en").items(slots).endswith("and 2 more")
+    assert _Renderer("es").items(slots).endswith("y 2 más")
+    assert _Renderer("en").items(slots[:2]) == "08:00, 09:00"
+
+
+def test_availability_in_both_locales():
+    result = {"success": True, "doctor": "Sarah Smith", "date": "2020-03-02",
+              "available_slots": ["09:00", "09:30"], "available_count": 2}
+
+    assert render_response("check_availability", result, "en") == (
+        "✅ Dr. Sarah Smith has 2 open slots on Monday, March 2, 2020: 09:00, 09:30."
+    )
+    assert "Dr. Sarah Smith tiene 2" in render_response("check_availability", result, "es")
+
+
+def test_batch_lists_days_for_ranges_and_skips_closed_doctors():
+    result = {"success": True, "date_from": "2020-03-02", "date_to": "2020-03-03", "doctors": {
+        "Sarah Smith": [
+            {"date": "2020-03-02", "available_slots": ["09:00"], "available_count": 1},
+            {"date": "2020-03-03", "available_slots": [], "available_count": 0},
+        ],
+        "James Lee": [
+            {"date": "2020-03-02", "available_slots": [], "available_count": 0},
+            {"date": "2020-03-03", "available_slots": [], "available_count": 0},
+        ],
+    }}
+
+    assert render_response("check_availability_batch", result, "en") == (
+        "• Dr. Sarah Smith: Monday, March 2, 2020: 1 open"
+    )
+
+
+def test_series_reports_conflicts_with_and_without_alternatives():
+    result = {"success": True, "requested_occurrences": 3,
+              "booked": [{"date": "2020-03-02", "time": "10:00"}],
+              "conflicts": [
+                  {"date": "2020-03-09", "time": "10:00", "alternatives": [{"time": "10:30"}]},
+                  {"date": "2020-03-16", "time": "10:00", "alternatives": []},
+              ]}
+
+    lines = render_response("book_series", result, "en").split("\n")
+
+    assert lines[0] == "✅ Booked 1 of 3 appointments: Monday, March 2, 2020."
+    assert lines[1].endswith("Nearest free times: 10:30.")
+    assert lines[2].endswith("that day is full.")
+
+
+def test_failures_render_the_error_and_conflict_alternatives():
+    result = {"success": False, "conflict": True, "error": "Slot taken",
+              "alternatives": [{"time": "10:30"}, {"time": "11:00"}], "suggestion": "Try Dr. Lee"}
+
+    assert render_response("book_appointment", result, "en") == (
+        "❌ That time isn't free (Slot taken).\n"
+        "🕐 Nearest free times that day: 10:30, 11:00.\n"
+        "💡 Suggestion: Try Dr. Lee"
+    )
+    assert render_error({"success": False}, "es") == "❌ Request failed"
+
+
+def test_confirmation_prompt_wins_over_the_intent_template():
+    result = {"success": False, "confirm_required": True, "warning": "Less than 24 hours notice."}
+
+    assert render_response("cancel_appointment", result, "en").startswith("⚠️ Less than 24 hours notice.")
+
+
+def test_open_ended_intents_are_left_to_the_llm():
+    assert render_response("general_inquiry", {"success": True, "message": "hi"}) is None
+
+
+def test_unexpected_result_shape_falls_back_to_the_message():
+    # A result missing the fields its template needs must not raise
+    assert render_response("book_appointment", {"success": True, "message": "Booked"}, "en") == "✅ Booked"
+    assert render_response("some_new_intent", {"success": True}, "es") == "✅ Solicitud completada."
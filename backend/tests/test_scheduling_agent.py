@@ -0,0 +1,48 @@
+from app.agents.scheduling_agent import (
+    _nearest_slot, check_availability_batch, suggest_alternative_doctors
+)
+from tests.conftest import run
+
+
+def test_nearest_slot_ranks_by_distance():
+    assert _nearest_slot(["09:00", "10:30", "14:00"], "10:00") == ("10:30", 30)
+
+
+def test_nearest_slot_ignores_times_it_cannot_parse():
+    # Regression: "2pm" and "morning" raised out of suggest_alternative_doctors
+    assert _nearest_slot(["09:00"], "2pm") == (None, None)
+    assert _nearest_slot(["09:00"], "morning") == (None, None)
+
+
+def test_suggest_alternatives_with_a_free_text_time(db):
+    db.insert_rows("doctors", [{"name": "Dr. A", "specialty": "Cardiology"}])
+
+    result = run(suggest_alternative_doctors("Cardiology", "2026-03-02", preferred_time="morning"))
+
+    assert result["success"]
+    doctor = result["available_doctors"][0]
+    assert doctor["name"] == "Dr. A"
+    assert "nearest_slot" not in doctor
+
+
+def test_suggest_alternatives_rejects_a_malformed_date(db):
+    # Regression: the failed batch result has no "doctors", so this raised KeyError
+    db.insert_rows("doctors", [{"name": "Dr. A", "specialty": "Cardiology"}])
+
+    result = run(suggest_alternative_doctors("Cardiology", "03/02/2026"))
+
+    assert result == {"success": False, "error": "Dates must be in YYYY-MM-DD format"}
+    assert run(suggest_alternative_doctors("Cardiology", "2026-03-02", date_to="soon"))["success"] is False
+
+
+def test_batch_range_skips_weekends(db):
+    # 2026-03-06 is a Friday
+    result = run(check_availability_batch(["Dr. A"], "2026-03-06", "2026-03-09"))
+
+    assert [day["date"] for day in result["doctors"]["Dr. A"]] == ["2026-03-06", "2026-03-09"]
+
+
+def test_batch_single_date_is_reported_even_on_a_weekend(db):
+    result = run(check_availability_batch(["Dr. A"], "2026-03-07"))
+
+    assert [day["date"] for day in result["doctors"]["Dr. A"]] == ["2026-03-07"]
@@ -0,0 +1,39 @@
+import inspect
+import json
+import re
+from app.agents import dispatcher
+from app.agents.response_renderer import LLM_INTENTS
+from app.agents.streaming_agent import STATUS_MESSAGES, stream_chat
+from tests.conftest import run
+
+
+def _events(message: str, session_id: str) -> list:
+    async def collect():
+        return [chunk async for chunk in stream_chat(message, session_id)]
+    events = []
+    for chunk in run(collect()):
+        event, data = chunk.strip().split("\n", 1)
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def test_every_action_intent_has_a_status_message():
+    handled = set(re.findall(r'"(\w+)": lambda p', inspect.getsource(dispatcher.execute)))
+
+    assert handled - LLM_INTENTS - STATUS_MESSAGES.keys() == set()
+
+
+def test_series_booking_streams_its_own_status(db, llm):
+    # Regression: book_series fell back to the generic "Processing your request"
+    message = "Weekly physio for Pat with Sarah Smith, four times from March 2"
+    llm.router_replies[message] = {
+        "intent": "book_series", "needs_clarification": False, "confidence": 0.9,
+        "parameters": {"patient_name": "Pat", "doctor_name": "Sarah Smith", "start_date": "2026-03-02",
+                       "time": "10:00", "frequency": "weekly", "count": 4}
+    }
+
+    events = _events(message, "series-session")
+
+    statuses = [data["message"] for event, data in events if event == "status"]
+    assert statuses == ["📅 Booking your recurring appointments..."]
+    assert events[-1][0] == "done"
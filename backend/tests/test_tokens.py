@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+from app.utils.tokens import UsageTracker, count_message_tokens, count_tokens, fit_lines
+
+
+def test_count_tokens_charges_long_words_per_four_characters():
+    assert count_tokens("") == 0
+    assert count_tokens("book it") == 2
+    assert count_tokens("appointment") == 3
+    assert count_tokens("10:30") == 3
+
+
+def test_blank_lines_cost_a_token_and_single_newlines_are_free():
+    assert count_tokens("a\nb") == 2
+    assert count_tokens("a\n\nb") == 3
+
+
+def test_count_message_tokens_adds_per_message_overhead():
+    messages = [{"role": "system", "content": "book it"}, {"role": "user", "content": None}]
+
+    assert count_message_tokens(messages) == (2 + 4) + (0 + 4) + 2
+
+
+def test_fit_lines_keeps_a_prefix_within_budget():
+    lines = ["- patient_name: Jane", "- doctor_name: Sarah Smith", "- date: 2026-03-02"]
+    costs = [count_tokens(line) + 1 for line in lines]
+
+    assert fit_lines(lines, sum(costs)) == lines
+    assert fit_lines(lines, sum(costs) - 1) == lines[:2]
+    assert fit_lines(lines, 0) == []
+
+
+def _usage(prompt: int, cached: int, completion: int, details: bool = True):
+    return SimpleNamespace(
+        prompt_tokens=prompt, completion_tokens=completion,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=cached) if details else None
+    )
+
+
+def test_usage_tracker_totals_and_hit_rate():
+    tracker = UsageTracker()
+
+    assert tracker.record("router", None) == {}
+    assert tracker.record("router", _usage(1200, 0, 30)) == {"prompt_tokens": 1200, "cached_tokens": 0, "completion_tokens": 30}
+    tracker.record("router", _usage(1200, 1024, 20))
+    tracker.record("reply", _usage(400, 0, 50, details=False))
+
+    stats = tracker.stats()
+    assert stats["router"] == {"requests": 2, "prompt_tokens": 2400, "cached_tokens": 1024,
+                               "completion_tokens": 50, "cache_hit_rate": 0.427}
+    assert stats["reply"]["cache_hit_rate"] == 0.0
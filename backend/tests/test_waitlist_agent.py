@@ -0,0 +1,143 @@
+import asyncio
+from app.agents.waitlist_agent import (
+    _handle_freed_slots, accept_waitlist_offer, check_waitlist_on_cancellation, expire_waitlist_offers,
+    get_waitlist_status
+)
+from app.utils.waitlist_index import waitlist_index
+from tests.conftest import run
+
+
+def _entry(patient: str, created_at: str, **extra) -> dict:
+    return {"patient_name": patient, "doctor_name": "Dr. A", "preferred_date": "2026-03-02",
+            "preferred_time": "10:00", "created_at": created_at, **extra}
+
+
+def test_waitlist_status_ranks_only_waiting_entries(db):
+    db.insert_rows("waitlist", [
+        _entry("First", "2026-02-01T09:00:00"),
+        _entry("Gone", "2026-02-01T09:30:00", status="fulfilled"),
+        _entry("Pat", "2026-02-01T10:00:00"),
+        _entry("Last", "2026-02-01T11:00:00"),
+    ])
+
+    result = run(get_waitlist_status("Pat"))
+
+    assert result["total"] == 1
+    assert result["waitlist_entries"][0]["position"] == 2
+    assert result["waitlist_entries"][0]["queue_length"] == 3
+
+
+def _hold(db, entry_id: int, expires_at: str, patient: str = "Pat") -> dict:
+    held = db.insert_rows("appointments", [{
+        "patient_name": patient, "patient_email": "pat@example.com", "doctor_name": "Dr. A",
+        "appointment_date": "2026-03-02", "appointment_time": "10:00", "end_time": "10:30",
+        "appointment_type": "checkup", "status": "held"
+    }])[0]
+    db.insert_rows("waitlist", [_entry(
+        patient, "2026-02-01T09:00:00", id=entry_id, patient_email="pat@example.com", status="offered",
+        offer_expires_at=expires_at, held_appointment_id=str(held["id"])
+    )])
+    return held
+
+
+def test_offer_moves_to_the_next_candidate_when_the_slot_is_taken(db):
+    db.insert_rows("waitlist", [
+        _entry("First", "2026-02-01T09:00:00", preferred_time="10:00", appointment_type="checkup"),
+        _entry("Second", "2026-02-01T09:30:00", preferred_time="10:30", appointment_type="checkup"),
+    ])
+
+    async def scenario():
+        await waitlist_index.load("Dr. A", "2026-03-02")
+        # Booked after the slot was freed, before the waitlist check ran
+        db.insert_rows("appointments", [{
+            "patient_name": "Walk In", "doctor_name": "Dr. A", "appointment_date": "2026-03-02",
+            "appointment_time": "10:00", "end_time": "10:30"
+        }])
+        return await check_waitlist_on_cancellation("Dr. A", "2026-03-02", "10:00", "11:00", auto_offer=True)
+
+    result = run(scenario())
+
+    assert result["offered_to"]["patient_name"] == "Second"
+    assert result["offered_to"]["time"] == "10:30"
+    held = [row for row in db.tables["appointments"] if row["status"] == "held"]
+    assert [(row["patient_name"], row["appointment_time"]) for row in held] == [("Second", "10:30")]
+    statuses = {row["patient_name"]: row["status"] for row in db.tables["waitlist"]}
+    assert statuses == {"First": "waiting", "Second": "offered"}
+
+
+def test_offer_skips_entries_no_longer_waiting(db):
+    db.insert_rows("waitlist", [
+        _entry("First", "2026-02-01T09:00:00", preferred_time="10:00"),
+        _entry("Second", "2026-02-01T09:30:00", preferred_time="10:00"),
+    ])
+
+    async def scenario():
+        await waitlist_index.load("Dr. A", "2026-03-02")
+        db.tables["waitlist"][0]["status"] = "removed"
+        return await check_waitlist_on_cancellation("Dr. A", "2026-03-02", "10:00", "10:30", auto_offer=True)
+
+    assert run(scenario())["offered_to"]["patient_name"] == "Second"
+
+
+def test_accepting_an_offer_requires_the_offered_patient(db):
+    held = _hold(db, 7, "2999-01-01T00:00:00")
+
+    missing = run(accept_waitlist_offer("7"))
+    wrong = run(accept_waitlist_offer("7", patient_name="Someone Else"))
+    wrong_email = run(accept_waitlist_offer("7", patient_name="Pat", patient_email="other@example.com"))
+
+    assert not missing["success"] and not wrong["success"] and not wrong_email["success"]
+    assert db.tables["appointments"][0]["status"] == "held"
+
+    accepted = run(accept_waitlist_offer("7", patient_email="PAT@example.com"))
+
+    assert accepted["success"]
+    assert accepted["appointment"]["id"] == held["id"]
+    assert db.tables["appointments"][0]["status"] == "confirmed"
+    assert db.tables["waitlist"][0]["status"] == "fulfilled"
+
+
+def test_concurrent_expiry_runs_release_each_offer_once(db):
+    # Regression: every worker's expiry loop released and re-offered the same holds
+    _hold(db, 7, "2000-01-01T00:00:00")
+
+    async def scenario():
+        return await asyncio.gather(expire_waitlist_offers(), expire_waitlist_offers())
+
+    results = run(scenario())
+
+    assert sorted(result["expired"] for result in results) == [0, 1]
+    assert db.tables["waitlist"][0]["status"] == "expired"
+    assert db.tables["appointments"][0]["status"] == "cancelled"
+
+
+def test_freed_slot_jobs_fail_independently(db):
+    # Regression: one bad payload raised out of the handler and failed the whole batch
+    db.insert_rows("waitlist", [_entry("Pat", "2026-02-01T09:00:00", preferred_time="10:00")])
+
+    results = run(_handle_freed_slots([
+        {"doctor_name": "Dr. A", "date": "2026-03-02", "time": "not a time"},
+        {"doctor_name": "Dr. A", "date": "2026-03-02", "time": "10:00", "end_time": "10:30", "auto_offer": True},
+    ]))
+
+    assert results == [False, True]
+
+
+def test_redelivered_freed_slot_job_is_a_no_op(db):
+    db.insert_rows("waitlist", [
+        _entry("First", "2026-02-01T09:00:00", preferred_time="10:00"),
+        _entry("Second", "2026-02-01T09:30:00", preferred_time="10:00"),
+    ])
+    payload = {"doctor_name": "Dr. A", "date": "2026-03-02", "time": "10:00", "end_time": "10:30", "auto_offer": True}
+
+    assert run(_handle_freed_slots([payload])) == [True]
+    requests_before = db.request_total()
+    assert run(_handle_freed_slots([payload])) == [True]
+
+    # One lookup finds the existing hold; no candidates are tried again
+    assert db.request_total() - requests_before == 1
+
+    assert [row["patient_name"] for row in db.tables["appointments"] if row["status"] == "held"] == ["First"]
+    assert {row["patient_name"]: row["status"] for row in db.tables["waitlist"]} == {
+        "First": "offered", "Second": "waiting"
+    }
@@ -0,0 +1,44 @@
+from app.utils.waitlist_index import WaitlistIndex, _DayQueue
+from tests.conftest import run
+
+DURATIONS = {"checkup": 30, "consultation": 45}
+
+
+def _entry(entry_id: int, created_at: str, preferred_time: str = None, appointment_type: str = "checkup") -> dict:
+    return {"id": entry_id, "patient_name": f"Patient {entry_id}", "doctor_name": "Dr. A",
+            "preferred_date": "2026-03-02", "preferred_time": preferred_time,
+            "appointment_type": appointment_type, "created_at": created_at, "status": "waiting"}
+
+
+def test_day_queue_treats_free_text_times_as_anytime():
+    # Regression: "morning" raised ValueError and broke loading the whole day
+    queue = _DayQueue()
+    queue.add(_entry(1, "2026-02-01T09:00", "morning"))
+    queue.add(_entry(2, "2026-02-01T09:01", "2pm"))
+    queue.add(_entry(3, "2026-02-01T09:02", "10:30"))
+
+    assert [entry["id"] for entry in queue.anytime] == [1, 2]
+    assert [entry["id"] for entry in queue.timed] == [3]
+    assert queue.remove(2) and len(queue) == 2
+
+
+def test_candidates_fit_the_freed_interval_near_the_preferred_time(db):
+    db.insert_rows("waitlist", [
+        _entry(1, "2026-02-01T09:00", "15:00"),                        # too far from 10:00
+        _entry(2, "2026-02-01T09:01", "10:30"),
+        _entry(3, "2026-02-01T09:02", None, "consultation"),           # 45 min won't fit in 30
+        _entry(4, "2026-02-01T09:03", "morning"),
+        _entry(5, "2026-02-01T09:04", "10:00"),
+    ])
+    index = WaitlistIndex(flex_minutes=60)
+
+    candidates = run(index.candidates("Dr. A", "2026-03-02", 600, 630, DURATIONS))
+
+    assert [entry["id"] for entry in candidates] == [2, 4, 5]
+
+
+def test_start_for_clamps_to_the_interval():
+    index = WaitlistIndex()
+    assert index.start_for({"_preferred": 620}, 600, 660, 30) == 620
+    assert index.start_for({"_preferred": 650}, 600, 660, 30) == 630
+    assert index.start_for({}, 600, 660, 30) == 600
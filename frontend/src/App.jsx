@@ -5,6 +5,7 @@ import { streamMessage } from "./api";
 function App() {
   const [message, setMessage] = useState("");
   const [response, setResponse] = useState("");
+  const [status, setStatus] = useState("");
   const [loading, setLoading] = useState(false);
 
   const handleSend = async () => {
@@ -14,13 +15,21 @@ function App() {
     try {
       // const res = await sendMessage(message);
       // setResponse(res.data);
-      await streamMessage(message, (chunk) => {
-      setResponse((prev) => (prev || "") + chunk);
-    });
+      await streamMessage(
+        message,
+        (chunk) => {
+          setStatus("");
+          setResponse((prev) => (prev || "") + chunk);
+        },
+        (type, data) => {
+          if (type === "thinking" || type === "status") setStatus(data.message);
+        }
+      );
     } catch (error) {
       console.error(error);
       alert("Error communicating with backend");
     }
+    setStatus("");
     setLoading(false);
   };
 
@@ -40,6 +49,8 @@ function App() {
         {loading ? "Processing..." : "Send"}
       </button>
 
+      {status && <div style={{ marginTop: "20px", color: "#666" }}>{status}</div>}
+
       {response && (
         <div style={{ marginTop: "20px", whiteSpace: "pre-wrap" }}>
           <h3>System Response</h3>
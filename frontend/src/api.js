@@ -10,19 +10,55 @@ export const sendMessage = (message) => {
   });
 };
 
-export async function streamMessage(message, onChunk) {
-  const response = await fetch("http://127.0.0.1:8000/chat/stream", {
+let sessionId = null;
+
+// Parse one "event: ...\ndata: ..." block of a server-sent event stream
+function parseEvent(block) {
+  let type = "message";
+  const data = [];
+  for (const line of block.split("\n")) {
+    if (line.startsWith("event:")) type = line.slice(6).trim();
+    else if (line.startsWith("data:")) data.push(line.slice(5).trimStart());
+  }
+  return { type, data: data.length ? JSON.parse(data.join("\n")) : {} };
+}
+
+// Streams a chat turn. onChunk receives the reply text as it arrives; onEvent,
+// if given, receives every typed event (thinking, intent, status, result,
+// token, clarification, error, done) with its JSON payload. Rejects when the
+// server answers with an error status instead of a stream.
+export async function streamMessage(message, onChunk, onEvent = () => {}) {
+  const headers = { "Content-Type": "application/json" };
+  if (sessionId) headers["X-Session-ID"] = sessionId;
+
+  const response = await fetch("http://127.0.0.1:8000/api/chat/stream", {
     method: "POST",
-    headers: { "Content-Type": "application/json" },
-    body: JSON.stringify({ message }),
+    headers,
+    body: JSON.stringify({ message, locale: navigator.language }),
   });
+  // Errors before the stream starts (422, 500, proxies) come back as plain JSON or HTML
+  if (!response.ok || !response.body) {
+    throw new Error(`Chat request failed: ${response.status} ${await response.text()}`);
+  }
+  sessionId = response.headers.get("X-Session-ID") || sessionId;
 
   const reader = response.body.getReader();
   const decoder = new TextDecoder("utf-8");
+  let buffer = "";
 
   while (true) {
     const { value, done } = await reader.read();
     if (done) break;
-    onChunk(decoder.decode(value));
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary;
+    while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+      const event = parseEvent(buffer.slice(0, boundary));
+      buffer = buffer.slice(boundary + 2);
+
+      onEvent(event.type, event.data);
+      if (event.type === "token") onChunk(event.data.text);
+      else if (event.type === "clarification" || event.type === "error") onChunk(event.data.message);
+    }
   }
 }